@@ -0,0 +1,93 @@
+"""
+Kantra performance benchmarks, run separately from the correctness tests: `pytest -s benchmarks`.
+
+Every case of the matrix (apps of data/analysis.json and data/java_analysis.json x `--run-local=true/false`
+x source-only/full analysis) is run KANTRA_BENCHMARK_RUNS times one after another, recording wall time,
+peak RSS of the kantra process tree and the output size. Medians are compared against the baseline file
+(KANTRA_BENCHMARK_BASELINE), a case fails if a metric is worse by more than KANTRA_BENCHMARK_THRESHOLD
+with the whole bootstrap confidence interval above zero. Measured samples are written to
+`<REPORT_OUTPUT_PATH>/benchmark-results.json` in the baseline format, copy it over the baseline to update it.
+"""
+import json
+import os
+from dataclasses import replace
+
+import pytest
+
+from fixtures.analysis import java_analysis_input, standard_analysis_spec
+from utils import constants
+from utils.benchmark import METRICS, RESULTS_FILE_NAME, compare, format_comparison, get_baseline_path, get_runs, \
+    get_threshold, load_baseline, output_size, save_results
+from utils.common import get_report_path
+from utils.profiler import PROFILE_FILE_NAME
+from utils.scheduler import AnalysisSpec, run_analysis
+
+
+def _get_cases():
+    cases = []
+    with open(os.path.join('data', 'analysis.json')) as f:
+        cases += [('analysis', app_name) for app_name in json.load(f)]
+    with open(os.path.join('data', 'java_analysis.json')) as f:
+        cases += [('java_analysis', tc_name) for tc_name in json.load(f)]
+    return [
+        pytest.param(dataset, app_name, run_local, mode, id='%s-%s-run-local-%s' % (app_name, mode, run_local))
+        for dataset, app_name in cases for run_local in ('true', 'false') for mode in ('source-only', 'full')
+    ]
+
+
+@pytest.fixture(scope="module")
+def benchmark_results():
+    results = {}
+    yield results
+    if results:
+        path = os.path.join(get_report_path(), RESULTS_FILE_NAME)
+        save_results(path, results)
+        print("\nBenchmark results written to %s" % path)
+
+
+def _get_spec(name, dataset, app_name, run_local, mode, analysis_data, java_analysis_data):
+    with_deps = mode == 'full'
+    if dataset == 'analysis':
+        spec = standard_analysis_spec(name, analysis_data[app_name], {'--run-local': run_local})
+    else:
+        tc = java_analysis_data[app_name]
+        input_path, settings_path = java_analysis_input(app_name, tc)
+        spec = AnalysisSpec(name, input_path, tc['sources'], tc['targets'], settings=settings_path,
+                            kwargs={'run-local': run_local})
+    return replace(spec, with_deps=with_deps, cacheable=False)
+
+
+@pytest.mark.no_result_cache
+@pytest.mark.parametrize('dataset, app_name, run_local, mode', _get_cases())
+def test_benchmark(request, dataset, app_name, run_local, mode, analysis_data, java_analysis_data,
+                   benchmark_results, monkeypatch):
+    case_id = request.node.callspec.id
+    monkeypatch.setenv(constants.KANTRA_PROFILE_INTERVAL, os.getenv(constants.KANTRA_PROFILE_INTERVAL) or '0.5')
+    spec = _get_spec('benchmark-' + case_id, dataset, app_name, run_local, mode, analysis_data, java_analysis_data)
+
+    samples = {metric: [] for metric in METRICS}
+    for _ in range(get_runs()):
+        result = run_analysis(spec)
+        assert result.ok, "Analysis %s failed:\n%s" % (case_id, result.output)
+        samples['wall_time'].append(round(result.duration, 3))
+        samples['output_size'].append(output_size(result.output_dir))
+        profile_path = os.path.join(result.output_dir, PROFILE_FILE_NAME)
+        if os.path.exists(profile_path):    # no profile where /proc is not available
+            with open(profile_path, encoding='utf-8') as f:
+                samples['peak_rss'].append(json.load(f)['summary']['peak_rss'])
+    benchmark_results[case_id] = {metric: values for metric, values in samples.items() if values}
+
+    baseline = load_baseline(get_baseline_path()).get(case_id)
+    if not baseline:
+        print("No baseline for %s in %s, skipping the comparison" % (case_id, get_baseline_path()))
+        return
+
+    regressions = []
+    for metric, values in benchmark_results[case_id].items():
+        if not baseline.get(metric):
+            continue
+        comparison = compare(values, baseline[metric], get_threshold())
+        print(format_comparison(case_id, metric, comparison))
+        if comparison['regressed']:
+            regressions.append(metric)
+    assert not regressions, "%s regressed over the baseline in %s" % (case_id, ', '.join(regressions))
@@ -2,20 +2,44 @@ import time
 import pytest
 from dotenv import load_dotenv
 
+from utils.cache import cache_disabled
+from utils.phases import format_session_summary
+
 pytest_plugins = [
     "fixtures.analysis",
+    "fixtures.analysis_plan",
     "fixtures.transformation",
     "fixtures.ccm",
+    "fixtures.output_root",
 ]
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "no_result_cache: always run kantra, bypassing the analysis result cache")
+
+
 @pytest.fixture(scope="session", autouse=True)
 def load_env():
     load_dotenv()
 
+
+@pytest.fixture(autouse=True)
+def result_cache_bypass(request):
+    if request.node.get_closest_marker("no_result_cache"):
+        with cache_disabled():
+            yield
+    else:
+        yield
+
 def pytest_runtest_setup(item):
     item.start_time = time.perf_counter()
 
 def pytest_runtest_teardown(item):
     duration = time.perf_counter() - item.start_time
-    print(f"\nTest {item.name} took {duration:.4f} seconds")
\ No newline at end of file
+    print(f"\nTest {item.name} took {duration:.4f} seconds")
+
+def pytest_terminal_summary(terminalreporter):
+    summary = format_session_summary()
+    if summary:
+        terminalreporter.write_sep("=", "kantra phase durations")
+        terminalreporter.write_line(summary)
@@ -1,9 +1,14 @@
 import json
+import os
 import pprint
 
 import pytest
 import yaml
 
+from utils import constants
+from utils.manage_maven_credentials import get_default_token
+from utils.scheduler import AnalysisSpec, run_analyses
+
 
 @pytest.fixture(scope="session")
 def analysis_data():
@@ -49,4 +54,80 @@ def ci_data():
             tc = ci_test_cases[tc_name]
             tc['referencesDir'] = tc['name'] = tc_name
             extracted_data.append(tc)
-        return extracted_data
\ No newline at end of file
+        return extracted_data
+
+
+@pytest.fixture(scope="session")
+def standard_analysis_results(request, analysis_data):
+    """
+    Runs all collected `test_standard_analysis` cases at once on the parallel scheduler,
+    each test then only asserts its own result (keyed by the test callspec id).
+    """
+    specs = []
+    for item in request.session.items:
+        if getattr(item, 'originalname', None) != 'test_standard_analysis':
+            continue
+        params = item.callspec.params
+        specs.append(standard_analysis_spec(item.callspec.id, analysis_data[params['app_name']], params['additional_args']))
+    return run_analyses(specs)
+
+
+def standard_analysis_spec(name, application_data, additional_args):
+    extra_kwargs = dict(additional_args)
+    # Add settings.xml with credentials needed e.g. by tackle-testapp-public
+    if application_data.get('maven_settings'):
+        with open(application_data['maven_settings'], 'r') as f:
+            raw_settings = f.read()
+        maven_token = os.getenv(constants.GIT_PASSWORD, '')
+        if maven_token == '':
+            maven_token = get_default_token()
+        raw_settings = raw_settings.replace('GITHUB_USER', os.getenv(constants.GIT_USERNAME, 'konveyor-read-only-bot'))
+        raw_settings = raw_settings.replace('GITHUB_TOKEN', maven_token)
+        input_path = os.path.join(os.getenv(constants.PROJECT_PATH), 'data', 'applications', application_data['file_name'])
+        settings_path = input_path + "_settings.xml"
+        with open(settings_path, 'w') as f:
+            f.write(raw_settings)
+        extra_kwargs['maven-settings'] = settings_path
+
+    return AnalysisSpec(
+        name,
+        application_data['file_name'],
+        application_data['sources'],
+        application_data['targets'],
+        kwargs=extra_kwargs
+    )
+
+
+def java_analysis_input(tc_name, tc):
+    """
+    Prepares the input application of a `data/java_analysis.json` test case.
+
+    Returns:
+        tuple: (input path, maven settings path or None)
+    """
+    project_path = os.getenv(constants.PROJECT_PATH)
+    input = tc['input']
+    input_path = os.path.join(project_path, "data", "tmp", tc_name)
+    if input.get('git'):
+        if not os.path.exists(input_path):
+            os.system('git clone %s "%s"' % (input['git'], input_path))
+    elif input.get('local'):    # could be absolute, or relative to data/applications
+        input_path = input['local']
+    else:
+        raise Exception("Missing input application")
+
+    settings_path = None
+    # Add settings.xml with credentials needed e.g. by tackle-testapp-public
+    if tc.get('settings'):
+        with open(tc['settings'], 'r') as f:
+            raw_settings = f.read()
+        # Token below is always set in CI, populated on nightlies, but '' on PRs for GH secrets restrictions
+        maven_token = os.getenv(constants.GIT_PASSWORD, '')
+        if maven_token == '':
+            maven_token = get_default_token()
+        raw_settings = raw_settings.replace('GITHUB_USER', os.getenv(constants.GIT_USERNAME, 'konveyor-read-only-bot'))
+        raw_settings = raw_settings.replace('GITHUB_TOKEN', maven_token)
+        settings_path = input_path + "_settings.xml"    # leaving this file in tmp
+        with open(settings_path, 'w') as f:
+            f.write(raw_settings)
+    return input_path, settings_path
@@ -0,0 +1,174 @@
+"""
+Collection-time analysis plan.
+
+Tests declare the analysis they need with the `analysis` marker instead of running kantra themselves:
+
+    @pytest.mark.analysis('administracion_efectivo', rules='data/yaml/01-test-jee.windup.yaml')
+    def test_something(planned_analysis):
+        assert 'Analysis complete!' in planned_analysis.output
+
+When collection is finished, markers of all selected tests are normalized to canonical analysis specs
+(`additional_args` of `run_containerless_parametrize` merged in) and deduplicated, specs still resolving to the same
+kantra command (e.g. via RUN_LOCAL_MODE defaults) are merged once the commands are built. The first test asking for
+`planned_analysis` runs every unique analysis once on the parallel scheduler, every test then gets the RunResult
+of its analysis. If running the plan fails, later tests fail with the same error instead of running it again.
+The output directory is shared by all tests asking for the same analysis, treat it as read-only.
+An analysis asked for by a `no_result_cache` test is always run, bypassing the result cache.
+
+Text a test looks up in the analysis output beyond the default completion markers is declared with `output_patterns`
+(not an analysis option), so it is matched over the full output, not only its bounded tail:
+
+    @pytest.mark.analysis('administracion_efectivo', targets=['wrong'], output_patterns=['Error: unknown target:'])
+"""
+import hashlib
+import json
+import os
+
+import pytest
+
+from utils import constants
+from utils.cache import cache_bypass
+from utils.command import normalize_kwargs
+from utils.common import get_project_path
+from utils.output_root import get_analysis_output_dir, set_base_report_path
+from utils.scheduler import AnalysisSpec, run_analyses
+
+DATASETS = {
+    'analysis': 'data/analysis.json',
+    'dotnet': 'data/dotnet_analysis.json',
+    'golang': 'data/golang_analysis.json',
+    'nodejs': 'data/nodejs_analysis.json',
+    'python': 'data/python_analysis.json',
+}
+
+analysis_plan_key = pytest.StashKey()
+
+
+class AnalysisPlan:
+    """Unique analyses needed by the session and the tests asking for them."""
+
+    def __init__(self):
+        self.analyses = {}      # canonical key -> analysis params
+        self.item_keys = {}     # test nodeid -> canonical key
+        self.output_patterns = {}   # canonical key -> output text looked up by the tests
+        self.uncached = set()       # canonical keys of analyses a `no_result_cache` test asks for
+        self.results = None
+        self.error = None       # exception of a failed run, not retried by later tests
+        self._datasets = {}
+
+    def add(self, item, marker):
+        params = self._get_params(item, marker)
+        output_patterns = params.pop('output_patterns')
+        spec = AnalysisSpec(
+            params['app_name'], params['file_name'], params['sources'], params['targets'],
+            with_deps=params['with_deps'], kwargs=params['kwargs'],
+        )
+        canonical = {'file_name': params['file_name'], 'options': spec.get_options()}
+        key = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+        self.analyses.setdefault(key, params)
+        patterns = self.output_patterns.setdefault(key, [])
+        patterns.extend(pattern for pattern in output_patterns if pattern not in patterns)
+        self.item_keys[item.nodeid] = key
+        if item.get_closest_marker('no_result_cache'):
+            self.uncached.add(key)
+
+    def _get_params(self, item, marker):
+        app_name = marker.args[0]
+        kwargs = dict(marker.kwargs)
+        dataset = kwargs.pop('dataset', 'analysis')
+        application_data = self._get_dataset(dataset)[app_name]
+        sources = kwargs.pop('sources', application_data['sources'])
+        targets = kwargs.pop('targets', application_data['targets'])
+        with_deps = kwargs.pop('with_deps', True)
+        output_patterns = kwargs.pop('output_patterns', ())
+
+        callspec = getattr(item, 'callspec', None)
+        if callspec and 'additional_args' in callspec.params:
+            kwargs.update(callspec.params['additional_args'])
+
+        return {
+            'app_name': app_name,
+            'file_name': application_data['file_name'],
+            'sources': list(sources or []),
+            'targets': list(targets or []),
+            'with_deps': with_deps,
+            'kwargs': normalize_kwargs(kwargs),
+            'output_patterns': list(output_patterns),
+        }
+
+    def _get_dataset(self, dataset):
+        if dataset not in self._datasets:
+            with open(DATASETS[dataset], 'r') as file:
+                self._datasets[dataset] = json.load(file)
+        return self._datasets[dataset]
+
+    def run(self):
+        specs = []
+        for key, params in self.analyses.items():
+            name = '%s-%s' % (params['app_name'], key[:12])
+            # outputs live for the whole session, not in the output root of the test that happens to run them
+            specs.append(AnalysisSpec(
+                name,
+                params['file_name'],
+                params['sources'],
+                params['targets'],
+                output_path=get_analysis_output_dir(name),
+                with_deps=params['with_deps'],
+                kwargs={k: _resolve_project_path(v) for k, v in params['kwargs'].items()},
+                cacheable=key not in self.uncached,
+                output_patterns=tuple(self.output_patterns[key]),
+            ))
+        # the cache bypass is decided per analysis above, not by the test which happens to trigger the plan
+        with cache_bypass(False):
+            results = run_analyses(specs, dedup=True)
+        self.results = {key: results[spec.name] for key, spec in zip(self.analyses, specs)}
+
+    def get_result(self, nodeid):
+        if self.error is not None:
+            pytest.fail("Planned analyses failed in an earlier test: %s" % self.error)
+        if self.results is None:
+            try:
+                self.run()
+            except Exception as e:
+                self.error = e
+                raise
+        return self.results[self.item_keys[nodeid]]
+
+
+def _resolve_project_path(value):
+    """Marker options can use project relative paths (e.g. rules), kantra gets them absolute."""
+    if isinstance(value, str) and value and not os.path.isabs(value):
+        path = os.path.join(get_project_path(), value)
+        if os.path.exists(path):
+            return path
+    return value
+
+
+def pytest_configure(config):
+    set_base_report_path(os.getenv(constants.REPORT_OUTPUT_PATH))
+    config.addinivalue_line(
+        "markers",
+        "analysis(app_name, dataset='analysis', sources=None, targets=None, with_deps=True, output_patterns=(), "
+        "**options): "
+        "kantra analysis the test needs, run once per session and shared through the `planned_analysis` fixture"
+    )
+    config.stash[analysis_plan_key] = AnalysisPlan()
+
+
+def pytest_collection_finish(session):
+    plan = session.config.stash[analysis_plan_key]
+    for item in session.items:
+        marker = item.get_closest_marker('analysis')
+        if marker:
+            plan.add(item, marker)
+    if plan.item_keys:
+        print("\nAnalysis plan: %d tests share %d unique analyses" % (len(plan.item_keys), len(plan.analyses)))
+
+
+@pytest.fixture
+def planned_analysis(request):
+    """RunResult of the analysis declared by the test's `analysis` marker."""
+    plan = request.config.stash[analysis_plan_key]
+    if request.node.nodeid not in plan.item_keys:
+        pytest.fail("Test %s uses planned_analysis without an `analysis` marker" % request.node.nodeid)
+    return plan.get_result(request.node.nodeid)
@@ -0,0 +1,48 @@
+"""
+Isolated output roots, see `utils.output_root`.
+
+    def test_something(isolated_output):
+        # REPORT_OUTPUT_PATH is an empty directory of this test only
+        ...
+
+    @pytest.mark.analysis('administracion_efectivo')
+    def test_read_only(planned_output):
+        # hardlink snapshot of the planned analysis output in the test's own output root
+        ...
+
+With KANTRA_ISOLATED_OUTPUT=true every test gets its own output root, so tests don't share REPORT_OUTPUT_PATH.
+"""
+import os
+
+import pytest
+
+from utils import constants
+from utils.output_root import create_output_root, release_output_root, set_base_report_path, snapshot_dir
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "isolated_output: run the test with its own REPORT_OUTPUT_PATH")
+
+
+@pytest.fixture
+def isolated_output(request, monkeypatch):
+    """Empty output root of the test, set as REPORT_OUTPUT_PATH and removed (in the background) after it."""
+    set_base_report_path(os.getenv(constants.REPORT_OUTPUT_PATH))
+    root = create_output_root(request.node.name)
+    monkeypatch.setenv(constants.REPORT_OUTPUT_PATH, root)
+    yield root
+    release_output_root(root)
+
+
+@pytest.fixture
+def planned_output(planned_analysis, isolated_output):
+    """Snapshot of the planned analysis output in the test's output root, files are shared: read-only."""
+    snapshot_dir(planned_analysis.output_dir, isolated_output)
+    return isolated_output
+
+
+@pytest.fixture(autouse=True)
+def output_isolation(request):
+    if request.node.get_closest_marker("isolated_output") or \
+            os.getenv(constants.KANTRA_ISOLATED_OUTPUT, 'false').lower() in ('true', '1', 'yes'):
+        request.getfixturevalue('isolated_output')
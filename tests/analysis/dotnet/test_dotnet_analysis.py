@@ -34,7 +34,7 @@ def test_hello_world_linux_analysis_with_rules(dotnet_analysis_data):
             }
         )
 
-        output = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, encoding='utf-8').stdout
+        output = subprocess.run(command.argv, check=True, stdout=subprocess.PIPE, encoding='utf-8').stdout
 
         assert 'Static report created' in output
         assert_story_points_from_report_file()
@@ -2,7 +2,7 @@ import os
 
 from utils import constants
 from utils.command import build_analysis_command, run_command_stream_output
-from utils.report import assert_story_points_from_report_file, get_json_from_report_output_js_file
+from utils.report import assert_story_points_from_report_file, get_analysis_report
 
 
 # Polarion TC MTA-533, MTA-544
@@ -24,9 +24,11 @@ def test_go_provider_analysis_with_app(golang_analysis_data):
     assert 'Analysis complete!' in output
     assert_story_points_from_report_file()
 
-    report_data = get_json_from_report_output_js_file()
+    report = get_analysis_report()
+    report.assert_consistent()
 
-    ruleset = next((item for item in report_data['rulesets'] if item.get('description') == 'temp ruleset'), None)
+    # the static report is checked, output.yaml reports the same incidents (see assert_consistent)
+    ruleset = next((item for item in report.app['rulesets'] if item.get('description') == 'temp ruleset'), None)
 
     assert ruleset is not None, "Ruleset property not found in output"
     assert len(ruleset.get('skipped', [])) == 0, "Custom Rule was skipped"
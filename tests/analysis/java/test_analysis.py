@@ -32,12 +32,13 @@ def test_bvp_issue_analyzer_901(application_data):
 
     # Parsing report and reference
     report_data = normalize_output(
-        get_dict_from_output_yaml_file(),
+        get_dict_from_output_yaml_file(mutable=True),
         os.path.join(os.getenv(constants.PROJECT_PATH), 'data', 'applications', application_data['filename'])
     )
     reference_data = get_dict_from_output_yaml_file(
         filename="output.yaml",
-        report_path=reference_data_path
+        report_path=reference_data_path,
+        mutable=True
     )
 
     reference_data = normalize_output(
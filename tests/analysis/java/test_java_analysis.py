@@ -14,37 +14,14 @@ from utils.report import assert_story_points_from_report_file, get_dict_from_out
 
 @run_containerless_parametrize
 @pytest.mark.parametrize('app_name', json.load(open("data/analysis.json")))
-def test_standard_analysis(app_name, analysis_data, additional_args):
-    application_data = analysis_data[app_name]
-
-    extra_kwargs = dict(additional_args)
-    # Add settings.xml with credentials needed e.g. by tackle-testapp-public
-    if application_data.get('maven_settings'):
-        with open(application_data['maven_settings'], 'r') as f:
-            raw_settings = f.read()
-        maven_token = os.getenv(constants.GIT_PASSWORD, '')
-        if maven_token == '':
-            maven_token = get_default_token()
-        raw_settings = raw_settings.replace('GITHUB_USER', os.getenv(constants.GIT_USERNAME, 'konveyor-read-only-bot'))
-        raw_settings = raw_settings.replace('GITHUB_TOKEN', maven_token)
-        input_path = os.path.join(os.getenv(constants.PROJECT_PATH), 'data', 'applications', application_data['file_name'])
-        settings_path = input_path + "_settings.xml"  
-        with open(settings_path, 'w') as f:
-            f.write(raw_settings)
-        extra_kwargs['maven-settings'] = settings_path
+def test_standard_analysis(app_name, additional_args, standard_analysis_results, request):
+    # All collected standard analyses are run in parallel by the session fixture, see fixtures/analysis.py
+    result = standard_analysis_results[request.node.callspec.id]
 
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        application_data['targets'],
-        **extra_kwargs
-    )
+    assert result.ok, "Analysis failed with exit code %d: %s" % (result.returncode, str(result.output)[-2000:])
+    assert 'analysis complete' in result.output.lower(), "Expected 'Analysis complete!' in Kantra output"
 
-    output = run_command_stream_output(command)
-
-    assert 'analysis complete' in output.lower(), "Expected 'Analysis complete!' in Kantra output"
-
-    assert_story_points_from_report_file()
+    assert_story_points_from_report_file(report_path=result.output_dir)
 
 # Polarion TC 588
 def test_java_analysis_without_pom(analysis_data):
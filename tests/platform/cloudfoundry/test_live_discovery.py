@@ -132,7 +132,7 @@ def test_cf_asset_generation_from_live_discovery():
     # Perform live discovery of Cloud Foundry(CF) application manifest
     # Input: CF application manifest, Output: Discovery manifest
     print(f"Running discovery command: '{discovery_command}'")
-    discovery_output = subprocess.run(shlex.split(discovery_command), check=True, stdout=subprocess.PIPE,
+    discovery_output = subprocess.run(discovery_command.argv, check=True, stdout=subprocess.PIPE,
         text=True).stdout
     assert 'Writing content to file' in discovery_output, "Discovery command failed"
 
@@ -151,7 +151,7 @@ def test_cf_asset_generation_from_live_discovery():
     asset_command = build_asset_generation_command(input_file=input_manifest, chart_dir=chart_dir, output_dir=asset_dir)
 
     print(f"Running asset generation command: '{asset_command}'")
-    subprocess.run(shlex.split(asset_command), check=True, stdout=subprocess.PIPE, text=True)
+    subprocess.run(asset_command.argv, check=True, stdout=subprocess.PIPE, text=True)
     asset_files = glob.glob(f'{asset_dir}/*.yaml')
     assert asset_files, f"Assets were not generated in {asset_dir}"
 
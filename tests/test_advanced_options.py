@@ -4,29 +4,23 @@ import subprocess
 import sys
 import time
 
+import pytest
+
 from utils import constants
 from utils.command import build_analysis_command, build_discovery_command, run_command_stream_output
 from utils.common import run_containerless_parametrize, verify_triggered_rules, verify_triggered_yaml_rules
 from utils.manage_maven_credentials import manage_credentials_in_maven_xml
+from utils.scheduler import AnalysisSpec, run_analyses, run_commands
 from utils.report import assert_story_points_from_report_file, get_json_from_report_output_js_file, clearReportDir, \
-    get_dict_from_output_yaml_file
+    get_dict_from_output_yaml_file, get_report_portfolio
 
 
 # Polarion TC 373
-def test_skip_report(analysis_data):
-    application_data = analysis_data['administracion_efectivo']
-    report_path = os.getenv(constants.REPORT_OUTPUT_PATH)
-
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        application_data['targets'],
-        **{'skip-static-report': ''}
-    )
+@pytest.mark.analysis('administracion_efectivo', **{'skip-static-report': ''})
+def test_skip_report(planned_analysis, planned_output):
+    report_path = planned_output
 
-    output = run_command_stream_output(command)
-
-    assert 'Analysis complete!' in output
+    assert 'Analysis complete!' in planned_analysis.output
 
     assert os.path.exists(report_path + '/static-report/index.html') is False
     assert os.path.exists(report_path + '/output.yaml') is True
@@ -34,41 +28,21 @@ def test_skip_report(analysis_data):
 
 
 # Polarion TC 374
-def test_custom_rules(analysis_data):
-    application_data = analysis_data['administracion_efectivo']
-    custom_rule_path = os.path.join(os.getenv(constants.PROJECT_PATH), 'data', 'yaml', '01-test-jee.windup.yaml')
+@pytest.mark.analysis('administracion_efectivo', rules='data/yaml/01-test-jee.windup.yaml')
+def test_custom_rules(planned_analysis, planned_output):
+    assert 'Analysis complete!' in planned_analysis.output
+    assert_story_points_from_report_file(report_path=planned_output)
 
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        application_data['targets'],
-        **{'rules': custom_rule_path}
-    )
-
-    output = run_command_stream_output(command)
-
-    assert 'Analysis complete!' in output
-    assert_story_points_from_report_file()
-
-    report_data = get_json_from_report_output_js_file()
+    report_data = get_json_from_report_output_js_file(report_path=planned_output)
     verify_triggered_rules(report_data, ['Test-002-00001'])
 
 # Automates Bug 4784
-def test_description_display_in_report(analysis_data):
-    application_data = analysis_data['administracion_efectivo']
-
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        ""
-    )
-
-    output = run_command_stream_output(command)
+@pytest.mark.analysis('administracion_efectivo', targets=[])
+def test_description_display_in_report(planned_analysis, planned_output):
+    assert 'Analysis complete!' in planned_analysis.output
+    assert_story_points_from_report_file(report_path=planned_output)
 
-    assert 'Analysis complete!' in output
-    assert_story_points_from_report_file()
-
-    report_data = get_json_from_report_output_js_file()
+    report_data = get_json_from_report_output_js_file(report_path=planned_output)
     ruleset = next(
         (ruleset for ruleset in report_data["rulesets"] if "singleton-sessionbean-00001" in ruleset.get("violations", {})),
         None
@@ -78,29 +52,32 @@ def test_description_display_in_report(analysis_data):
 
 
 @run_containerless_parametrize
+@pytest.mark.isolated_output
 def test_bulk_analysis(analysis_data, additional_args):
     applications = [analysis_data['administracion_efectivo'], analysis_data['tackle-testapp-project']]
     clearReportDir()
 
-    for application in applications:
-        command = build_analysis_command(
+    # Bulk runs share the report dir, so the scheduler keeps them in order, one after another
+    specs = [
+        AnalysisSpec(
+            application['app_name'],
             application['file_name'],
             application['sources'],
             application['targets'],
-            True,
-            **additional_args
+            is_bulk=True,
+            output_path=os.getenv(constants.REPORT_OUTPUT_PATH),
+            kwargs=dict(additional_args)
         )
-        output = run_command_stream_output(command)
-
-        assert 'Analysis complete!' in output
+        for application in applications
+    ]
+    for result in run_analyses(specs).values():
+        assert 'Analysis complete!' in result.output, "Analysis of %s failed: %s" % (result.name, str(result.output)[-2000:])
 
-    report_data = get_json_from_report_output_js_file(False)
-    assert len(report_data) >= 2, "Less than 2 application analysis detected"
-    for current_report in report_data:
-        assert len(current_report['rulesets']) >= 0, "No rulesets were applied"
-        assert len(current_report['depItems']) >= 0, "No dependencies were found"
-        violations = [item for item in current_report['rulesets'] if item.get('violations')]
-        assert len(violations) > 0, "No issues were found"
+    with get_report_portfolio() as portfolio:
+        assert portfolio.query_value("SELECT COUNT(*) FROM apps") >= 2, "Less than 2 application analysis detected"
+        apps_without_issues = portfolio.query(
+            "SELECT name FROM apps WHERE id NOT IN (SELECT app FROM violations WHERE kind = 'violation')")
+        assert not apps_without_issues, "No issues were found in %s" % apps_without_issues
 
 
 # Validation for Jira ticket MTA-3779
@@ -145,8 +122,7 @@ def test_no_container_leftovers(analysis_data):
     )
 
     process = subprocess.Popen(
-        command,
-        shell=True,
+        command.argv,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         encoding='utf-8'
@@ -189,9 +165,14 @@ def test_language_discovery(analysis_data, python_analysis_data, golang_analysis
         golang_analysis_data["golang_app"],
         nodejs_analysis_data["nodejs_app_project"]
     ]
+    results = run_commands({
+        application_data['app_name']: build_discovery_command(application_data['file_name'])
+        for application_data in applications_data
+    })
     for application_data in applications_data:
-        command = build_discovery_command(application_data['file_name'])
-        output = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, encoding='utf-8').stdout
+        result = results[application_data['app_name']]
+        assert result.ok, "Language discovery failed for %s: %s" % (result.name, result.output)
+        output = result.output
         for language in application_data["languages"]:
             assert language in output, f"Language {language} was not detected in the {application_data['app_name']} app"
 
@@ -6,24 +6,14 @@ from utils import constants
 from utils.command import build_analysis_command, run_command_stream_output
 from utils.common import run_containerless_parametrize
 from utils.manage_maven_credentials import manage_credentials_in_maven_xml
-from utils.report import assert_insights_from_report_file, get_json_from_report_output_js_file
+from utils.report import assert_insights_from_report_file, get_analysis_report
 
 # Polarion TC 598
 @run_containerless_parametrize
-def test_insights_binary_app(analysis_data, additional_args):
-    application_data = analysis_data['administracion_efectivo']
-
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        application_data['targets'],
-        **additional_args
-    )
-
-    output = run_command_stream_output(command)
-
-    assert 'analysis complete' in output.lower(), "Expected 'Analysis complete!' in Kantra output"
-    assert_insights_from_report_file()
+@pytest.mark.analysis('administracion_efectivo')
+def test_insights_binary_app(planned_analysis, planned_output, additional_args):
+    assert 'analysis complete' in planned_analysis.output.lower(), "Expected 'Analysis complete!' in Kantra output"
+    assert_insights_from_report_file(report_path=planned_output)
 
 # Polarion TC 576, 577, 578, 589, 606
 @run_containerless_parametrize
@@ -68,8 +58,7 @@ def test_insights_custom_rules(analysis_data, analysis_mode, additional_args):
     output = run_command_stream_output(command)
     assert 'analysis complete' in output.lower(), "Expected 'Analysis complete!' in Kantra output"
 
-    report_data = get_json_from_report_output_js_file()
-    for rule in report_data['rulesets']:
+    for rule in get_analysis_report().app['rulesets']:
         insights = rule.get('insights', {})
 
         for insight in insights.values():
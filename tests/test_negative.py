@@ -1,56 +1,22 @@
-import subprocess
+import pytest
 
-from utils.command import build_analysis_command
 from utils.common import run_containerless_parametrize
 
 
 @run_containerless_parametrize
-def test_analysis_wrong_target(analysis_data, additional_args):
-    application_data = analysis_data['administracion_efectivo']
+@pytest.mark.analysis('administracion_efectivo', targets=['some_wrong_target'],
+                      output_patterns=['Error: unknown target:'])
+def test_analysis_wrong_target(planned_analysis, additional_args):
+    assert planned_analysis.returncode != 0
 
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        "some_wrong_target",
-        **additional_args
-    )
-
-    process = subprocess.run(
-        command,
-        shell=True,
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        encoding='utf-8'
-    )
-
-    assert process.returncode != 0
-
-    assert 'Error: unknown target:' in process.stderr
+    assert 'Error: unknown target:' in planned_analysis.output
 
 # Automates Bug MTA-4951
 @run_containerless_parametrize
-def test_analysis_wrong_custom_rule(analysis_data, additional_args):
-    application_data = analysis_data['administracion_efectivo']
-
-    command = build_analysis_command(
-        application_data['file_name'],
-        application_data['sources'],
-        "",
-        **{'rules': "/an/invalid/path"}
-
-    )
-
-    process = subprocess.run(
-        command,
-        shell=True,
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        encoding='utf-8'
-    )
-
-    assert process.returncode != 0
+@pytest.mark.analysis('administracion_efectivo', targets=[], rules="/an/invalid/path",
+                      output_patterns=['failed to stat rules at path'])
+def test_analysis_wrong_custom_rule(planned_analysis, additional_args):
+    assert planned_analysis.returncode != 0
 
-    assert 'failed to stat rules at path' in process.stderr
+    assert 'failed to stat rules at path' in planned_analysis.output
 
@@ -1,6 +1,5 @@
 import json
 import os
-import shutil
 import subprocess
 import zipfile
 
@@ -9,6 +8,7 @@ import yaml
 from jsonschema.exceptions import ValidationError
 
 from utils import constants
+from utils.recycler import recycle_dir
 from jsonschema import validate
 
 
@@ -20,12 +20,13 @@ from jsonschema import validate
     reason="Kantra transform container has /tmp permission denied (cp to /tmp/source-app); skip in CI until fixed",
 )
 @pytest.mark.parametrize('transformation_name', json.load(open("data/openrewrite_transformation.json")))
+@pytest.mark.isolated_output
 def test_transform_code_with_openrewrite(transformation_name, openrewrite_transformation_data):
     application_data = openrewrite_transformation_data[transformation_name]
     kantra_path = os.getenv(constants.KANTRA_CLI_PATH)
     extraction_path = os.getenv(constants.REPORT_OUTPUT_PATH)
 
-    shutil.rmtree(extraction_path)
+    recycle_dir(extraction_path)
 
     application_path = os.path.join(os.getenv(constants.PROJECT_PATH), 'data/applications', application_data['file_name'])
     extracted_app_path = os.path.join(os.getenv(constants.REPORT_OUTPUT_PATH), application_data['app_name'])
@@ -0,0 +1,158 @@
+"""
+Single access point to the artifacts of an analysis output directory.
+
+`AnalysisReport` parses output.yaml, static-report/output.js and dependencies.yaml lazily, at most once each
+(through the process-wide report cache, see `utils.report_cache`), and exposes rulesets, violations, insights,
+depItems and dependencies whatever the artifact they come from:
+
+    report = AnalysisReport(report_path)
+    assert 'file-001' in report.violations
+    report.assert_consistent()
+
+The consistency check compares the digest of incident counts per rule of output.yaml (from its cached summary,
+see `utils.report_summary`) with the one recorded in the output.js index (see `utils.output_js`), the applications
+are only decoded again to describe the differences when the digests don't match.
+"""
+import os
+
+from utils.output_js import get_apps_index, get_output_js_path, load_app, load_first_app
+from utils.report_cache import freeze, get_report_cache, load_frozen_yaml
+from utils.report_summary import count_incidents_by_rule, get_incidents_digest, get_summary
+
+
+class AnalysisReport:
+    """
+    Lazily parsed artifacts of an analysis output directory, all returned data is read-only.
+
+    Attributes:
+        report_path (str): analysis output directory
+        output_path (str): path to output.yaml
+        output_js_path (str): path to static-report/output.js
+        dependencies_path (str): path to dependencies.yaml
+        app_name (str): name or id of the output.js application matching output.yaml, the first one if None
+    """
+
+    def __init__(self, report_path, filename='output.yaml', app=None):
+        """
+        Args:
+            report_path (str): analysis output directory
+            filename (str): output file name, it can differ in case of bulk analysis
+            app (str): name or id of the output.js application of a bulk analysis matching `filename`
+        """
+        self.report_path = report_path
+        self.output_path = os.path.join(report_path, filename)
+        self.output_js_path = get_output_js_path(report_path)
+        self.dependencies_path = os.path.join(report_path, 'dependencies.yaml')
+        self.app_name = app
+        self._artifacts = {}
+
+    def _load(self, path, kind, loader):
+        key = (path, kind)
+        if key not in self._artifacts:
+            self._artifacts[key] = get_report_cache().get(path, kind, loader)
+        return self._artifacts[key]
+
+    @property
+    def output(self):
+        """Parsed output.yaml, a list of rulesets."""
+        return self._load(self.output_path, 'yaml', load_frozen_yaml)
+
+    @property
+    def app(self):
+        """The output.js application, only this one is decoded."""
+        if self.app_name is None:
+            return self._load(self.output_js_path, 'output.js:first', lambda path: freeze(load_first_app(path)))
+        return self._load(self.output_js_path, 'output.js:' + self.app_name,
+                          lambda path: freeze(load_app(path, self.app_name)))
+
+    @property
+    def dependencies(self):
+        """Parsed dependencies.yaml, a list of dependency sets (empty if the analysis didn't write it)."""
+        if not os.path.exists(self.dependencies_path):
+            return []
+        return self._load(self.dependencies_path, 'yaml', load_frozen_yaml) or []
+
+    @property
+    def rulesets(self):
+        """Rulesets of output.yaml, of the output.js application if there is no output.yaml."""
+        if os.path.exists(self.output_path):
+            return self.output or []
+        return self.app.get('rulesets') or []
+
+    @property
+    def violations(self):
+        """dict: rule ID -> violation, across all rulesets (the first ruleset wins for a rule ID used by several)."""
+        return self._merge('violations')
+
+    @property
+    def insights(self):
+        """dict: rule ID -> insight, across all rulesets."""
+        return self._merge('insights')
+
+    @property
+    def dep_items(self):
+        """depItems of the output.js application."""
+        return self.app.get('depItems') or []
+
+    @property
+    def summary(self):
+        """Summary of output.yaml, see `utils.report_summary.compute_summary`."""
+        return get_summary(self.output_path)
+
+    def _merge(self, field):
+        merged = {}
+        for ruleset in self.rulesets:
+            items = ruleset.get(field) or {}
+            if isinstance(items, dict):
+                for rule_id, violation in items.items():
+                    merged.setdefault(rule_id, violation)
+        return merged
+
+    def get_ruleset(self, name=None, description=None):
+        """Returns the first ruleset with the given name and/or description, None if there is none."""
+        for ruleset in self.rulesets:
+            if name is not None and ruleset.get('name') != name:
+                continue
+            if description is not None and ruleset.get('description') != description:
+                continue
+            return ruleset
+        return None
+
+    def _get_app_index_entry(self):
+        index = get_apps_index(self.output_js_path)
+        for entry in index:
+            if self.app_name is None or self.app_name in (entry['name'], entry['id']):
+                return entry
+        raise KeyError("Report data file %s has no application %s" % (self.output_js_path, self.app_name or ''))
+
+    def check_consistency(self):
+        """
+        Compares incident counts per rule of output.yaml and of the output.js application.
+
+        Returns:
+            list: descriptions of the differences, empty if the counts match
+        """
+        yaml_counts = self.summary['incidents_by_rule']
+        entry = self._get_app_index_entry()
+        if get_incidents_digest(yaml_counts) == entry['incidents_digest']:
+            return []
+
+        js_counts = count_incidents_by_rule(self.app.get('rulesets') or [])
+        differences = []
+        for rule in sorted(set(yaml_counts) | set(js_counts)):
+            yaml_count, js_count = yaml_counts.get(rule, 0), js_counts.get(rule, 0)
+            if yaml_count != js_count:
+                differences.append("%s: %d incidents in %s, %d in %s"
+                                   % (rule, yaml_count, os.path.basename(self.output_path), js_count,
+                                      os.path.basename(self.output_js_path)))
+        return differences
+
+    def assert_consistent(self):
+        """
+        Asserts output.yaml and output.js report the same incident counts per rule.
+
+        Raises:
+            AssertionError: If the counts differ.
+        """
+        differences = self.check_consistency()
+        assert not differences, "Analysis output and static report differ:\n" + "\n".join(differences)
@@ -0,0 +1,281 @@
+import asyncio
+import codecs
+import os
+import subprocess
+import sys
+import time
+
+from utils.capture import OutputCapture
+from utils.command import KantraCommand, RunResult, _USE_PTY, _safe_stdout_write
+from utils.phases import PhaseTracker, record
+from utils.profiler import PROFILE_FILE_NAME, ProcessTreeProfiler, write_profile
+from utils.watchdog import KILL_POLL_INTERVAL, POPEN_KWARGS, STOP_SIGNALS, Watchdog, force_kill_process_tree, \
+    get_diagnostics, get_kill_grace_period, is_process_tree_alive, signal_process_tree
+
+
+class _LineWriter:
+    """Decodes output chunks of one run and echoes them line by line with the run prefix."""
+
+    def __init__(self, prefix, echo, capture=None):
+        self.prefix = prefix
+        self.echo = echo
+        self.capture = capture
+        self.phases = PhaseTracker()
+        self.watchdog = Watchdog.from_env()
+        self.timed_out = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.partial = ''
+        self.chunks = []
+        self.sink = self.chunks.append if capture is None else capture.write
+
+    def feed(self, data, final=False):
+        if data:
+            self.watchdog.feed()
+        decoded = self.decoder.decode(data, final=final)
+        if decoded:
+            self.phases.feed(decoded)
+            self.sink(decoded)
+        if not self.echo:
+            return
+        text = self.partial + decoded
+        lines = text.splitlines(keepends=True)
+        self.partial = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        if lines:
+            _safe_stdout_write(''.join(self.prefix + line for line in lines))
+            sys.stdout.flush()
+
+    def close(self):
+        self.feed(b'', final=True)
+        if self.echo and self.partial:
+            _safe_stdout_write(self.prefix + self.partial + '\n')
+            sys.stdout.flush()
+        if self.capture is not None:
+            return self.capture.close()
+        return ''.join(self.chunks)
+
+
+class MultiplexedRunner:
+    """
+    Runs many kantra child processes from a single asyncio event loop.
+
+    Each child gets its own PTY (on Unix) or pipe, its output lines are echoed with a `[name] ` prefix
+    and every run has its own completion future resolving to a RunResult.
+    Runs with an output dir keep their output in a bounded OutputCapture spilled to that dir.
+    If `profile_interval` is set, runs with an output dir also get a resource profile of their process tree
+    (`<output dir>/profile.json`), sampled from the event loop as well.
+    A run exceeding KANTRA_RUN_TIMEOUT or silent for KANTRA_STALL_TIMEOUT seconds gets its process group killed,
+    its RunResult has `timed_out` set and the diagnostics (see utils.watchdog) appended to the output.
+    """
+
+    def __init__(self, max_concurrent=None, echo=True, use_pty=_USE_PTY, profile_interval=None):
+        self.semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self.echo = echo
+        self.use_pty = use_pty
+        self.profile_interval = profile_interval
+        self.runs = {}
+
+    def start(self, name, command, output_dir=None, patterns=()):
+        """Schedules a command and returns its completion future (an asyncio.Task resolving to RunResult)."""
+        if name in self.runs:
+            raise Exception("Run `%s` was already started" % name)
+        self.runs[name] = asyncio.ensure_future(self.run(name, command, output_dir, patterns))
+        return self.runs[name]
+
+    async def wait(self):
+        """Waits for all started runs and returns dict run name -> RunResult."""
+        results = await asyncio.gather(*self.runs.values())
+        return {result.name: result for result in results}
+
+    async def run(self, name, command, output_dir=None, patterns=()):
+        if self.semaphore:
+            async with self.semaphore:
+                return await self._run(name, command, output_dir, patterns)
+        return await self._run(name, command, output_dir, patterns)
+
+    async def _run(self, name, command, output_dir, patterns):
+        capture = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            capture = OutputCapture.for_output_dir(output_dir, name, patterns)
+        writer = _LineWriter('[%s] ' % name, self.echo, capture)
+        profile_path = os.path.join(output_dir, PROFILE_FILE_NAME) if output_dir and self.profile_interval else None
+        started = time.time()
+        if self.use_pty:
+            returncode = await self._run_pty(command, writer, profile_path)
+        else:
+            returncode = await self._run_pipe(command, writer, profile_path)
+        if writer.timed_out:
+            reason, diagnostics = writer.timed_out
+            message = "\nKilled %s %s\n%s\n" % (name, reason, diagnostics)
+            writer.feed(message.encode('utf-8'))
+        output = writer.close()
+        phases = writer.phases.finish()
+        record(name, phases)
+        return RunResult(name, command, returncode, output, output_dir, started, time.time(), phases=phases,
+                         timed_out=writer.timed_out[0] if writer.timed_out else None)
+
+    async def _run_pipe(self, command, writer, profile_path=None):
+        proc = await _create_subprocess(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        profiling = self._start_profiler(proc, profile_path)
+        watch = asyncio.ensure_future(_watch(proc, command, writer))
+        while True:
+            data = await proc.stdout.read(4096)
+            if not data:
+                break
+            writer.feed(data)
+        returncode = await proc.wait()
+        watch.cancel()
+        await _stop_profiler(profiling, profile_path)
+        return returncode
+
+    async def _run_pty(self, command, writer, profile_path=None):
+        import pty
+        loop = asyncio.get_running_loop()
+        master, slave = pty.openpty()
+        try:
+            proc = await _create_subprocess(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=slave,
+                stderr=slave,
+            )
+        except Exception:
+            os.close(slave)
+            os.close(master)
+            raise
+        os.close(slave)
+        profiling = self._start_profiler(proc, profile_path)
+        watch = asyncio.ensure_future(_watch(proc, command, writer))
+
+        eof = loop.create_future()
+
+        def on_readable():
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                data = b''
+            if data:
+                writer.feed(data)
+            elif not eof.done():
+                eof.set_result(None)
+
+        loop.add_reader(master, on_readable)
+        try:
+            await eof
+        finally:
+            loop.remove_reader(master)
+            os.close(master)
+        returncode = await proc.wait()
+        watch.cancel()
+        await _stop_profiler(profiling, profile_path)
+        return returncode
+
+    def _start_profiler(self, proc, profile_path):
+        if not profile_path:
+            return None
+        profiler = ProcessTreeProfiler(proc.pid, self.profile_interval)
+        return profiler, asyncio.ensure_future(_sample(profiler))
+
+
+async def _watch(proc, command, writer):
+    """Kills the process group of a run once its watchdog expires, the diagnostics are kept on the writer."""
+    watchdog = writer.watchdog
+    while True:
+        remaining = watchdog.remaining()
+        if remaining is None:
+            return
+        await asyncio.sleep(max(remaining, 0.05))
+        expired = watchdog.expired()
+        if expired:
+            output_dir = command.get('output') if isinstance(command, KantraCommand) else None
+            recent_output = writer.capture.tail if writer.capture is not None else ''.join(writer.chunks[-200:])
+            writer.timed_out = (expired[0], get_diagnostics(proc.pid, recent_output, output_dir))
+            # shielded: the run exiting on the first signal cancels the watch, its helpers may still need the next ones
+            await asyncio.shield(_kill_process_tree(proc))
+            return
+
+
+async def _kill_process_tree(proc):
+    """`utils.watchdog.kill_process_tree` without blocking the event loop during the grace periods."""
+    grace_period = get_kill_grace_period()
+    for sig in STOP_SIGNALS:
+        if not signal_process_tree(proc, sig):
+            return
+        deadline = time.monotonic() + grace_period
+        while is_process_tree_alive(proc):
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(KILL_POLL_INTERVAL)
+        else:
+            return
+    force_kill_process_tree(proc)
+
+
+async def _sample(profiler):
+    while True:
+        profiler.sample()
+        await asyncio.sleep(profiler.interval)
+
+
+async def _stop_profiler(profiling, profile_path):
+    if not profiling:
+        return
+    profiler, task = profiling
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    write_profile(profiler.get_profile(), profile_path)
+
+
+async def _create_subprocess(command, **kwargs):
+    """KantraCommand is executed from its argv without a shell, plain strings through the shell."""
+    if isinstance(command, KantraCommand):
+        return await asyncio.create_subprocess_exec(*command.argv, **kwargs, **POPEN_KWARGS)
+    return await asyncio.create_subprocess_shell(command, **kwargs, **POPEN_KWARGS)
+
+
+def run_commands_multiplexed(commands, max_concurrent=None, echo=True):
+    """
+    Runs named commands concurrently from one event loop (no thread per child).
+
+    Args:
+        commands (dict): run name -> command
+        max_concurrent (int): max number of children running at once, unlimited if not set
+        echo (bool): echo prefixed output lines to stdout
+
+    Returns:
+        dict: run name -> RunResult, in the order of `commands`
+    """
+    return run_command_groups([[(name, command, None, ())] for name, command in commands.items()], max_concurrent, echo)
+
+
+def run_command_groups(groups, max_concurrent=None, echo=True, profile_interval=None):
+    """
+    Runs groups of commands from one event loop, groups run concurrently, commands within a group one after another.
+
+    Args:
+        groups (list): list of lists of (run name, command, output dir or None, output patterns),
+            see `OutputCapture.for_output_dir`
+        max_concurrent (int): max number of children running at once, unlimited if not set
+        echo (bool): echo prefixed output lines to stdout
+        profile_interval (float): resource profile sampling interval in seconds for runs with an output dir,
+            no profiling if not set
+
+    Returns:
+        dict: run name -> RunResult, in the order of `groups`
+    """
+    async def run_group(runner, group):
+        return [await runner.run(name, command, output_dir, patterns) for name, command, output_dir, patterns in group]
+
+    async def main():
+        runner = MultiplexedRunner(max_concurrent, echo, profile_interval=profile_interval)
+        return await asyncio.gather(*(run_group(runner, group) for group in groups))
+
+    return {result.name: result for group_results in asyncio.run(main()) for result in group_results}
@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import statistics
+
+from utils import constants
+from utils.capture import is_spill_file
+from utils.profiler import PROFILE_FILE_NAME
+
+DEFAULT_RUNS = 3
+DEFAULT_THRESHOLD = 0.2
+METRICS = ('wall_time', 'peak_rss', 'output_size')
+RESULTS_FILE_NAME = 'benchmark-results.json'
+
+# Files written by the harness itself, not part of the measured kantra output
+_HARNESS_FILES = (PROFILE_FILE_NAME,)
+
+
+def get_runs():
+    """Number of repetitions of each benchmark case (KANTRA_BENCHMARK_RUNS env variable)."""
+    return max(1, int(os.getenv(constants.KANTRA_BENCHMARK_RUNS, DEFAULT_RUNS)))
+
+
+def get_threshold():
+    """Max allowed relative slowdown of a median over the baseline (KANTRA_BENCHMARK_THRESHOLD env variable)."""
+    return float(os.getenv(constants.KANTRA_BENCHMARK_THRESHOLD, DEFAULT_THRESHOLD))
+
+
+def get_baseline_path():
+    """Baseline file (KANTRA_BENCHMARK_BASELINE env variable), defaults to benchmarks/baselines/latest.json."""
+    return os.getenv(constants.KANTRA_BENCHMARK_BASELINE) or os.path.join('benchmarks', 'baselines', 'latest.json')
+
+
+def median(values):
+    return statistics.median(values)
+
+
+def iqr(values):
+    """Interquartile range, 0 for less than 2 values."""
+    if len(values) < 2:
+        return 0.0
+    q1, _, q3 = statistics.quantiles(values, n=4, method='inclusive')
+    return q3 - q1
+
+
+def bootstrap_ci(current, baseline, confidence=0.95, resamples=2000, seed=0):
+    """
+    Bootstrap confidence interval of the relative difference of medians `(current - baseline) / baseline`.
+
+    Args:
+        current (list): measured values
+        baseline (list): baseline values
+        confidence (float): confidence level of the interval
+        resamples (int): number of bootstrap resamples
+        seed (int): random seed, the interval is reproducible for the same inputs
+
+    Returns:
+        tuple: (low, high) relative difference, e.g. (0.05, 0.3) means 5% to 30% worse than the baseline
+    """
+    rng = random.Random(seed)
+    diffs = []
+    for _ in range(resamples):
+        base = median(rng.choices(baseline, k=len(baseline)))
+        cur = median(rng.choices(current, k=len(current)))
+        diffs.append((cur - base) / base if base else 0.0)
+    diffs.sort()
+    tail = (1 - confidence) / 2
+    low = diffs[int(tail * (resamples - 1))]
+    high = diffs[int((1 - tail) * (resamples - 1))]
+    return low, high
+
+
+def compare(current, baseline, threshold):
+    """
+    Compares samples of one metric against the baseline.
+
+    The metric regressed if its median is over the baseline median by more than `threshold`
+    and the whole confidence interval of the difference is above zero, i.e. it is not just noise.
+
+    Returns:
+        dict: medians, IQRs, relative difference, confidence interval and the `regressed` flag
+    """
+    current_median, baseline_median = median(current), median(baseline)
+    change = (current_median - baseline_median) / baseline_median if baseline_median else 0.0
+    low, high = bootstrap_ci(current, baseline)
+    return {
+        'median': current_median,
+        'iqr': iqr(current),
+        'baseline_median': baseline_median,
+        'baseline_iqr': iqr(baseline),
+        'change': change,
+        'ci': (low, high),
+        'regressed': change > threshold and low > 0,
+    }
+
+
+def output_size(output_dir):
+    """Total size in bytes of the kantra output directory, harness files excluded."""
+    size = 0
+    for root, _, files in os.walk(output_dir):
+        for filename in files:
+            if root == output_dir and (filename in _HARNESS_FILES or is_spill_file(filename)):
+                continue
+            size += os.path.getsize(os.path.join(root, filename))
+    return size
+
+
+def load_baseline(path):
+    """Returns dict case id -> metric -> list of samples, empty if the baseline doesn't exist yet."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    """Stores measured samples in the baseline format, so a results file can be committed as a new baseline."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def format_comparison(case_id, metric, comparison):
+    return "%s %s: median %.4g (IQR %.3g), baseline %.4g, change %+.1f%% (95%% CI %+.1f%% .. %+.1f%%)%s" % (
+        case_id, metric, comparison['median'], comparison['iqr'], comparison['baseline_median'],
+        comparison['change'] * 100, comparison['ci'][0] * 100, comparison['ci'][1] * 100,
+        ' REGRESSION' if comparison['regressed'] else '')
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import constants
+
+DEFAULT_MAX_SIZE_MB = 2048
+META_FILE_NAME = 'cache-meta.json'
+
+_file_digests = {}
+_bypass = threading.local()
+_lock = threading.Lock()
+
+
+def get_cache_dir():
+    """Returns the analysis result cache dir (KANTRA_CACHE_DIR env variable), None means the cache is disabled."""
+    if os.getenv(constants.KANTRA_CACHE_BYPASS, 'false').lower() in ('true', '1', 'yes'):
+        return None
+    if getattr(_bypass, 'active', False):
+        return None
+    return os.getenv(constants.KANTRA_CACHE_DIR) or None
+
+
+def get_cache_max_size():
+    """Max total size of the cache in bytes (KANTRA_CACHE_MAX_SIZE env variable in MB)."""
+    return int(os.getenv(constants.KANTRA_CACHE_MAX_SIZE, DEFAULT_MAX_SIZE_MB)) * 1024 * 1024
+
+
+@contextmanager
+def cache_bypass(active):
+    """Sets whether analyses started from the current thread bypass the cache, the previous state is restored on exit."""
+    previous = getattr(_bypass, 'active', False)
+    _bypass.active = active
+    try:
+        yield
+    finally:
+        _bypass.active = previous
+
+
+def cache_disabled():
+    """Bypasses the cache for analyses started from the current thread, for tests that must exercise the real binary."""
+    return cache_bypass(True)
+
+
+def file_digest(path):
+    """sha256 of a file content, memoized on (path, mtime, size)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+        digest = _file_digests[memo_key] = h.hexdigest()
+    return digest
+
+
+def path_digest(path):
+    """sha256 over a file, or over relative paths and contents of all files in a directory tree (.git excluded)."""
+    if os.path.isfile(path):
+        return file_digest(path)
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != '.git')
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(file_path, path).replace('\\', '/')
+            h.update(rel_path.encode('utf-8') + b'\0' + file_digest(file_path).encode('ascii') + b'\n')
+    return h.hexdigest()
+
+
+def analysis_cache_key(binary_path, input_path, options):
+    """
+    Computes the cache key of an analysis.
+
+    Args:
+        binary_path: kantra binary, its content digest is part of the key
+        input_path: analyzed application (file or directory)
+        options (dict): normalized analysis options (without output path), values pointing to existing
+            files or directories (e.g. rules, maven settings) are replaced by digests of their content
+
+    Returns:
+        str: hex digest
+    """
+    material = {
+        'kantra': file_digest(binary_path),
+        'input': path_digest(input_path),
+        'options': {},
+    }
+    for key in sorted(options):
+        value = options[key]
+        if isinstance(value, (list, tuple)):
+            value = [_option_value(v) for v in value]
+        else:
+            value = _option_value(value)
+        material['options'][key] = value
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _option_value(value):
+    if isinstance(value, str) and value and os.path.exists(value):
+        return 'sha256:' + path_digest(value)
+    return value
+
+
+def restore(key, output_dir):
+    """
+    Restores a cached output directory.
+
+    Returns:
+        dict: entry metadata (e.g. `returncode`) on a cache hit, None otherwise
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, META_FILE_NAME)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    shutil.copytree(entry_dir, output_dir, ignore=shutil.ignore_patterns(META_FILE_NAME))
+    os.utime(meta_path)     # mtime of the metadata file marks the last use for LRU eviction
+    print("Restored cached analysis output %s to %s" % (key, output_dir))
+    return meta
+
+
+def store(key, output_dir, **meta):
+    """Stores an output directory in the cache under `key` and evicts least recently used entries over the size limit."""
+    cache_dir = get_cache_dir()
+    if not cache_dir or not os.path.isdir(output_dir):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = '%s.tmp-%d-%d' % (entry_dir, os.getpid(), threading.get_ident())
+    shutil.copytree(output_dir, tmp_dir)
+    meta['size'] = _dir_size(tmp_dir)
+    meta['created'] = time.time()
+    with open(os.path.join(tmp_dir, META_FILE_NAME), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Entry was stored by a concurrent run in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    evict(get_cache_max_size())
+
+
+def evict(max_size):
+    """Deletes least recently used cache entries until the total cache size is below max_size bytes."""
+    cache_dir = get_cache_dir()
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return
+    with _lock:
+        entries = []
+        for name in os.listdir(cache_dir):
+            meta_path = os.path.join(cache_dir, name, META_FILE_NAME)
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    size = json.load(f).get('size', 0)
+                entries.append((os.path.getmtime(meta_path), size, name))
+            except (OSError, ValueError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= max_size:
+                break
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+            total -= size
+
+
+def _dir_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            size += os.path.getsize(os.path.join(root, filename))
+    return size
@@ -0,0 +1,202 @@
+import collections
+import os
+import shutil
+import tempfile
+
+from utils.common import safe_dir_name
+
+# Completion markers checked by most of the tests, matched on the fly so the full output doesn't need to be kept
+DEFAULT_PATTERNS = ('Analysis complete!',)
+DEFAULT_IGNORE_CASE_PATTERNS = ('analysis complete',)
+DEFAULT_TAIL_SIZE = 64 * 1024
+SPILL_FILE_NAME = 'kantra-output.log'
+SPILL_FILE_PREFIX = 'kantra-output'
+SPILL_FILE_SUFFIX = '.log'
+_SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+def get_spill_path(output_dir, name=None):
+    """Spill file of a run: `<output_dir>/kantra-output-<run name>.log`, runs sharing an output dir (bulk) get their own."""
+    if not name:
+        return os.path.join(output_dir, SPILL_FILE_NAME)
+    return os.path.join(output_dir, '%s-%s%s' % (SPILL_FILE_PREFIX, safe_dir_name(name), SPILL_FILE_SUFFIX))
+
+
+def is_spill_file(filename):
+    return filename.startswith(SPILL_FILE_PREFIX) and filename.endswith(SPILL_FILE_SUFFIX)
+
+
+def find_spill_file(output_dir, name=None):
+    """Returns the spill file of a run in `output_dir`, or the only spill file there (e.g. of a restored cached run)."""
+    path = get_spill_path(output_dir, name)
+    if os.path.exists(path):
+        return path
+    spill_files = sorted(f for f in os.listdir(output_dir) if is_spill_file(f)) if os.path.isdir(output_dir) else []
+    return os.path.join(output_dir, spill_files[0]) if len(spill_files) == 1 else None
+
+
+class OutputCapture:
+    """
+    Bounded-memory sink for a command output stream.
+
+    Keeps only the last `tail_size` characters in memory, optionally spills the full stream to `spill_path`
+    and matches registered patterns on the fly (also across chunk boundaries), so checks like
+    `'Analysis complete!' in output` or `'analysis complete' in output.lower()` keep working
+    without holding the whole output.
+
+    Other text is looked up in the tail while it still holds the whole stream, then in the spill file.
+    Without a spill file, looking up text that wasn't registered in a truncated output raises KeyError
+    instead of answering from the tail only.
+
+    The spill file is written to a temporary location while the command runs and moved to `spill_path`
+    on `close()`, as kantra `--overwrite` may wipe the output directory at its start.
+    """
+
+    def __init__(self, tail_size=DEFAULT_TAIL_SIZE, spill_path=None,
+                 patterns=DEFAULT_PATTERNS, ignore_case_patterns=DEFAULT_IGNORE_CASE_PATTERNS):
+        self.tail_size = tail_size
+        self.spill_path = spill_path
+        self.size = 0
+        self._tail = collections.deque()
+        self._tail_len = 0
+        self._matched = {p: False for p in patterns}
+        self._matched_ignore_case = {p.lower(): False for p in ignore_case_patterns}
+        self._carry_len = max([len(p) for p in list(self._matched) + list(self._matched_ignore_case)] or [1]) - 1
+        self._carry = ''
+        self._spill = None
+        if spill_path:
+            self._spill = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', errors='replace', delete=False,
+                prefix='kantra-output-', suffix='.log',
+            )
+
+    @classmethod
+    def for_output_dir(cls, output_dir, name=None, patterns=(), **kwargs):
+        """
+        Creates a capture spilling the full output to the run's spill file in `output_dir` (see `get_spill_path`).
+
+        Args:
+            output_dir (str): run output directory
+            name (str): run name, part of the spill file name
+            patterns (iterable): text looked up in the output by the caller, matched over the full stream
+                (case-sensitive and ignoring case) on top of the default completion markers
+        """
+        patterns = tuple(patterns)
+        return cls(spill_path=get_spill_path(output_dir, name),
+                   patterns=DEFAULT_PATTERNS + patterns,
+                   ignore_case_patterns=DEFAULT_IGNORE_CASE_PATTERNS + patterns, **kwargs)
+
+    @classmethod
+    def replay(cls, path, **kwargs):
+        """Creates a capture from a previously spilled output file, e.g. of a cached analysis."""
+        capture = cls(**kwargs)
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), ''):
+                capture.write(chunk)
+        # text not registered is looked up in the replayed file
+        capture.spill_path = path
+        return capture
+
+    def write(self, text):
+        if not text:
+            return
+        self.size += len(text)
+        if self._spill:
+            self._spill.write(text)
+        self._match(text)
+
+        self._tail.append(text)
+        self._tail_len += len(text)
+        while self._tail_len - len(self._tail[0]) >= self.tail_size:
+            self._tail_len -= len(self._tail.popleft())
+
+    def _match(self, text):
+        window = self._carry + text
+        for pattern, matched in self._matched.items():
+            if not matched and pattern in window:
+                self._matched[pattern] = True
+        if self._matched_ignore_case:
+            window_lower = window.lower()
+            for pattern, matched in self._matched_ignore_case.items():
+                if not matched and pattern in window_lower:
+                    self._matched_ignore_case[pattern] = True
+        self._carry = window[-self._carry_len:] if self._carry_len else ''
+
+    def close(self):
+        """Finishes the spill file and moves it to `spill_path`."""
+        if self._spill:
+            self._spill.close()
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            shutil.move(self._spill.name, self.spill_path)
+            self._spill = None
+        return self
+
+    def matched(self, pattern, ignore_case=False):
+        """True if a registered pattern was seen in the stream, raises KeyError for patterns not registered upfront."""
+        if ignore_case:
+            return self._matched_ignore_case[pattern.lower()]
+        return self._matched[pattern]
+
+    @property
+    def tail(self):
+        text = ''.join(self._tail)
+        return text[-self.tail_size:]
+
+    def lower(self):
+        return _IgnoreCaseView(self)
+
+    def search(self, text, ignore_case=False):
+        """
+        True if `text` was seen anywhere in the stream.
+
+        Raises:
+            KeyError: If `text` was not registered, the output was truncated and there is no spill file to read.
+        """
+        registered = self._matched_ignore_case if ignore_case else self._matched
+        key = text.lower() if ignore_case else text
+        if key in registered:
+            return registered[key]
+        if self.size <= self.tail_size:
+            tail = self.tail
+            return key in (tail.lower() if ignore_case else tail)
+        if self._spill:
+            self._spill.flush()
+            path = self._spill.name
+        else:
+            path = self.spill_path
+        if not path or not os.path.exists(path):
+            raise KeyError("%r was not registered as an output pattern and only the last %d of %d characters were "
+                           "kept, register it (e.g. `output_patterns` of the analysis marker)"
+                           % (text, self.tail_size, self.size))
+        return _scan_file(path, key, ignore_case)
+
+    def __contains__(self, text):
+        return self.search(text)
+
+    def __str__(self):
+        return self.tail
+
+
+class _IgnoreCaseView:
+    """Result of `OutputCapture.lower()`, supports only `in` checks."""
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def __contains__(self, text):
+        return self.capture.search(text, ignore_case=True)
+
+    def __str__(self):
+        return self.capture.tail.lower()
+
+
+def _scan_file(path, text, ignore_case):
+    """Looks text up in a file block by block, blocks overlap so matches across their boundaries are found."""
+    overlap = ''
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for block in iter(lambda: f.read(_SCAN_BLOCK_SIZE), ''):
+            window = overlap + (block.lower() if ignore_case else block)
+            if text in window:
+                return True
+            overlap = window[-(len(text) - 1):] if len(text) > 1 else ''
+    return False
@@ -1,8 +1,18 @@
+import hashlib
+import json
 import os
+import queue
+import select
+import shlex
 import subprocess
 import sys
+import threading
+from dataclasses import dataclass
 
 from utils.common import get_hub_url, get_cli_path, get_project_path, get_report_path
+from utils.phases import PhaseTracker, get_current_label, record
+from utils.profiler import ProcessTreeProfiler, get_profile_interval, write_profile
+from utils.watchdog import POPEN_KWARGS, KantraTimeoutError, Watchdog, get_diagnostics, kill_process_tree
 
 # Use PTY on Unix so the child's stdout is line-buffered and we capture the final analysis message
 _USE_PTY = sys.platform != 'win32'
@@ -16,9 +26,135 @@ def _safe_stdout_write(line):
         enc = getattr(sys.stdout, 'encoding', None) or 'utf-8'
         sys.stdout.buffer.write(line.encode(enc, errors='replace'))
 
+
+@dataclass
+class RunResult:
+    """Outcome of a single scheduled command, `output` is a string or a bounded utils.capture.OutputCapture."""
+    name: str
+    command: str
+    returncode: int
+    output: object
+    output_dir: str = None
+    started: float = 0.0
+    finished: float = 0.0
+    cached: bool = False
+    phases: list = None
+    timed_out: str = None
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+@dataclass(frozen=True)
+class KantraCommand:
+    """
+    Immutable kantra command line.
+
+    `argv` is executed directly (no shell), `options` holds the normalized options as sorted (name, value) pairs,
+    where name has no leading dashes and repeated options (e.g. --source) have a sorted tuple of values.
+    `digest` is a stable hash of the subcommand and options (binary path excluded), usable as a cache/dedup key.
+    """
+    argv: tuple
+    options: tuple
+
+    @property
+    def subcommand(self):
+        words = []
+        for arg in self.argv[1:]:
+            if arg.startswith('-'):
+                break
+            words.append(arg)
+        return tuple(words)
+
+    @property
+    def option_map(self):
+        return dict(self.options)
+
+    def get(self, name, default=None):
+        return self.option_map.get(name, default)
+
+    @property
+    def digest(self):
+        return self.get_digest()
+
+    def get_digest(self, exclude=()):
+        """Digest of the command ignoring `exclude` options, e.g. ('output',) to compare runs writing to different dirs."""
+        material = {
+            'subcommand': self.subcommand,
+            'options': {name: value for name, value in self.options if name not in exclude},
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def __str__(self):
+        if sys.platform == 'win32':
+            return subprocess.list2cmdline(self.argv)
+        return shlex.join(self.argv)
+
+
+class _CommandBuilder:
+    """Collects argv and normalized options while a `build_*_command` function assembles a command."""
+
+    def __init__(self, *words):
+        self.argv = [get_cli_path()] + list(words)
+        self.options = []
+
+    def add(self, name, value=None, separator='=', flag=None):
+        """Adds `--name=value` (or `--name value` with separator ' ', or just `--name` if there is no value)."""
+        flag = flag or '--' + name
+        if value is None or value == '':
+            self.argv.append(flag)
+        elif separator == ' ':
+            self.argv += [flag, value]
+        else:
+            self.argv.append(flag + separator + value)
+        self.options.append((name, '' if value is None else value))
+
+    def add_kwargs(self, kwargs):
+        for name, value in normalize_kwargs(kwargs).items():
+            self.add(name, value)
+
+    def build(self):
+        options = {}
+        for name, value in self.options:
+            options.setdefault(name, []).append(value)
+        normalized = tuple(sorted(
+            (name, values[0] if len(values) == 1 else tuple(sorted(values))) for name, values in options.items()
+        ))
+        command = KantraCommand(tuple(self.argv), normalized)
+        print(command)
+        return command
+
+
+def normalize_kwargs(kwargs):
+    """
+    Normalizes kantra options passed as `build_*_command` kwargs, so e.g. `{'--run-local=true': None}`,
+    `{'run-local': 'true'}` and `{'--run-local=': 'true'}` give the same `{'run-local': 'true'}`.
+    """
+    options = {}
+    for key, value in kwargs.items():
+        key = key.lstrip('-')
+        if '=' in key:
+            key, _, inline_value = key.partition('=')
+            value = value or inline_value
+        options[key] = value or ''
+    return options
+
+
+def _get_popen_args(command, shell):
+    """KantraCommand is executed from its argv without a shell, plain strings/lists as before."""
+    if isinstance(command, KantraCommand):
+        return list(command.argv), False
+    return command, shell
+
+
 def build_analysis_command(binary_name, sources, targets, is_bulk=False, output_path=None, settings=None, with_deps = True, **kwargs):
     """
-        Builds a string for executing the "analyze" subcommand
+        Builds a command for executing the "analyze" subcommand
 
         Args:
             binary_name (str): binary file of the application to be analyzed.
@@ -32,13 +168,11 @@ def build_analysis_command(binary_name, sources, targets, is_bulk=False, output_
                 this argument takes a dict, where each key is the argument, which can be passed with or without the '--'
 
         Returns:
-            str: The full command to execute with the specified options and arguments.
+            KantraCommand: The full command to execute with the specified options and arguments.
 
         Raises:
             Exception: If `binary_path` is not provided.
     """
-    kantra_path = get_cli_path()
-
     if output_path:
         report_path = output_path
     else:
@@ -48,9 +182,9 @@ def build_analysis_command(binary_name, sources, targets, is_bulk=False, output_
         raise Exception('Binary path is required')
 
     if is_bulk:
-        run_type = '--bulk'
+        run_type = 'bulk'
     else:
-        run_type = '--overwrite'
+        run_type = 'overwrite'
 
     if os.path.isabs(binary_name):
         binary_path = binary_name
@@ -60,113 +194,213 @@ def build_analysis_command(binary_name, sources, targets, is_bulk=False, output_
     if not os.path.exists(binary_path):
         raise Exception("Input application `%s` does not exist" % binary_path)
 
-    command = kantra_path + ' analyze ' + run_type + ' --log-level=500 --input ' + binary_path + ' --output ' + report_path
+    command = _CommandBuilder('analyze')
+    command.add(run_type)
+    command.add('log-level', '500')
+    command.add('input', binary_path, ' ')
+    command.add('output', report_path, ' ')
 
     if sources:
         for source in sources:
-            command += ' --source ' + source.lower()
+            command.add('source', source.lower(), ' ')
 
     if targets:
         for target in targets:
-            command += ' --target ' + target.lower()
+            command.add('target', target.lower(), ' ')
 
     if settings:
-        command += ' --maven-settings ' + settings
+        command.add('maven-settings', settings, ' ')
 
     if not with_deps:
-        command += ' -m source-only'
+        command.add('mode', 'source-only', ' ', flag='-m')
 
     run_local_env = os.getenv('RUN_LOCAL_MODE')
     if run_local_env in ('true', 'false') and not any('run-local' in str(k) for k in kwargs):
-        command += ' --run-local=' + run_local_env
-
-    for key, value in kwargs.items():
-        if '--' not in key:
-            key = '--' + key
-        command += ' ' + key
+        command.add('run-local', run_local_env)
 
-        if value:
-            command += '=' + value
+    command.add_kwargs(kwargs)
 
-    print(command)
-    return command
+    return command.build()
 
 
-def run_command_stream_output(command, shell=True, check=True):
+def run_command_stream_output(command, shell=True, check=True, capture=None, profile_path=None, phases=None,
+                              name=None):
     """
     Stream stdout/stderr to the current process and return the combined output for assertions.
+    If `capture` (utils.capture.OutputCapture) is given, the output is written to it and the capture is returned
+    instead of a string, which keeps memory use bounded for chatty runs.
+    If `profile_path` is given, resource usage of the process tree is sampled (Linux only, every
+    KANTRA_PROFILE_INTERVAL seconds, 1s by default) and written there as JSON (see utils.profiler).
+    Kantra phase markers are timestamped by `phases` (utils.phases.PhaseTracker, a new one if not given),
+    the phase durations are recorded for the session summary under `name` (the current test by default).
     Raises subprocess.CalledProcessError if check=True and the process exits non-zero.
+    Raises utils.watchdog.KantraTimeoutError (with diagnostics) after killing the whole process group
+    if the run exceeds KANTRA_RUN_TIMEOUT or produces no output for KANTRA_STALL_TIMEOUT seconds.
     """
-    if _USE_PTY:
-        return _run_command_stream_output_pty(command, shell=shell, check=check)
-    return _run_command_stream_output_pipe(command, shell=shell, check=check)
+    phases = phases or PhaseTracker()
+    try:
+        if _USE_PTY:
+            return _run_command_stream_output_pty(command, shell=shell, check=check, capture=capture,
+                                                  profile_path=profile_path, phases=phases)
+        return _run_command_stream_output_pipe(command, shell=shell, check=check, capture=capture,
+                                               profile_path=profile_path, phases=phases)
+    finally:
+        record(name or get_current_label(str(command)), phases.finish())
+
+
+def _get_sink(chunks, capture, phases):
+    write = chunks.append if capture is None else capture.write
+
+    def sink(text):
+        phases.feed(text)
+        write(text)
+    return sink
+
+
+def _start_profiler(proc, profile_path):
+    if not profile_path:
+        return None
+    return ProcessTreeProfiler(proc.pid, get_profile_interval() or 1.0).start()
+
+
+def _stop_profiler(profiler, profile_path):
+    if profiler:
+        write_profile(profiler.stop(), profile_path)
+
+
+def _timeout(proc, command, expired, recent_output, profiler, profile_path, sink, capture, chunks):
+    """Collects diagnostics of a hung run, kills its process group and raises KantraTimeoutError."""
+    reason, timeout = expired
+    output_dir = command.get('output') if isinstance(command, KantraCommand) else None
+    diagnostics = get_diagnostics(proc.pid, recent_output, output_dir)
+    kill_process_tree(proc)
+    proc.wait()
+    _stop_profiler(profiler, profile_path)
+    message = "\nKilled command %s %s\n%s\n" % (command, reason, diagnostics)
+    _safe_stdout_write(message)
+    sink(message)
+    output = ''.join(chunks) if capture is None else capture.close()
+    raise KantraTimeoutError(command, timeout, output, reason, diagnostics, proc.returncode)
 
 
-def _run_command_stream_output_pipe(command, shell=True, check=True):
+def _read_lines(stream, line_queue):
+    for line in stream:
+        line_queue.put(line)
+    line_queue.put(None)
+
+
+def _run_command_stream_output_pipe(command, shell=True, check=True, capture=None, profile_path=None, phases=None):
     """Capture via pipe (used on Windows)."""
+    args, shell = _get_popen_args(command, shell)
     proc = subprocess.Popen(
-        command,
+        args,
         shell=shell,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
         encoding='utf-8',
         errors='replace',
+        **POPEN_KWARGS,
     )
+    profiler = _start_profiler(proc, profile_path)
     lines = []
-    for line in proc.stdout:
-        _safe_stdout_write(line)
-        sys.stdout.flush()
-        lines.append(line)
+    sink = _get_sink(lines, capture, phases)
+    watchdog = Watchdog.from_env()
+    # Lines are read by a helper thread, so the watchdog can check the limits while the pipe is quiet
+    line_queue = queue.Queue()
+    threading.Thread(target=_read_lines, args=(proc.stdout, line_queue), daemon=True).start()
+    expired = None
+    try:
+        while True:
+            try:
+                line = line_queue.get(timeout=watchdog.remaining())
+            except queue.Empty:
+                expired = watchdog.expired()
+                if expired:
+                    break
+                continue
+            if line is None:
+                break
+            watchdog.feed()
+            _safe_stdout_write(line)
+            sys.stdout.flush()
+            sink(line)
+    except BaseException:
+        kill_process_tree(proc)
+        raise
+    if expired:
+        _timeout(proc, command, expired, ''.join(lines[-200:]) if capture is None else capture.tail,
+                 profiler, profile_path, sink, capture, lines)
     proc.wait()
-    output = ''.join(lines)
+    _stop_profiler(profiler, profile_path)
+    output = ''.join(lines) if capture is None else capture.close()
     if check and proc.returncode != 0:
-        raise subprocess.CalledProcessError(proc.returncode, command, output)
+        raise subprocess.CalledProcessError(proc.returncode, command, str(output))
     return output
 
 
-def _run_command_stream_output_pty(command, shell=True, check=True):
+def _run_command_stream_output_pty(command, shell=True, check=True, capture=None, profile_path=None, phases=None):
     """Capture via PTY on Unix so child stdout is line-buffered for final output."""
     import pty
+    args, shell = _get_popen_args(command, shell)
     master, slave = pty.openpty()
     try:
         proc = subprocess.Popen(
-            command,
+            args,
             shell=shell,
             stdin=subprocess.DEVNULL,
             stdout=slave,
             stderr=slave,
+            **POPEN_KWARGS,
         )
     except Exception:
         os.close(slave)
         os.close(master)
         raise
     os.close(slave)
+    profiler = _start_profiler(proc, profile_path)
     chunks = []
+    sink = _get_sink(chunks, capture, phases)
+    watchdog = Watchdog.from_env()
+    expired = None
     try:
         while True:
+            ready, _, _ = select.select([master], [], [], watchdog.remaining())
+            if not ready:
+                expired = watchdog.expired()
+                if expired:
+                    break
+                continue
             try:
                 data = os.read(master, 4096)
             except OSError:
                 break
             if not data:
                 break
+            watchdog.feed()
             decoded = data.decode('utf-8', errors='replace')
             _safe_stdout_write(decoded)
             sys.stdout.flush()
-            chunks.append(decoded)
+            sink(decoded)
+    except BaseException:
+        kill_process_tree(proc)
+        raise
     finally:
         os.close(master)
+    if expired:
+        _timeout(proc, command, expired, ''.join(chunks[-200:]) if capture is None else capture.tail,
+                 profiler, profile_path, sink, capture, chunks)
     proc.wait()
-    output = ''.join(chunks)
+    _stop_profiler(profiler, profile_path)
+    output = ''.join(chunks) if capture is None else capture.close()
     if check and proc.returncode != 0:
-        raise subprocess.CalledProcessError(proc.returncode, command, output)
+        raise subprocess.CalledProcessError(proc.returncode, command, str(output))
     return output
 
 
 def build_discovery_command(binary_name,  **kwargs):
     """
-        Builds a string for executing the "--list-language" subcommand
+        Builds a command for executing the "--list-language" subcommand
 
         Args:
             binary_name (str): binary file of the application to be analyzed.
@@ -174,13 +408,11 @@ def build_discovery_command(binary_name,  **kwargs):
                 this argument takes a dict, where each key is the argument, which can be passed with or without the '--'
 
         Returns:
-            str: The full command to execute with the specified options and arguments.
+            KantraCommand: The full command to execute with the specified options and arguments.
 
         Raises:
             Exception: If `binary_path` is not provided.
     """
-    kantra_path = get_cli_path()
-
     if not binary_name:
         raise Exception('Binary path is required')
 
@@ -193,22 +425,16 @@ def build_discovery_command(binary_name,  **kwargs):
     if not os.path.exists(binary_path):
         raise Exception("Input application `%s` does not exist" % binary_path)
 
-    command = kantra_path + ' analyze ' + '--list-languages --input ' + binary_path
-
-    for key, value in kwargs.items():
-        if '--' not in key:
-            key = '--' + key
-        command += ' ' + key
-
-        if value:
-            command += '=' + value
+    command = _CommandBuilder('analyze')
+    command.add('list-languages')
+    command.add('input', binary_path, ' ')
+    command.add_kwargs(kwargs)
 
-    print(command)
-    return command
+    return command.build()
 
 def build_platform_discovery_command(organizations, config, spaces=None, app_name=None, output_dir=None, **kwargs):
     """
-        Builds a string for executing the "discover cloud-foundry" subcommand
+        Builds a command for executing the "discover cloud-foundry" subcommand
 
         Args:
             organizations (list): List of organizations to discover (at least 1 required).
@@ -221,54 +447,47 @@ def build_platform_discovery_command(organizations, config, spaces=None, app_nam
                 this argument takes a dict, where each key is the argument, which can be passed with or without the '--'
 
         Returns:
-            str: The full command to execute with the specified options and arguments.
+            KantraCommand: The full command to execute with the specified options and arguments.
 
         Raises:
             Exception: If required parameters are not provided.
     """
-    kantra_path = get_cli_path()
     if not organizations or len(organizations) == 0:
         raise Exception('At least one organization is required')
 
     if not config:
         raise Exception('Config directory path is required')
 
-    command = kantra_path + ' discover cloud-foundry --use-live-connection'
+    command = _CommandBuilder('discover', 'cloud-foundry')
+    command.add('use-live-connection')
 
     # Add organizations (required)
     for org in organizations:
-        command += ' --orgs=' + org
+        command.add('orgs', org)
 
-    command += ' --cf-config=' + config
+    command.add('cf-config', config)
 
     # Add spaces (optional)
     if spaces:
         for space in spaces:
-            command += ' --spaces=' + space
+            command.add('spaces', space)
 
     # Add app-name (optional)
     if app_name:
-        command += ' --app-name=' + app_name
+        command.add('app-name', app_name)
 
     # Add output directory
     if output_dir:
-        command += ' --output-dir=' + output_dir
+        command.add('output-dir', output_dir)
 
     # Add any additional kwargs
-    for key, value in kwargs.items():
-        if '--' not in key:
-            key = '--' + key
-        command += ' ' + key
-
-        if value:
-            command += '=' + value
+    command.add_kwargs(kwargs)
 
-    print(command)
-    return command
+    return command.build()
 
 def build_asset_generation_command(input_file, chart_dir, output_dir=None, **kwargs):
     """
-        Builds a string for executing the "mta-cli generate helm" subcommand
+        Builds a command for executing the "mta-cli generate helm" subcommand
 
         Args:
             input_file (str): Path to the input manifest file.
@@ -278,13 +497,11 @@ def build_asset_generation_command(input_file, chart_dir, output_dir=None, **kwa
                 this argument takes a dict, where each key is the argument, which can be passed with or without the '--'
 
         Returns:
-            str: The full command to execute with the specified options and arguments.
+            KantraCommand: The full command to execute with the specified options and arguments.
 
         Raises:
             Exception: If required parameters are not provided.
     """
-    kantra_path = get_cli_path()
-
     if not input_file:
         raise Exception('Input file is required')
 
@@ -297,23 +514,17 @@ def build_asset_generation_command(input_file, chart_dir, output_dir=None, **kwa
     if not os.path.exists(chart_dir):
         raise Exception(f"Chart directory does not exist: {chart_dir}")
 
-    command = kantra_path + ' generate helm --input=' + input_file
+    command = _CommandBuilder('generate', 'helm')
+    command.add('input', input_file)
 
-    command += ' --chart-dir=' + chart_dir
+    command.add('chart-dir', chart_dir)
 
     if output_dir:
-        command += ' --output-dir=' + output_dir
+        command.add('output-dir', output_dir)
 
     # Add any additional kwargs
-    for key, value in kwargs.items():
-        if '--' not in key:
-            key = '--' + key
-        command += ' ' + key
-
-        if value:
-            command += '=' + value
-    print(command)
-    return command
+    command.add_kwargs(kwargs)
+    return command.build()
 
 
 def build_central_config_login_command(hub_url, username, password, secure=False):
@@ -359,7 +570,7 @@ def build_central_config_sync_command(app_url, profile_path=None, secure=True):
 
 def build_analysis_command_ccm(binary_name, profile_path=None, output_path=None, **kwargs):
     """
-        Builds a string for executing the "analyze" subcommand
+        Builds a command for executing the "analyze" subcommand
 
         Args:
             binary_name (str): binary file of the application to be analyzed.
@@ -369,13 +580,11 @@ def build_analysis_command_ccm(binary_name, profile_path=None, output_path=None,
                 this argument takes a dict, where each key is the argument, which can be passed with or without the '--'
 
         Returns:
-            str: The full command to execute with the specified options and arguments.
+            KantraCommand: The full command to execute with the specified options and arguments.
 
         Raises:
             Exception: If `binary_path` is not provided.
     """
-    kantra_path = get_cli_path()
-
     if output_path:
         report_path = output_path
     else:
@@ -384,7 +593,7 @@ def build_analysis_command_ccm(binary_name, profile_path=None, output_path=None,
     if not binary_name:
         raise Exception('Binary path is required')
 
-    run_type = '--overwrite'
+    run_type = 'overwrite'
 
     if os.path.isabs(binary_name):
         binary_path = binary_name
@@ -394,18 +603,15 @@ def build_analysis_command_ccm(binary_name, profile_path=None, output_path=None,
     if not os.path.exists(binary_path):
         raise Exception("Input application `%s` does not exist" % binary_path)
 
-    command = kantra_path + ' analyze ' + run_type + ' --log-level=500 --input ' + binary_path + ' --output ' + report_path
+    command = _CommandBuilder('analyze')
+    command.add(run_type)
+    command.add('log-level', '500')
+    command.add('input', binary_path, ' ')
+    command.add('output', report_path, ' ')
 
     if profile_path:
-        command += f' --profile-dir {profile_path} '
+        command.add('profile-dir', profile_path, ' ')
 
-    for key, value in kwargs.items():
-        if '--' not in key:
-            key = '--' + key
-        command += ' ' + key
-
-        if value:
-            command += '=' + value
+    command.add_kwargs(kwargs)
 
-    print(command)
-    return command
+    return command.build()
@@ -1,5 +1,6 @@
 import os
 import platform
+import re
 import subprocess
 import tempfile
 import zipfile
@@ -93,7 +94,9 @@ def _get_violation_by_rule_id(ruleset, rule_id):
 
 
 def _get_rulesets(report_data):
-    """Return list of rulesets from report_data."""
+    """Return list of rulesets from report_data (output.yaml list, output.js application or AnalysisReport)."""
+    if hasattr(report_data, 'rulesets'):
+        return report_data.rulesets
     if isinstance(report_data, list):
         return report_data  
     return report_data.get('rulesets', [])
@@ -153,11 +156,12 @@ def verify_triggered_yaml_rules(report_data, rule_id_list, expected_unmatched_ru
 
         """
 
+    rulesets = _get_rulesets(report_data)
     errors = []
 
     for rule_id in rule_id_list:
         # Find the ruleset that contains this rule ID in its 'violations'
-        ruleset = next((item for item in report_data if rule_id in item.get('violations', {})), None)
+        ruleset = next((item for item in rulesets if rule_id in item.get('violations', {})), None)
 
         if ruleset is None:
             errors.append(f"Error for rule ID '{rule_id}': Ruleset property not found in output.")
@@ -184,12 +188,15 @@ def extract_name_and_violations_from_dictionary(data):
     for item in data:
         if not item.get("violations") and not item.get("insights"):
             continue
-        item.pop("unmatched", None)
         name = item.get("name")
         if name is not None:
             result[name] = item.get("violations", [])
     return result
 
+def safe_dir_name(name):
+    """Turns a run name (e.g. a pytest param id) into a filesystem friendly directory name."""
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'run'
+
 def get_hub_url():
     value = os.getenv("HUB_URL")
     if not value:
@@ -241,6 +248,8 @@ def get_profile_path(config_data):
     return lines if lines else None
 
 def run_command(command, shell=True, check=False):
+    if hasattr(command, 'argv'):    # utils.command.KantraCommand runs without a shell
+        command, shell = list(command.argv), False
     output = subprocess.run(command, shell=shell, check=False, # Всегда ловим сами
                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8')
     if check and output.returncode != 0:
@@ -11,6 +11,27 @@ CF_HOST = "CF_HOST"
 CF_SSH_USER = "CF_SSH_USER"
 CF_ADMIN_PASSWORD = "CF_ADMIN_PASSWORD"
 CF_REMOTE_CONFIG_PATH = "CF_REMOTE_CONFIG_PATH"
+KANTRA_MAX_PARALLEL = "KANTRA_MAX_PARALLEL"
+KANTRA_CACHE_DIR = "KANTRA_CACHE_DIR"
+KANTRA_CACHE_MAX_SIZE = "KANTRA_CACHE_MAX_SIZE"
+KANTRA_CACHE_BYPASS = "KANTRA_CACHE_BYPASS"
+RUN_LOCAL_MODE = "RUN_LOCAL_MODE"
+KANTRA_PROFILE_INTERVAL = "KANTRA_PROFILE_INTERVAL"
+KANTRA_PHASE_MARKERS = "KANTRA_PHASE_MARKERS"
+KANTRA_BENCHMARK_RUNS = "KANTRA_BENCHMARK_RUNS"
+KANTRA_BENCHMARK_THRESHOLD = "KANTRA_BENCHMARK_THRESHOLD"
+KANTRA_BENCHMARK_BASELINE = "KANTRA_BENCHMARK_BASELINE"
+KANTRA_RUN_TIMEOUT = "KANTRA_RUN_TIMEOUT"
+KANTRA_STALL_TIMEOUT = "KANTRA_STALL_TIMEOUT"
+KANTRA_KILL_GRACE_PERIOD = "KANTRA_KILL_GRACE_PERIOD"
+KANTRA_NORMALIZE_WORKERS = "KANTRA_NORMALIZE_WORKERS"
+KANTRA_NORMALIZE_MIN_INCIDENTS = "KANTRA_NORMALIZE_MIN_INCIDENTS"
+KANTRA_REPORT_CACHE_MAX_SIZE = "KANTRA_REPORT_CACHE_MAX_SIZE"
+KANTRA_PORTFOLIO_DB = "KANTRA_PORTFOLIO_DB"
+KANTRA_RECYCLE_MAX_PENDING = "KANTRA_RECYCLE_MAX_PENDING"
+KANTRA_ISOLATED_OUTPUT = "KANTRA_ISOLATED_OUTPUT"
+KANTRA_OUTPUT_TMPFS = "KANTRA_OUTPUT_TMPFS"
+KANTRA_OUTPUT_TMPFS_MAX_SIZE = "KANTRA_OUTPUT_TMPFS_MAX_SIZE"
 
 # YAML RULE SCHEMA
 CUSTOM_RULE_YAML_SCHEMA = """
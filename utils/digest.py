@@ -0,0 +1,232 @@
+"""
+Merkle digests of normalized analysis outputs.
+
+Every incident, violation, ruleset and the whole document (and every dependency and dependency set) gets a digest
+computed from its own fields and the digests of its children. Equal root digests mean equal outputs, otherwise
+only children with a different digest need to be descended into:
+
+    expected, got = digest_output(expected_rulesets), digest_output(got_rulesets)
+    if expected.digest != got.digest:
+        for key, expected_ruleset, got_ruleset in changed_children(expected, got):
+            ...
+
+Equal data has equal digests, lists are hashed in order and dictionaries regardless of their keys order, like ==
+compares them (numbers are hashed as serialized, so 1 and 1.0 have different digests).
+"""
+import hashlib
+import json
+
+DIGEST_SIZE = 16
+
+
+class Node:
+    """
+    Digest of one element of an output.
+
+    Attributes:
+        key: identity of the element among its siblings, e.g. ruleset name, rule ID or (uri, lineNumber)
+        value: the element itself
+        fields (str): digest of the element without its children
+        children (list): Nodes of the child elements (violations of a ruleset, incidents of a violation, ...),
+            built on first access for nodes rebuilt from a packed tree
+        digest (str): digest of the element including its children
+    """
+    __slots__ = ('key', 'value', 'fields', 'digest', '_children', '_expand')
+
+    def __init__(self, key, value, fields, children=(), digest=None, expand=None):
+        self.key = key
+        self.value = value
+        self.fields = fields
+        self._expand = expand
+        if expand is not None:
+            self._children = None
+            self.digest = digest
+        else:
+            self._children = list(children)
+            if self._children:
+                self.digest = combine([fields] + [child.digest for child in self._children])
+            else:
+                self.digest = fields
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = self._expand()
+            self._expand = None
+        return self._children
+
+    def __repr__(self):
+        return 'Node(%r, %s)' % (self.key, self.digest)
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def combine(digests):
+    """Digest of a sequence of digests."""
+    return hash_bytes(' '.join(digests).encode('ascii'))
+
+
+# one encoder instance, json.dumps() with options builds a new one on every call
+_ENCODER = json.JSONEncoder(sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _canonical(value):
+    return _ENCODER.encode(value).encode('utf-8')
+
+
+def _leaf(key, value, identity=None, packed=None):
+    if packed is not None:
+        return Node(key, value, packed[0])
+    return Node(key, value, hash_bytes(_canonical([identity, value])))
+
+
+def _branch(value, children_field, identity=None, packed=None):
+    """
+    Digest of a dict without its `children_field` (digested separately as children).
+
+    Returns:
+        tuple: (fields digest, children value, packed children or a list of None to digest them)
+    """
+    children = value.get(children_field)
+    if packed is not None:
+        return packed[0], children, packed[2]
+    fields = dict(value)
+    fields.pop(children_field, None)
+    # keep a missing, empty or None children field distinguishable, as == does
+    marker = type(children).__name__ if children_field in value else None
+    count = len(children) if isinstance(children, (list, dict)) else 0
+    return hash_bytes(_canonical([identity, fields, marker])), children, [None] * count
+
+
+def _node(key, value, fields, children, packed):
+    """Node with children listed by `children()`, right away, or when accessed if rebuilt from a packed tree."""
+    if packed is None:
+        return Node(key, value, fields, children())
+    return Node(key, value, fields, digest=packed[1], expand=children)
+
+
+def digest_incident(incident, packed=None):
+    key = (incident.get('uri'), incident.get('lineNumber')) if isinstance(incident, dict) else repr(incident)
+    return _leaf(key, incident, packed=packed)
+
+
+def digest_violation(rule_id, violation, packed=None):
+    if not isinstance(violation, dict):
+        return _leaf(rule_id, violation, identity=rule_id, packed=packed)
+    fields, incidents, packed_children = _branch(violation, 'incidents', identity=rule_id, packed=packed)
+
+    def children():
+        if not isinstance(incidents, list):
+            return []
+        return [digest_incident(incident, p) for incident, p in zip(incidents, packed_children)]
+    return _node(rule_id, violation, fields, children, packed)
+
+
+def digest_ruleset(ruleset, packed=None):
+    """
+    Digest tree of a ruleset.
+
+    Args:
+        ruleset (dict): normalized ruleset
+        packed (tuple): `pack()` of the ruleset digest tree, to rebuild it without hashing again
+    """
+    if not isinstance(ruleset, dict):
+        return _leaf(repr(ruleset), ruleset, packed=packed)
+    fields, violations, packed_children = _branch(ruleset, 'violations', packed=packed)
+
+    def children():
+        if not isinstance(violations, dict):
+            return []
+        # a dict of violations, their order does not matter
+        rule_ids = sorted(violations, key=str)
+        return [digest_violation(rule_id, violations[rule_id], p) for rule_id, p in zip(rule_ids, packed_children)]
+    return _node(ruleset.get('name'), ruleset, fields, children, packed)
+
+
+def digest_output(rulesets):
+    """
+    Digest tree of an analysis output (list of rulesets, e.g. returned by `normalize_output`).
+
+    Returns:
+        Node: document node, its children are ruleset nodes in the output order
+    """
+    return digest_document(rulesets, [digest_ruleset(ruleset) for ruleset in rulesets or []])
+
+
+def digest_dependency(dependency, packed=None):
+    if not isinstance(dependency, dict):
+        return _leaf(repr(dependency), dependency, packed=packed)
+    return _leaf('%s %s' % (dependency.get('name'), dependency.get('version')), dependency, packed=packed)
+
+
+def digest_dependency_set(dependencies, packed=None):
+    """Digest tree of a dependency set, `packed` as in `digest_ruleset`."""
+    if not isinstance(dependencies, dict):
+        return _leaf(repr(dependencies), dependencies, packed=packed)
+    key = '%s %s' % (dependencies.get('provider'), dependencies.get('fileURI') or '')
+    fields, items, packed_children = _branch(dependencies, 'dependencies', packed=packed)
+
+    def children():
+        if not isinstance(items, list):
+            return []
+        return [digest_dependency(dependency, p) for dependency, p in zip(items, packed_children)]
+    return _node(key, dependencies, fields, children, packed)
+
+
+def digest_dependencies(dependency_sets):
+    """
+    Digest tree of an analysis dependencies output (list of dependency sets).
+
+    Returns:
+        Node: document node, its children are dependency set nodes in the output order
+    """
+    return digest_document(dependency_sets, [digest_dependency_set(dependencies) for dependencies in dependency_sets or []])
+
+
+def pack(node):
+    """
+    Compact form of a digest tree without the digested values, e.g. to send it from a worker process
+    (pickling tuples of strings is much cheaper than Node objects).
+
+    Returns:
+        tuple: (fields digest, digest, list of packed children)
+    """
+    return node.fields, node.digest, [pack(child) for child in node.children]
+
+
+def digest_document(sections, nodes):
+    """Document node of already digested sections (rulesets or dependency sets, e.g. digested in parallel)."""
+    return Node(None, sections, hash_bytes(_canonical(type(sections).__name__)), nodes)
+
+
+def changed_children(expected, got):
+    """
+    Pairs children of two nodes by key and yields the ones with a different digest.
+
+    Args:
+        expected (Node): expected node
+        got (Node): actual node
+
+    Returns:
+        generator of (key, expected child or None, got child or None), in the expected order,
+        then the keys only in got. Children with a duplicated key are paired in their order.
+    """
+    expected_index = _index(expected.children)
+    got_index = _index(got.children)
+    for key in list(expected_index) + [key for key in got_index if key not in expected_index]:
+        expected_items = expected_index.get(key, [])
+        got_items = got_index.get(key, [])
+        for i in range(max(len(expected_items), len(got_items))):
+            expected_child = expected_items[i] if i < len(expected_items) else None
+            got_child = got_items[i] if i < len(got_items) else None
+            if expected_child is None or got_child is None or expected_child.digest != got_child.digest:
+                yield key, expected_child, got_child
+
+
+def _index(nodes):
+    index = {}
+    for node in nodes:
+        index.setdefault(node.key, []).append(node)
+    return index
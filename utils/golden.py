@@ -0,0 +1,262 @@
+"""
+Pre-normalized golden snapshots of analysis outputs.
+
+A golden is a JSON Lines file with two lines per section (a ruleset of output.yaml, or a dependency set
+of dependencies.yaml, sorted by section key):
+
+    {"key": "cloud-readiness", "digest": "<Merkle digest of the section, see utils.digest>"}
+    {<section normalized by utils.output, keys sorted>}
+
+Sections sharing a key (e.g. two rulesets with the same name) are ordered by digest and get an ordinal from the
+second one on (`cloud-readiness#2`), so none of them is dropped.
+
+Section headers are small, so the digests of all sections can be read from the memory mapped file without
+parsing any body. The golden root digest (combined section digests) is compared first, then unchanged sections
+are skipped when comparing and copied byte by byte when updating.
+
+Update or create goldens from a kantra output directory:
+
+    python -m utils.golden update data/expected/java_analysis/<case> <output dir> --input-root <analyzed app path>
+
+Convert existing YAML goldens (output.yaml, dependencies.yaml) of a directory, or rewrite its .jsonl goldens
+(e.g. after a change of the digest algorithm):
+
+    python -m utils.golden convert data/expected/java_analysis/<case>
+"""
+import argparse
+import json
+import mmap
+import os
+
+from utils.digest import combine, digest_dependency_set, digest_ruleset
+from utils.yaml_loader import load_yaml_file
+
+OUTPUT_GOLDEN = 'output.jsonl'
+DEPENDENCIES_GOLDEN = 'dependencies.jsonl'
+
+
+def ruleset_key(ruleset):
+    return ruleset.get('name') or ''
+
+
+def dependency_set_key(dependencies):
+    return '%s %s' % (dependencies.get('provider'), dependencies.get('fileURI') or '')
+
+
+def get_section_key(kind):
+    return ruleset_key if kind == 'output' else dependency_set_key
+
+
+def get_section_digester(kind):
+    return digest_ruleset if kind == 'output' else digest_dependency_set
+
+
+def encode_section(section):
+    """Canonical JSON line of a section (UTF-8 bytes, without the newline)."""
+    return json.dumps(section, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class Golden:
+    """
+    Read-only view of a golden file, section bodies are parsed lazily from the memory mapped file.
+
+    Attributes:
+        digests (dict): section key -> digest, in file order
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.digests = {}
+        self._spans = {}
+        self._file = open(path, 'rb')
+        self._map = None
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index()
+
+    def _index(self):
+        data, pos, size = self._map, 0, len(self._map)
+        while pos < size:
+            header_end = data.find(b'\n', pos)
+            body_end = data.find(b'\n', header_end + 1)
+            if header_end < 0 or body_end < 0:
+                raise Exception("Golden file %s is truncated at byte %d" % (self.path, pos))
+            header = json.loads(data[pos:header_end])
+            if header['key'] in self.digests:
+                raise Exception("Golden file %s has a duplicate section %s" % (self.path, header['key']))
+            self.digests[header['key']] = header['digest']
+            self._spans[header['key']] = (pos, header_end + 1, body_end + 1)
+            pos = body_end + 1
+
+    def get(self, key):
+        """Parsed section, KeyError if the golden has no such section."""
+        _, body_start, body_end = self._spans[key]
+        return json.loads(self._map[body_start:body_end - 1])
+
+    def get_raw(self, key):
+        """Header and body lines of a section, as stored."""
+        start, _, end = self._spans[key]
+        return self._map[start:end]
+
+    def load(self):
+        return [self.get(key) for key in self.digests]
+
+    @property
+    def digest(self):
+        """Root digest of the golden, combined digests of its sections."""
+        return combine(self.digests.values())
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def digest_sections(sections, kind, tree=None):
+    """
+    Returns key -> (digest, section) of normalized sections, sorted by key, digests are taken from `tree` if given.
+    Sections sharing a key are ordered by digest and keyed `<key>#<n>` from the second one on.
+    """
+    key, digester = get_section_key(kind), get_section_digester(kind)
+    nodes = tree.children if tree is not None else [digester(section) for section in sections or []]
+    pairs = sorted(((key(section), node.digest, section) for section, node in zip(sections or [], nodes)),
+                   key=lambda pair: pair[:2])
+    digests = {}
+    ordinals = {}
+    for section_key, digest, section in pairs:
+        ordinals[section_key] = ordinals.get(section_key, 0) + 1
+        if ordinals[section_key] > 1:
+            section_key = '%s#%d' % (section_key, ordinals[section_key])
+        if section_key in digests:
+            raise Exception("Sections can't be keyed uniquely, %s is used twice" % section_key)
+        digests[section_key] = (digest, section)
+    return digests
+
+
+def encode_sections(sections, kind):
+    """Returns key -> (digest, body bytes) of normalized sections, sorted by key."""
+    return {key: (digest, encode_section(section)) for key, (digest, section) in digest_sections(sections, kind).items()}
+
+
+def compare_with_golden(path, sections, kind, tree=None):
+    """
+    Compares normalized sections (e.g. rulesets returned by `normalize_output`) with a golden,
+    sections with the same digest are not parsed from the golden at all.
+
+    Args:
+        path (str): golden file
+        sections (list): normalized sections
+        kind (str): 'output' or 'dependencies'
+        tree (Node): digest tree of `sections` if already computed (see utils.digest)
+
+    Returns:
+        tuple: (expected sections, got sections) of only the differing sections, both sorted by key,
+            two empty lists if everything matches
+    """
+    digests = digest_sections(sections, kind, tree)
+    expected, got = [], []
+    with Golden(path) as golden:
+        if golden.digest == combine(digest for digest, _ in digests.values()):
+            return expected, got
+        for key in sorted(set(golden.digests) | set(digests)):
+            digest = golden.digests.get(key)
+            if key in digests and digests[key][0] == digest:
+                continue
+            expected_section = golden.get(key) if digest is not None else None
+            # serialized and parsed back to compare the same JSON types (e.g. lists instead of tuples)
+            got_section = json.loads(encode_section(digests[key][1])) if key in digests else None
+            if expected_section == got_section:
+                continue    # same data, serialized differently (e.g. 1 and 1.0)
+            if expected_section is not None:
+                expected.append(expected_section)
+            if got_section is not None:
+                got.append(got_section)
+    return expected, got
+
+
+def write_golden(path, sections, kind):
+    """
+    Writes normalized sections as a golden, sections not changed since the previous version of the file
+    are copied as they are.
+
+    Returns:
+        list: keys of added, changed or removed sections
+    """
+    encoded = encode_sections(sections, kind)
+    changed = []
+    previous = Golden(path) if os.path.exists(path) else None
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for key, (digest, body) in encoded.items():
+                if previous is not None and previous.digests.get(key) == digest:
+                    f.write(previous.get_raw(key))
+                    continue
+                changed.append(key)
+                f.write(json.dumps({'key': key, 'digest': digest}, ensure_ascii=False).encode('utf-8') + b'\n')
+                f.write(body + b'\n')
+        if previous is not None:
+            changed += [key for key in previous.digests if key not in encoded]
+    finally:
+        if previous is not None:
+            previous.close()
+    os.replace(tmp_path, path)
+    return changed
+
+
+def update_goldens(expected_dir, output_dir, input_root_path=None):
+    """Creates or updates output/dependencies goldens of `expected_dir` from a kantra output directory."""
+    from utils.output import normalize_dependencies, normalize_output
+    os.makedirs(expected_dir, exist_ok=True)
+    changes = {}
+    output_path = os.path.join(output_dir, 'output.yaml')
+    if os.path.exists(output_path):
+        rulesets = normalize_output(load_yaml_file(output_path) or [], input_root_path)
+        changes[OUTPUT_GOLDEN] = write_golden(os.path.join(expected_dir, OUTPUT_GOLDEN), rulesets, 'output')
+    dependencies_path = os.path.join(output_dir, 'dependencies.yaml')
+    if os.path.exists(dependencies_path):
+        dependencies = normalize_dependencies(load_yaml_file(dependencies_path) or [], input_root_path)
+        changes[DEPENDENCIES_GOLDEN] = write_golden(
+            os.path.join(expected_dir, DEPENDENCIES_GOLDEN), dependencies, 'dependencies')
+    return changes
+
+
+def rewrite_golden(path, kind):
+    """Rewrites a golden from its own sections, e.g. to recompute its digests."""
+    with Golden(path) as golden:
+        sections = golden.load()
+    return write_golden(path, sections, kind)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.golden', description="Manage pre-normalized goldens")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    update = subparsers.add_parser('update', help="create or update goldens from a kantra output directory")
+    update.add_argument('expected_dir')
+    update.add_argument('output_dir')
+    update.add_argument('--input-root', default='', help="analyzed application path, stripped from URIs")
+    convert = subparsers.add_parser('convert', help="convert output.yaml/dependencies.yaml goldens of a directory")
+    convert.add_argument('expected_dir')
+    convert.add_argument('--input-root', default='', help="analyzed application path, stripped from URIs")
+    args = parser.parse_args(argv)
+
+    source_dir = args.output_dir if args.action == 'update' else args.expected_dir
+    changes = update_goldens(args.expected_dir, source_dir, args.input_root)
+    if args.action == 'convert':
+        for golden, kind in ((OUTPUT_GOLDEN, 'output'), (DEPENDENCIES_GOLDEN, 'dependencies')):
+            golden_path = os.path.join(args.expected_dir, golden)
+            if golden not in changes and os.path.exists(golden_path):
+                changes[golden] = rewrite_golden(golden_path, kind)
+    for golden, keys in changes.items():
+        print("%s: %d sections changed%s" % (os.path.join(args.expected_dir, golden), len(keys),
+                                            (' (%s)' % ', '.join(keys)) if keys else ''))
+
+
+if __name__ == '__main__':
+    main()
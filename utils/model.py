@@ -0,0 +1,223 @@
+"""
+Compact in-memory model of an analysis output (output.yaml).
+
+Rulesets, violations and incidents are slotted objects instead of dicts. URIs, rule IDs and names are interned
+(shared by all loaded outputs), other repeated strings (messages, categories, labels) are shared within an
+output, and the incidents of a violation are stored column-wise (IncidentList) with line numbers in an array.
+A large output takes a fraction of the memory of the parsed YAML.
+
+The objects offer the read-only part of the dict interface with the output.yaml field names (`get`, `[]`, `in`,
+`keys`), so helpers written for the parsed YAML, e.g. `ruleset.get('violations')`, work with both,
+and `to_dict()` converts back.
+"""
+import sys
+from array import array
+
+from utils.yaml_loader import iter_rulesets
+
+
+class _Record:
+    """Read-only dict interface over the slots, `_fields` maps output.yaml keys to attribute names."""
+    __slots__ = ()
+    _fields = {}
+
+    def get(self, key, default=None):
+        attribute = self._fields.get(key)
+        if attribute is not None:
+            value = getattr(self, attribute)
+        else:
+            value = (self.extras or {}).get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in list(self._fields) + list(self.extras or {}) if key in self]
+
+    def to_dict(self):
+        """The output.yaml dict of the record (fields with None values are left out)."""
+        result = {}
+        for key in self.keys():
+            value = self.get(key)
+            if isinstance(value, dict):
+                value = {k: v.to_dict() if isinstance(v, _Record) else v for k, v in value.items()}
+            elif isinstance(value, IncidentList):
+                value = [incident.to_dict() for incident in value]
+            result[key] = value
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, (_Record, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, _Record) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.to_dict())
+
+
+class Incident(_Record):
+    __slots__ = ('uri', 'line_number', 'message', 'code_snip', 'variables', 'extras')
+    _fields = {'uri': 'uri', 'lineNumber': 'line_number', 'message': 'message', 'codeSnip': 'code_snip',
+               'variables': 'variables'}
+
+    def __init__(self, uri=None, line_number=None, message=None, code_snip=None, variables=None, extras=None):
+        self.uri = uri
+        self.line_number = line_number
+        self.message = message
+        self.code_snip = code_snip
+        self.variables = variables
+        self.extras = extras
+
+
+class IncidentList:
+    """
+    Incidents of a violation stored column-wise, `Incident` objects are created on access.
+
+    Attributes:
+        uris (list): interned URIs
+        line_numbers (array|list): line numbers, an array of integers unless some are missing or not integers
+        messages (list), code_snips (list): strings or None
+        variables (list): variables dict of each incident, None if no incident has any
+        extras (list): other fields of each incident, None if no incident has any
+    """
+    __slots__ = ('uris', 'line_numbers', 'messages', 'code_snips', 'variables', 'extras')
+
+    def __init__(self, incidents=(), strings=None):
+        strings = strings if strings is not None else {}
+        self.uris, self.messages, self.code_snips = [], [], []
+        variables, extras, line_numbers = [], [], []
+        for incident in incidents:
+            incident = dict(incident)
+            uri = incident.pop('uri', None)
+            self.uris.append(sys.intern(uri) if isinstance(uri, str) else uri)
+            line_numbers.append(incident.pop('lineNumber', None))
+            message = incident.pop('message', None)
+            self.messages.append(strings.setdefault(message, message) if isinstance(message, str) else message)
+            self.code_snips.append(incident.pop('codeSnip', None))
+            variables.append(incident.pop('variables', None))
+            extras.append(incident or None)
+        if all(type(line) is int for line in line_numbers):
+            self.line_numbers = array('q', line_numbers)
+        else:
+            self.line_numbers = line_numbers
+        self.variables = variables if any(v is not None for v in variables) else None
+        self.extras = extras if any(e is not None for e in extras) else None
+
+    def __len__(self):
+        return len(self.uris)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Incident(self.uris[index], self.line_numbers[index], self.messages[index], self.code_snips[index],
+                        self.variables[index] if self.variables is not None else None,
+                        self.extras[index] if self.extras is not None else None)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, (IncidentList, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'IncidentList(%d incidents)' % len(self)
+
+
+class Violation(_Record):
+    """A violation (or an insight) of a ruleset, `incidents` is an IncidentList."""
+    __slots__ = ('rule_id', 'description', 'category', 'effort', 'labels', 'links', 'incidents', 'extras')
+    _fields = {'description': 'description', 'category': 'category', 'effort': 'effort', 'labels': 'labels',
+               'links': 'links', 'incidents': 'incidents'}
+
+    def __init__(self, rule_id, data, strings=None):
+        strings = strings if strings is not None else {}
+        data = dict(data)
+        self.rule_id = sys.intern(rule_id) if isinstance(rule_id, str) else rule_id
+        self.description = _shared(data.pop('description', None), strings)
+        self.category = _shared(data.pop('category', None), strings)
+        self.effort = data.pop('effort', None)
+        self.labels = _shared_list(data.pop('labels', None), strings)
+        self.links = data.pop('links', None)
+        incidents = data.pop('incidents', None)
+        self.incidents = IncidentList(incidents, strings) if incidents is not None else None
+        self.extras = data or None
+
+
+class Ruleset(_Record):
+    """A ruleset of the output, `violations` and `insights` are dicts of rule ID -> Violation."""
+    __slots__ = ('name', 'description', 'tags', 'violations', 'insights', 'unmatched', 'skipped', 'errors', 'extras')
+    _fields = {'name': 'name', 'description': 'description', 'tags': 'tags', 'violations': 'violations',
+               'insights': 'insights', 'unmatched': 'unmatched', 'skipped': 'skipped', 'errors': 'errors'}
+
+    def __init__(self, data, strings=None):
+        strings = strings if strings is not None else {}
+        data = dict(data)
+        name = data.pop('name', None)
+        self.name = sys.intern(name) if isinstance(name, str) else name
+        self.description = _shared(data.pop('description', None), strings)
+        self.tags = _shared_list(data.pop('tags', None), strings)
+        self.violations = _violations(data.pop('violations', None), strings)
+        self.insights = _violations(data.pop('insights', None), strings)
+        self.unmatched = data.pop('unmatched', None)
+        self.skipped = data.pop('skipped', None)
+        self.errors = data.pop('errors', None)
+        self.extras = data or None
+
+
+def _shared(value, strings):
+    return strings.setdefault(value, value) if isinstance(value, str) else value
+
+
+def _shared_list(values, strings):
+    return [_shared(value, strings) for value in values] if isinstance(values, list) else values
+
+
+def _violations(violations, strings):
+    if violations is None:
+        return None
+    if not isinstance(violations, dict):
+        return violations    # unexpected shape, kept as parsed
+    return {rule_id: Violation(rule_id, violation, strings) if isinstance(violation, dict) else violation
+            for rule_id, violation in violations.items()}
+
+
+def iter_output(path):
+    """
+    Streams rulesets of an output.yaml as `Ruleset` objects, only one ruleset is held as parsed YAML at a time.
+
+    Args:
+        path (str): path to output.yaml
+
+    Returns:
+        generator of Ruleset
+    """
+    strings = {}
+    rulesets = iter_rulesets(path)
+    try:
+        for ruleset in rulesets:
+            yield Ruleset(ruleset, strings) if isinstance(ruleset, dict) else ruleset
+    finally:
+        rulesets.close()
+
+
+def load_output(path):
+    """
+    Loads an output.yaml into the compact model.
+
+    Returns:
+        list: Ruleset objects
+    """
+    return list(iter_output(path))
@@ -1,12 +1,21 @@
+import functools
 import os
 import re
 import yaml
 
+from utils.golden import DEPENDENCIES_GOLDEN, OUTPUT_GOLDEN, compare_with_golden, write_golden
+from utils.output_diff import diff_dependencies, diff_output
+from utils.parallel_normalize import normalize_dependencies_with_digest, normalize_output_with_digest
+from utils.yaml_loader import load_yaml_file
+
 
 def assert_analysis_output_violations(expected_output_dir, output_dir, input_root_path = None):
     """
     Asserts that the Violations (Issues) and their Incidents from analysis output
 
+    The expected output is the pre-normalized golden `output.jsonl` (see utils.golden) if present in
+    `expected_output_dir`, otherwise `output.yaml`. A missing expected output is initialized as a golden.
+
     Raises:
         AssertionError: If analysis output (violations&incidents) were different.
 
@@ -19,31 +28,41 @@ def assert_analysis_output_violations(expected_output_dir, output_dir, input_roo
     got_output, got_output_path = get_dict_from_output_file("output.yaml", dir=output_dir)
     got_output_normalized_path = got_output_path + ".normalized.yaml"
 
-    # create a preprocessed/normalized outfile file to allow its comparison across platforms and setups
-    got_output = normalize_output(got_output, input_root_path)
-    with open(got_output_normalized_path, 'w') as f:
-        yaml.dump(got_output, f)
+    # preprocess/normalize the output to allow its comparison across platforms and setups
+    got_output, got_digest = normalize_output_with_digest(got_output, input_root_path)
+    got_compared, expected_digest = got_output, None
 
     if not os.path.exists(expected_output_dir):
         os.mkdir(expected_output_dir)
 
-    if not os.path.exists(expected_output_path):
-        with open(expected_output_path, 'w') as f:
-            yaml.dump(normalize_output(got_output, input_root_path), f)
+    golden_path = os.path.join(expected_output_dir, OUTPUT_GOLDEN)
+    if os.path.exists(golden_path):
+        # only rulesets with a digest different from the golden are parsed and compared
+        expected_output, got_compared = compare_with_golden(golden_path, got_output, 'output', got_digest)
+        expected_digest = got_digest = None
 
-        assert False, "Expected output file '%s' did not exist, initializing it with the current test output" % got_output_normalized_path
+    elif not os.path.exists(expected_output_path):
+        _write_normalized(got_output, got_output_normalized_path)
+        write_golden(golden_path, got_output, 'output')
+
+        assert False, "Expected output file '%s' did not exist, initializing it with the current test output" % golden_path
 
     else:
-        with open(expected_output_path) as f:
-            expected_output = yaml.safe_load(f)
-        expected_output = normalize_output(expected_output, input_root_path)
-    assert got_output == expected_output, "Got different analysis output: \n%s" % get_files_diff(expected_output_path, got_output_normalized_path)
+        expected_output = load_yaml_file(expected_output_path)
+        expected_output, expected_digest = normalize_output_with_digest(expected_output, input_root_path)
+    differences = diff_output(expected_output, got_compared, expected_digest=expected_digest, got_digest=got_digest)
+    if differences:
+        _write_normalized(got_output, got_output_normalized_path)
+    assert not differences, "Got different analysis output (- expected, + got), normalized output in %s:\n%s" % (got_output_normalized_path, differences)
 
 
 def assert_analysis_output_dependencies(expected_output_dir, output_dir, input_root_path = None):
     """
     Asserts that the Dependencies from analysis output
 
+    The expected dependencies are the pre-normalized golden `dependencies.jsonl` (see utils.golden) if present in
+    `expected_output_dir`, otherwise `dependencies.yaml`. Missing expected dependencies are initialized as a golden.
+
     Raises:
         AssertionError: If dependencies were different.
 
@@ -56,23 +75,33 @@ def assert_analysis_output_dependencies(expected_output_dir, output_dir, input_r
     got_dependencies, got_dependencies_path = get_dict_from_output_file("dependencies.yaml", dir=output_dir)
     got_dependencies_normalized_path = got_dependencies_path + ".normalized.yaml"
 
-    # create a preprocessed/normalized outfile file to allow its comparision across platforms and setups
-    with open(got_dependencies_normalized_path, 'w') as f:
-            yaml.dump(normalize_dependencies(got_dependencies, input_root_path), f)
-    with open(got_dependencies_normalized_path, encoding='utf-8') as file:
-        got_dependencies = yaml.safe_load(file)
+    # preprocess/normalize the dependencies to allow their comparision across platforms and setups
+    got_dependencies, got_digest = normalize_dependencies_with_digest(got_dependencies, input_root_path)
+    got_compared = got_dependencies
 
-    if not os.path.exists(expected_dependencies_path):
-        with open(expected_dependencies_path, 'w') as f:
-            yaml.dump(normalize_dependencies(got_dependencies, input_root_path), f)
+    golden_path = os.path.join(expected_output_dir, DEPENDENCIES_GOLDEN)
+    if os.path.exists(golden_path):
+        expected_dependencies, got_compared = compare_with_golden(golden_path, got_dependencies, 'dependencies', got_digest)
 
-        assert False, "Expected dependencies file '%s' did not exist, initializing it with the current test output" % got_dependencies_normalized_path
+    elif not os.path.exists(expected_dependencies_path):
+        _write_normalized(got_dependencies, got_dependencies_normalized_path)
+        write_golden(golden_path, got_dependencies, 'dependencies')
+
+        assert False, "Expected dependencies file '%s' did not exist, initializing it with the current test output" % golden_path
 
     else:
-        with open(expected_dependencies_path) as f:
-            expected_dependencies = yaml.safe_load(f)
+        expected_dependencies = load_yaml_file(expected_dependencies_path)
+
+    differences = diff_dependencies(expected_dependencies, got_compared)
+    if differences:
+        _write_normalized(got_dependencies, got_dependencies_normalized_path)
+    assert not differences, "Got different dependencies output (- expected, + got), normalized output in %s:\n%s" % (got_dependencies_normalized_path, differences)
+
 
-    assert got_dependencies == expected_dependencies, "Got different dependencies output: \n%s" % get_files_diff(expected_dependencies_path, got_dependencies_normalized_path)
+def _write_normalized(data, path):
+    """Keeps the normalized output next to the original one, written only when it needs to be inspected."""
+    with open(path, 'w') as f:
+        yaml.dump(data, f)
 
 
 def get_dict_from_output_file(filename, dir=None, **kwargs):
@@ -89,12 +118,7 @@ def get_dict_from_output_file(filename, dir=None, **kwargs):
         report_path = dir
     output_path = os.path.join(report_path, filename)
 
-    with open(output_path, encoding='utf-8') as file:
-        return yaml.safe_load(file), output_path
-
-
-def get_files_diff(a, b):
-    return os.popen("diff -u '%s' '%s'" % (a, b)).read()
+    return load_yaml_file(output_path), output_path
 
 
 def normalize_output(rulesets: dict, input_root_path):
@@ -102,6 +126,7 @@ def normalize_output(rulesets: dict, input_root_path):
         Does a pruning on output file to delete not used fields (skipped and unmatched rules),
         makes incident paths generic to allow compare container and container-less results.
     """
+    normalize_uri = get_uri_normalizer(input_root_path)
     for ruleset in rulesets:
         if ruleset.get('unmatched'):
             del ruleset['unmatched']
@@ -117,15 +142,11 @@ def normalize_output(rulesets: dict, input_root_path):
                     for incident in violation['incidents']:
                         # grep codeSnip lines to the one with incident to not depend on different analyzer context size
                         if incident.get('codeSnip') and incident.get('uri'):
-                            for line in incident['codeSnip'].splitlines():
-                                line = line.strip()
-                                if line.startswith(str(incident['lineNumber'])):
-                                    line_no_str = str(incident['lineNumber'])
-                                    after_number = line[len(line_no_str):].lstrip()
-                                    incident['codeSnip'] = line_no_str + ' ' + after_number
-                                    break
+                            line = get_code_snip_line(incident['codeSnip'], incident['lineNumber'])
+                            if line is not None:
+                                incident['codeSnip'] = line
                             # normalize incidents path to make compatible container with containerless, fix slashes, etc.
-                            incident['uri'] = trim_incident_uri(repr(incident['uri']), repr(input_root_path))
+                            incident['uri'] = normalize_uri(incident['uri'])
                         else:
                             print("Warning: invalid incident: %s" % incident)
                         if incident.get('variables'):
@@ -142,11 +163,69 @@ def normalize_output(rulesets: dict, input_root_path):
 
     return rulesets
 
+
+# Line boundaries of str.splitlines() other than \n, code snippets containing them take the slow path
+_RARE_LINE_BREAKS = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def get_code_snip_line(code_snip, line_number):
+    """
+        Returns the incident line of a code snippet as `<number> <code>`, None if the snippet has no such line.
+
+        The line is the first one starting with the line number (leading whitespace ignored), it is located with
+        str.find() instead of splitting the whole snippet.
+    """
+    line_no_str = str(line_number)
+    if _RARE_LINE_BREAKS.search(code_snip):
+        for line in code_snip.splitlines():
+            line = line.strip()
+            if line.startswith(line_no_str):
+                return line_no_str + ' ' + line[len(line_no_str):].lstrip()
+        return None
+
+    pos = code_snip.find(line_no_str)
+    while pos >= 0:
+        line_start = code_snip.rfind('\n', 0, pos) + 1
+        line_end = code_snip.find('\n', pos)
+        if line_end < 0:
+            line_end = len(code_snip)
+        if line_start == pos or code_snip[line_start:pos].isspace():
+            return line_no_str + ' ' + code_snip[pos + len(line_no_str):line_end].strip()
+        pos = code_snip.find(line_no_str, line_end)
+    return None
+
+
+class IncidentUriNormalizer:
+    """
+        Callable equivalent of `trim_incident_uri(repr(uri), repr(input_root_path))` for one input root.
+
+        The input root prefixes are prepared once and results are memoized per distinct URI,
+        as thousands of incidents of an application share a handful of file URIs.
+    """
+
+    def __init__(self, input_root_path):
+        self.root, self.root_forward = _prepare_root(repr(input_root_path))
+        self.cache = {}
+
+    def __call__(self, uri):
+        result = self.cache.get(uri)
+        if result is None:
+            result = self.cache[uri] = _trim_uri(repr(uri).replace("'", ""), self.root, self.root_forward)
+        return result
+
+
+@functools.lru_cache(maxsize=32)
+def get_uri_normalizer(input_root_path):
+    """Shared IncidentUriNormalizer of an input root, e.g. for both the expected and the actual output."""
+    return IncidentUriNormalizer(input_root_path)
+
+
 def normalize_dependencies(dependencies_set: dict, input_root_path):
     """
         Does a pruning on dependencies file to delete not used fields (extras),
         makes prefix paths generic to allow compare container and container-less results.
     """
+    normalize_uri = get_uri_normalizer(input_root_path)
     for dependencies in dependencies_set:
         if dependencies.get('fileURI'):
             dependencies['fileURI'] = trim_incident_uri(dependencies['fileURI'], repr(input_root_path))
@@ -156,7 +235,7 @@ def normalize_dependencies(dependencies_set: dict, input_root_path):
                 del dependency['extras']
 
             if dependency.get('prefix'):
-                dependency['prefix'] = trim_incident_uri(repr(dependency['prefix']), repr(input_root_path))
+                dependency['prefix'] = normalize_uri(dependency['prefix'])
 
             if dependency.get('type') and dependency.get('type').endswith('\r'):
                 dependency['type'] = dependency['type'][:-1]    # workaround until https://github.com/konveyor/analyzer-lsp/issues/774 is solved
@@ -166,15 +245,20 @@ def normalize_dependencies(dependencies_set: dict, input_root_path):
 
 def trim_incident_uri(uri, input_root_path):
     uri = uri.replace("'", "") # remove potential repr() wrapper chars
+    return _trim_uri(uri, *_prepare_root(input_root_path))
+
+def _prepare_root(input_root_path):
     input_root_path = input_root_path.replace("'", "")
+    input_root_path_forward = input_root_path.replace("\\", "/")   # replace windows back-slashes with unix slashes
+    input_root_path_forward = input_root_path_forward.replace("//", "/")
+    return input_root_path, input_root_path_forward
 
+def _trim_uri(uri, input_root_path, input_root_path_forward):
     uri = uri.replace(input_root_path, "")  # remove containerless test input prefix path
-    input_root_path = input_root_path.replace("\\", "/")   # replace windows back-slashes with unix slashes
-    input_root_path = input_root_path.replace("//", "/")
     uri = uri.replace("\\", "/")   # replace windows back-slashes with unix slashes
     uri = uri.replace("file:///opt/input/source/", "") # remove container analysis input mount prefix
     uri = uri.replace("//", "/")
-    uri = uri.replace(input_root_path, "")  # remove input prefix path (with forward-only slashes)
+    uri = uri.replace(input_root_path_forward, "")  # remove input prefix path (with forward-only slashes)
 
     # Ensure paths are relative
     uri = uri.replace("file:////", "")    # ensure windows&unix mixture will not produce invalid file protocol prefix
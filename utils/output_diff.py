@@ -0,0 +1,170 @@
+"""
+Structural comparison of normalized analysis outputs.
+
+Incidents are indexed by (ruleset, ruleID, uri, lineNumber) on both sides, equal subtrees are skipped by their
+digests (see utils.digest) and only added (+), removed (-) and changed (~) entries are reported, grouped by ruleset and rule, e.g.:
+
+    ruleset eap7/weblogic, rule weblogic-eap7-0001:
+      - src/main/java/Foo.java:12
+      + src/main/java/Foo.java:13
+      ~ src/main/java/Bar.java:20 message: 'old text' -> 'new text'
+"""
+from utils.digest import changed_children, digest_dependencies, digest_output
+
+DEFAULT_LIMIT = 200
+VALUE_WIDTH = 80
+
+
+class _Report:
+    """Collects diff lines under group headers, up to `limit` lines."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lines = []
+        self.omitted = 0
+        self._header = None
+
+    def add(self, header, line):
+        if len(self.lines) >= self.limit:
+            self.omitted += 1
+            return
+        if header != self._header:
+            self.lines.append(header + ':')
+            self._header = header
+        self.lines.append('  ' + line)
+
+    def __bool__(self):
+        return bool(self.lines or self.omitted)
+
+    def __str__(self):
+        lines = list(self.lines)
+        if self.omitted:
+            lines.append('... and %d more differences' % self.omitted)
+        return '\n'.join(lines)
+
+
+def diff_output(expected, got, limit=DEFAULT_LIMIT, expected_digest=None, got_digest=None):
+    """
+    Compares two normalized analysis outputs (lists of rulesets).
+
+    Root digests are compared first, then only rulesets, violations and incidents with different digests
+    are descended into (see utils.digest). Pass the digest trees when an output is compared more than once.
+
+    Args:
+        expected (list): expected rulesets
+        got (list): actual rulesets
+        limit (int): max number of reported lines
+        expected_digest (Node): digest tree of `expected` if already computed
+        got_digest (Node): digest tree of `got` if already computed
+
+    Returns:
+        str: readable differences (- expected, + got), empty string if the outputs are equal
+    """
+    if (expected_digest is None or got_digest is None) and expected == got:
+        return ''     # a one-off == is cheaper than digesting both sides
+    expected_digest = expected_digest or digest_output(expected)
+    got_digest = got_digest or digest_output(got)
+    if expected_digest.digest == got_digest.digest:
+        return ''
+    report = _Report(limit)
+    for name, expected_ruleset, got_ruleset in changed_children(expected_digest, got_digest):
+        header = 'ruleset %s' % name
+        if got_ruleset is None:
+            report.add(header, '- ruleset (%d violations)' % len(expected_ruleset.children))
+        elif expected_ruleset is None:
+            report.add(header, '+ ruleset (%d violations)' % len(got_ruleset.children))
+        else:
+            _diff_node_fields(report, header, '', expected_ruleset, got_ruleset, skip=('violations',))
+            _diff_violations(report, name, expected_ruleset, got_ruleset)
+    if not report:
+        if expected == got:
+            return ''     # same data, digested differently (e.g. 1 and 1.0)
+        return 'Outputs differ only in the order of rulesets or incidents'
+    return str(report)
+
+
+def _diff_violations(report, ruleset_name, expected_ruleset, got_ruleset):
+    for rule_id, expected_violation, got_violation in changed_children(expected_ruleset, got_ruleset):
+        header = 'ruleset %s, rule %s' % (ruleset_name, rule_id)
+        if not isinstance(_value(expected_violation) or {}, dict) or not isinstance(_value(got_violation) or {}, dict):
+            _diff_fields(report, header, '', _value(expected_violation), _value(got_violation))
+        elif got_violation is None:
+            report.add(header, '- violation (%d incidents)' % len(expected_violation.children))
+        elif expected_violation is None:
+            report.add(header, '+ violation (%d incidents)' % len(got_violation.children))
+        else:
+            _diff_node_fields(report, header, '', expected_violation, got_violation, skip=('incidents',))
+            for key, expected_incident, got_incident in changed_children(expected_violation, got_violation):
+                label = '%s:%s' % key if isinstance(key, tuple) else key
+                if got_incident is None:
+                    report.add(header, '- ' + label)
+                elif expected_incident is None:
+                    report.add(header, '+ ' + label)
+                else:
+                    _diff_fields(report, header, label + ' ', expected_incident.value, got_incident.value)
+
+
+def diff_dependencies(expected, got, limit=DEFAULT_LIMIT, expected_digest=None, got_digest=None):
+    """
+    Compares two normalized dependencies outputs, dependency sets are keyed by (provider, fileURI),
+    dependencies by (name, version). Like `diff_output`, only subtrees with different digests are compared.
+
+    Returns:
+        str: readable differences (- expected, + got), empty string if the outputs are equal
+    """
+    if (expected_digest is None or got_digest is None) and expected == got:
+        return ''     # a one-off == is cheaper than digesting both sides
+    expected_digest = expected_digest or digest_dependencies(expected)
+    got_digest = got_digest or digest_dependencies(got)
+    if expected_digest.digest == got_digest.digest:
+        return ''
+    report = _Report(limit)
+    for name, expected_set, got_set in changed_children(expected_digest, got_digest):
+        header = 'dependencies of %s' % name
+        if got_set is None:
+            report.add(header, '- %d dependencies' % len(expected_set.children))
+        elif expected_set is None:
+            report.add(header, '+ %d dependencies' % len(got_set.children))
+        else:
+            _diff_node_fields(report, header, '', expected_set, got_set, skip=('dependencies',))
+            for key, expected_dependency, got_dependency in changed_children(expected_set, got_set):
+                if got_dependency is None:
+                    report.add(header, '- ' + key)
+                elif expected_dependency is None:
+                    report.add(header, '+ ' + key)
+                else:
+                    _diff_fields(report, header, key + ' ', expected_dependency.value, got_dependency.value)
+    if not report:
+        if expected == got:
+            return ''     # same data, digested differently (e.g. 1 and 1.0)
+        return 'Outputs differ only in the order of dependencies'
+    return str(report)
+
+
+def _value(node):
+    return node.value if node is not None else None
+
+
+def _diff_node_fields(report, header, prefix, expected, got, skip=()):
+    """Field differences of two nodes, only if the digests of their own fields differ."""
+    if expected.fields != got.fields:
+        _diff_fields(report, header, prefix, expected.value, got.value, skip=skip)
+
+
+def _diff_fields(report, header, prefix, expected, got, skip=()):
+    if not isinstance(expected, dict) or not isinstance(got, dict):
+        report.add(header, '~ %s%s -> %s' % (prefix, _short(expected), _short(got)))
+        return
+    for field in list(expected) + [field for field in got if field not in expected]:
+        if field in skip:
+            continue
+        expected_value, got_value = expected.get(field), got.get(field)
+        if expected_value != got_value:
+            report.add(header, '~ %s%s: %s -> %s' % (prefix, field, _short(expected_value), _short(got_value)))
+
+
+def _short(value):
+    text = repr(value)
+    if len(text) > VALUE_WIDTH:
+        text = text[:VALUE_WIDTH - 3] + '...'
+    return text
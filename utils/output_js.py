@@ -0,0 +1,215 @@
+"""
+Loader of the static report data (static-report/output.js).
+
+The file is a script assigning the analyzed applications, `window["apps"] = [{...}, {...}]`. It is memory mapped
+and the applications are decoded one at a time with `JSONDecoder.raw_decode` from a window of the mapped bytes
+starting at the application, so reading the first application of a bulk report doesn't parse the others and
+memory stays bounded by the largest single application.
+
+The byte offset, length, id and name of every application are recorded in an index persisted next to the file
+(`output.js.index.json`) the first time all applications are read. Then a single application can be decoded from
+its byte span, e.g. `load_app(path, 'my-app')`. The index also records the number of incidents of each application
+and the digest of its incident counts per rule (see `utils.report_summary.get_incidents_digest`), to compare
+the report with output.yaml without decoding it again.
+"""
+import codecs
+import json
+import mmap
+import os
+import re
+
+from utils.report_summary import count_incidents_by_rule, get_incidents_digest
+
+APPS_ASSIGNMENT = b'window["apps"] = '
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 2
+MIN_WINDOW = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(rb'[ \t\n\r]*')
+
+
+def get_output_js_path(report_path):
+    return os.path.join(report_path, "static-report", "output.js")
+
+
+def get_index_path(path):
+    return path + INDEX_SUFFIX
+
+
+class _MappedFile:
+    """Read-only memory map of a file (None for an empty file), used as a context manager."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.stat = os.fstat(self.file.fileno())
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.stat.st_size else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+def _index_key(stat):
+    return [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+def _load_index(path, stat):
+    try:
+        with open(get_index_path(path), encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get('key') != _index_key(stat):
+        return None
+    return index.get('apps')
+
+
+def _save_index(path, stat, apps):
+    index_path = get_index_path(path)
+    try:
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'key': _index_key(stat), 'apps': apps}, f)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError as e:
+        print("Warning: could not save the report data index %s: %s" % (index_path, e))
+
+
+def _decode_at(data, pos, window, path):
+    """Decodes the JSON value at byte `pos`, returns (value, length in bytes)."""
+    size = len(data)
+    while True:
+        end = min(size, pos + window)
+        # a multi-byte character cut at the end of the window is left out
+        text, _ = codecs.utf_8_decode(data[pos:end], 'strict', end == size)
+        try:
+            value, char_end = _decoder.raw_decode(text)
+        except json.JSONDecodeError as e:
+            if end == size:
+                raise ValueError("Report data file %s: invalid application at byte %d: %s" % (path, pos, e))
+            window *= 4     # the value continues after the window
+            continue
+        length = char_end if text.isascii() else len(text[:char_end].encode('utf-8'))
+        return value, length
+
+
+def _scan_apps(mapped, path):
+    """Yields (byte offset, byte length, app) of the applications in the mapped output.js."""
+    data = mapped.data
+    offset = data.find(APPS_ASSIGNMENT) if data is not None else -1
+    if offset < 0:
+        raise Exception("Report data file %s has no %s assignment" % (path, APPS_ASSIGNMENT.decode()))
+    pos = _whitespace.match(data, offset + len(APPS_ASSIGNMENT)).end()
+    if data[pos:pos + 1] != b'[':
+        raise Exception("Report data file %s does not assign an array to apps" % path)
+    pos = _whitespace.match(data, pos + 1).end()
+    if data[pos:pos + 1] == b']':
+        return
+    window = MIN_WINDOW
+    while True:
+        app, length = _decode_at(data, pos, window, path)
+        yield pos, length, app
+        # next applications are likely of a similar size
+        window = max(MIN_WINDOW, length + length // 4)
+        pos = _whitespace.match(data, pos + length).end()
+        separator = data[pos:pos + 1]
+        if separator == b']':
+            return
+        if separator != b',':
+            raise Exception("Report data file %s: unexpected %r at byte %d of the apps array" % (path, separator, pos))
+        pos = _whitespace.match(data, pos + 1).end()
+
+
+def _index_entry(offset, length, app):
+    app = app if isinstance(app, dict) else {}
+    incidents_by_rule = count_incidents_by_rule(app.get('rulesets') or [])
+    return {'id': app.get('id'), 'name': app.get('name'), 'offset': offset, 'length': length,
+            'incidents': sum(incidents_by_rule.values()), 'incidents_digest': get_incidents_digest(incidents_by_rule)}
+
+
+def iter_apps(path):
+    """
+    Decodes applications of an output.js one at a time, from their indexed byte spans if the index is up to date,
+    otherwise scanning the file and saving the index once all applications were read.
+
+    Args:
+        path (str): path to static-report/output.js
+
+    Returns:
+        generator of application dicts, in the report order
+    """
+    with _MappedFile(path) as mapped:
+        index = _load_index(path, mapped.stat)
+        if index is not None:
+            for entry in index:
+                yield json.loads(mapped.data[entry['offset']:entry['offset'] + entry['length']])
+            return
+        index = []
+        for offset, length, app in _scan_apps(mapped, path):
+            index.append(_index_entry(offset, length, app))
+            yield app
+        _save_index(path, mapped.stat, index)
+
+
+def get_apps_index(path):
+    """
+    Returns the index of an output.js, built (decoding one application at a time) and saved if missing or outdated.
+
+    Returns:
+        list: dicts with id, name, offset and length (in bytes), incidents (number) and incidents_digest
+            of each application, in the report order
+    """
+    with _MappedFile(path) as mapped:
+        index = _load_index(path, mapped.stat)
+        if index is None:
+            index = [_index_entry(offset, length, app) for offset, length, app in _scan_apps(mapped, path)]
+            _save_index(path, mapped.stat, index)
+        return index
+
+
+def iter_app_bytes(path):
+    """
+    Yields the raw JSON of each application of an output.js without decoding it, e.g. to digest it.
+
+    Returns:
+        generator of (index entry, bytes), see `get_apps_index`
+    """
+    index = get_apps_index(path)
+    with _MappedFile(path) as mapped:
+        for entry in index:
+            yield entry, mapped.data[entry['offset']:entry['offset'] + entry['length']]
+
+
+def load_app(path, name):
+    """
+    Decodes a single application of an output.js, found by name or id through the index.
+
+    Raises:
+        KeyError: If there is no such application.
+    """
+    index = get_apps_index(path)
+    for entry in index:
+        if name in (entry['name'], entry['id']):
+            with _MappedFile(path) as mapped:
+                return json.loads(mapped.data[entry['offset']:entry['offset'] + entry['length']])
+    raise KeyError("Report data file %s has no application %s" % (path, name))
+
+
+def load_first_app(path):
+    """Returns the first application of an output.js, the following ones are not decoded."""
+    apps = iter_apps(path)
+    try:
+        return next(apps)
+    except StopIteration:
+        raise IndexError("Report data file %s has no applications" % path)
+    finally:
+        apps.close()
+
+
+def load_apps(path):
+    """Returns the list of all applications of an output.js."""
+    return list(iter_apps(path))
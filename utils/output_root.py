@@ -0,0 +1,219 @@
+"""
+Isolated output roots for tests and analyses.
+
+`create_output_root(name)` gives a test (see the `isolated_output` fixture) or an analysis its own empty output
+directory instead of the shared REPORT_OUTPUT_PATH. When KANTRA_OUTPUT_TMPFS points to a RAM-backed directory
+(e.g. /dev/shm), roots are created there, in a `kantra-outputs-<pid>` area removed at exit, as long as the area
+stays below KANTRA_OUTPUT_TMPFS_MAX_SIZE MB and the tmpfs has free space; otherwise they fall back to the disk,
+beside the session REPORT_OUTPUT_PATH (`<REPORT_OUTPUT_PATH>-isolated` and `<REPORT_OUTPUT_PATH>-planned`), where
+tests clearing REPORT_OUTPUT_PATH don't wipe them.
+
+`snapshot_dir(source, destination)` mirrors an output with hardlinks (reflinks, then copies where linking is not
+possible, e.g. across filesystems), so tests only reading an analysis output get their own tree without copying
+it. Snapshot files are shared with the source: they must not be modified.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import sys
+import time
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+
+from utils import constants
+from utils.common import get_report_path, safe_dir_name
+from utils.recycler import recycle_dir
+
+DEFAULT_TMPFS_MAX_SIZE = 2048     # MB
+TMPFS_MIN_FREE = 256 * 1024 * 1024
+AREA_PREFIX = 'kantra-outputs-'
+DISK_ROOTS_SUFFIX = '-isolated'
+PLANNED_OUTPUTS_SUFFIX = '-planned'
+SIZE_CHECK_INTERVAL = 5.0        # seconds
+
+# FICLONE ioctl (copy-on-write clone of a file on btrfs, xfs, ...), exposed by fcntl since Python 3.12
+_FICLONE = getattr(fcntl, 'FICLONE', 0x40049409 if sys.platform.startswith('linux') else None) if fcntl else None
+
+_counter = itertools.count()
+_areas = {}                 # tmpfs dir -> area of this process
+_area_sizes = {}            # area -> (time of the check, size in bytes)
+_base_report_path = None
+
+
+def get_tmpfs_dir():
+    """Returns the RAM-backed directory for output roots (KANTRA_OUTPUT_TMPFS), None if disabled."""
+    return os.getenv(constants.KANTRA_OUTPUT_TMPFS) or None
+
+
+def get_tmpfs_max_size():
+    """Returns the max size in bytes of the output roots of this process on tmpfs (KANTRA_OUTPUT_TMPFS_MAX_SIZE in MB)."""
+    value = os.getenv(constants.KANTRA_OUTPUT_TMPFS_MAX_SIZE)
+    return int(float(value if value else DEFAULT_TMPFS_MAX_SIZE) * 1024 * 1024)
+
+
+def set_base_report_path(path):
+    """Records the session REPORT_OUTPUT_PATH before a test replaces it by its own output root."""
+    global _base_report_path
+    if _base_report_path is None:
+        _base_report_path = path
+
+
+def get_base_report_path():
+    """Returns the session REPORT_OUTPUT_PATH, even while a test runs with its own output root."""
+    return _base_report_path or get_report_path()
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True     # e.g. a process of another user
+    return True
+
+
+def _get_tmpfs_area(tmpfs):
+    area = _areas.get(tmpfs)
+    if area is None:
+        # areas of processes which didn't exit cleanly
+        if os.name == 'posix':
+            for name in os.listdir(tmpfs):
+                pid = name[len(AREA_PREFIX):]
+                if name.startswith(AREA_PREFIX) and pid.isdigit() and not _is_running(int(pid)):
+                    shutil.rmtree(os.path.join(tmpfs, name), ignore_errors=True)
+        area = _areas[tmpfs] = os.path.join(tmpfs, AREA_PREFIX + str(os.getpid()))
+        os.makedirs(area, exist_ok=True)
+        atexit.register(shutil.rmtree, area, True)
+    return area
+
+
+def get_disk_dir(suffix):
+    """Returns a disk directory beside the session REPORT_OUTPUT_PATH, e.g. `<REPORT_OUTPUT_PATH>-isolated`."""
+    return os.path.normpath(get_base_report_path()) + suffix
+
+
+def _dir_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _get_tmpfs_directory():
+    """Returns the tmpfs area to create a root in, None if tmpfs is disabled, unavailable or full."""
+    tmpfs = get_tmpfs_dir()
+    if not tmpfs:
+        return None
+    try:
+        area = _get_tmpfs_area(tmpfs)
+        if shutil.disk_usage(area).free >= TMPFS_MIN_FREE and _get_area_size(area) < get_tmpfs_max_size():
+            return area
+        print("Warning: output roots on %s reached their size limit, falling back to the disk" % tmpfs)
+    except OSError as e:
+        print("Warning: could not use %s for output roots (%s), falling back to the disk" % (tmpfs, e))
+    return None
+
+
+def _get_area_size(area):
+    """Size of the area, walked at most once every SIZE_CHECK_INTERVAL seconds as roots are created in bursts."""
+    checked, size = _area_sizes.get(area, (None, 0))
+    now = time.monotonic()
+    if checked is None or now - checked >= SIZE_CHECK_INTERVAL:
+        size = _dir_size(area)
+        _area_sizes[area] = (now, size)
+    return size
+
+
+def _make_root(directory, name):
+    path = os.path.join(directory, '%s-%d-%d' % (safe_dir_name(name), os.getpid(), next(_counter)))
+    os.makedirs(path)
+    return path
+
+
+def create_output_root(name):
+    """
+    Creates an empty output root, on tmpfs if enabled and below its size limit, in `<REPORT_OUTPUT_PATH>-isolated`
+    otherwise.
+
+    Args:
+        name (str): test or analysis name, part of the directory name
+
+    Returns:
+        str: path of the new directory
+    """
+    return _make_root(_get_tmpfs_directory() or get_disk_dir(DISK_ROOTS_SUFFIX), name)
+
+
+def get_analysis_output_dir(name):
+    """
+    Output directory of a session-wide analysis: an output root on tmpfs if enabled,
+    `<REPORT_OUTPUT_PATH>-planned/<name>` otherwise (reused across sessions, as analyses are run with --overwrite).
+    """
+    directory = _get_tmpfs_directory()
+    if directory is not None:
+        return _make_root(directory, name)
+    return os.path.join(get_disk_dir(PLANNED_OUTPUTS_SUFFIX), safe_dir_name(name))
+
+
+def release_output_root(path):
+    """Removes an output root, in the background (see `utils.recycler`)."""
+    recycle_dir(path, recreate=False)
+    # the content is gone, the area size is checked again for the next root
+    _area_sizes.pop(os.path.dirname(os.path.abspath(path)), None)
+
+
+def _link_file(source, destination):
+    try:
+        os.link(source, destination)
+        return 'linked'
+    except OSError:
+        pass
+    if _FICLONE is not None:
+        try:
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            shutil.copystat(source, destination)
+            return 'cloned'
+        except OSError:
+            pass
+    shutil.copy2(source, destination)
+    return 'copied'
+
+
+def snapshot_dir(source, destination):
+    """
+    Mirrors a directory tree, files are hardlinked, cloned (reflink) or copied in this order of preference.
+
+    Args:
+        source (str): directory to snapshot, e.g. an analysis output
+        destination (str): target directory, created if missing, existing files are kept
+
+    Returns:
+        dict: number of files `linked`, `cloned` and `copied`
+    """
+    counts = {'linked': 0, 'cloned': 0, 'copied': 0}
+    for root, dirs, files in os.walk(source):
+        relative = os.path.relpath(root, source)
+        target = destination if relative == os.curdir else os.path.join(destination, relative)
+        os.makedirs(target, exist_ok=True)
+        for name in [name for name in dirs if os.path.islink(os.path.join(root, name))]:
+            dirs.remove(name)
+            files.append(name)
+        for name in files:
+            source_path, target_path = os.path.join(root, name), os.path.join(target, name)
+            if os.path.lexists(target_path):
+                continue
+            if os.path.islink(source_path):
+                os.symlink(os.readlink(source_path), target_path)
+            else:
+                counts[_link_file(source_path, target_path)] += 1
+    return counts
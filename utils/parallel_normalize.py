@@ -0,0 +1,183 @@
+"""
+Normalization and digesting of large analysis outputs across a process pool.
+
+Rulesets (and dependency sets) are independent of each other, so they are split into chunks of about the same
+number of incidents, normalized and digested by worker processes and merged back in their original order.
+Outputs below KANTRA_NORMALIZE_MIN_INCIDENTS incidents are processed in the current process, as starting the pool
+and pickling the data costs more than it saves there.
+
+Workers are forked, inheriting the items without pickling them, only while the current process runs a single thread:
+forking a multi-threaded process (e.g. with the recycler or a profiler thread running) can deadlock the child on a
+lock held by another thread. Otherwise they are started by a forkserver (spawned where there is none) and get their
+chunk items pickled.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import constants
+from utils.digest import digest_dependencies, digest_dependency_set, digest_document, digest_output, digest_ruleset, pack
+
+DEFAULT_MIN_INCIDENTS = 20000
+
+# items of the running _map_chunks, inherited by forked workers instead of being pickled to them
+_shared_items = None
+
+
+def get_normalize_workers():
+    """
+    Returns the size of the normalization process pool.
+
+    Uses the KANTRA_NORMALIZE_WORKERS env variable if set (0 or 1 disables the pool), otherwise the number of cores (max 8).
+    """
+    value = os.getenv(constants.KANTRA_NORMALIZE_WORKERS)
+    if value:
+        return max(1, int(value))
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def get_min_incidents():
+    """Returns the number of incidents from which an output is normalized in the process pool."""
+    value = os.getenv(constants.KANTRA_NORMALIZE_MIN_INCIDENTS)
+    return int(value) if value else DEFAULT_MIN_INCIDENTS
+
+
+def count_incidents(ruleset):
+    violations = ruleset.get('violations') if isinstance(ruleset, dict) else None
+    if not isinstance(violations, dict):
+        return 0
+    return sum(len(violation.get('incidents') or []) for violation in violations.values() if isinstance(violation, dict))
+
+
+def count_dependencies(dependencies):
+    return len(dependencies.get('dependencies') or []) if isinstance(dependencies, dict) else 0
+
+
+def normalize_output_with_digest(rulesets, input_root_path, workers=None):
+    """
+    `normalize_output` returning the digest tree of the normalized output too (see utils.digest),
+    large outputs are normalized and digested in a process pool.
+
+    Args:
+        rulesets (list): parsed output.yaml, normalized in place when processed in the current process
+        input_root_path (str): analyzed application path, see `normalize_output`
+        workers (int): pool size, defaults to `get_normalize_workers()`
+
+    Returns:
+        tuple: (normalized rulesets, Node)
+    """
+    rulesets = rulesets or []
+    results = _map_chunks(_normalize_rulesets, rulesets, count_incidents, input_root_path, workers)
+    if results is None:
+        from utils.output import normalize_output
+        rulesets = normalize_output(rulesets, input_root_path)
+        return rulesets, digest_output(rulesets)
+    normalized = [ruleset for ruleset, _ in results]
+    return normalized, digest_document(normalized, [digest_ruleset(ruleset, packed) for ruleset, packed in results])
+
+
+def normalize_dependencies_with_digest(dependency_sets, input_root_path, workers=None):
+    """
+    `normalize_dependencies` returning the digest tree of the normalized dependencies too,
+    large outputs are normalized and digested in a process pool.
+
+    Returns:
+        tuple: (normalized dependency sets, Node)
+    """
+    dependency_sets = dependency_sets or []
+    results = _map_chunks(_normalize_dependency_sets, dependency_sets, count_dependencies, input_root_path, workers)
+    if results is None:
+        from utils.output import normalize_dependencies
+        dependency_sets = normalize_dependencies(dependency_sets, input_root_path)
+        return dependency_sets, digest_dependencies(dependency_sets)
+    normalized = [dependencies for dependencies, _ in results]
+    return normalized, digest_document(normalized, [digest_dependency_set(dependencies, packed)
+                                                    for dependencies, packed in results])
+
+
+def split_chunks(sizes, count):
+    """
+    Splits items into at most `count` chunks of about the same total size, largest items first.
+
+    Args:
+        sizes (list): size of each item
+        count (int): number of chunks
+
+    Returns:
+        list: non-empty lists of item indexes, each sorted
+    """
+    chunks = [[] for _ in range(max(1, count))]
+    totals = [0] * len(chunks)
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        smallest = totals.index(min(totals))
+        chunks[smallest].append(index)
+        totals[smallest] += sizes[index] + 1
+    return [sorted(chunk) for chunk in chunks if chunk]
+
+
+def _map_chunks(function, items, size, input_root_path, workers):
+    """Runs `function(chunk items, input_root_path)` over chunks in a pool, None if the output is too small for it."""
+    global _shared_items
+    workers = workers or get_normalize_workers()
+    sizes = [size(item) for item in items]
+    if workers < 2 or len(items) < 2 or sum(sizes) < get_min_incidents():
+        return None
+    chunks = split_chunks(sizes, workers)
+    results = [None] * len(items)
+    # forked workers read the items from the parent memory, only results are pickled back
+    context = _get_mp_context()
+    fork = context.get_start_method() == 'fork'
+    try:
+        _shared_items = items if fork else None
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=context) as executor:
+            futures = []
+            for chunk in chunks:
+                args = (function, chunk if fork else [items[i] for i in chunk], input_root_path)
+                futures.append((chunk, executor.submit(_run_chunk, *args)))
+            for chunk, future in futures:
+                for index, result in zip(chunk, future.result()):
+                    results[index] = result
+    except (OSError, BrokenProcessPool) as e:
+        print("Warning: normalization process pool failed (%s), normalizing in the current process" % e)
+        return None
+    finally:
+        _shared_items = None
+    # sections removed by the normalization (e.g. rulesets without violations) come back as None
+    return [result for result in results if result is not None]
+
+
+def _get_mp_context():
+    """Fork context if forking is safe (a single thread running), forkserver or spawn context otherwise."""
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _run_chunk(function, chunk, input_root_path):
+    """Worker: `chunk` is a list of indexes of the inherited items when forked, the items themselves otherwise."""
+    if _shared_items is not None:
+        chunk = [_shared_items[i] for i in chunk]
+    return function(chunk, input_root_path)
+
+
+def _normalize_rulesets(rulesets, input_root_path):
+    """Worker: normalizes and digests rulesets one by one, None for the ones dropped by the normalization.
+    Digest trees are returned packed, see `utils.digest.pack`."""
+    from utils.output import normalize_output
+    results = []
+    for ruleset in rulesets:
+        normalized = normalize_output([ruleset], input_root_path)
+        results.append((normalized[0], pack(digest_ruleset(normalized[0]))) if normalized else None)
+    return results
+
+
+def _normalize_dependency_sets(dependency_sets, input_root_path):
+    """Worker: normalizes and digests dependency sets one by one."""
+    from utils.output import normalize_dependencies
+    results = []
+    for dependencies in normalize_dependencies(dependency_sets, input_root_path):
+        results.append((dependencies, pack(digest_dependency_set(dependencies))))
+    return results
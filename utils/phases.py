@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import constants
+
+# Phase name -> regex of the kantra output line starting it, first match wins.
+# Can be replaced by a JSON file of the same shape referenced by the KANTRA_PHASE_MARKERS env variable.
+DEFAULT_PHASE_MARKERS = {
+    'provider startup': r'(?i)(starting|creating|init\w*) (the )?providers?|provider .*(start|init)',
+    'rule loading': r'(?i)(loading|loaded|parsing) (\d+ )?rules?',
+    'rule evaluation': r'(?i)(evaluating|processing|running) (\d+ )?(rules|source analysis|analysis)',
+    'dependency resolution': r'(?i)(resolving|analyzing|running) dependenc|dependency (analysis|resolution)',
+    'static report': r'(?i)generat\w* (the )?static report|static report',
+    'complete': r'Analysis complete!',
+}
+STARTUP_PHASE = 'startup'
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_session = []
+_lock = threading.Lock()
+
+
+def get_phase_markers():
+    """Phase markers from the JSON file in the KANTRA_PHASE_MARKERS env variable, defaults if not set."""
+    path = os.getenv(constants.KANTRA_PHASE_MARKERS)
+    if not path:
+        return DEFAULT_PHASE_MARKERS
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class PhaseTracker:
+    """
+    Timestamps kantra phase markers while the output is streamed.
+
+    Each marker is matched once, on the first output line it appears in. A phase lasts from its marker until
+    the next seen marker (or the end of the run), the time before the first marker is reported as `startup`.
+    Markers may show up in any order, phases are ordered by the time they were seen.
+    """
+
+    def __init__(self, markers=None):
+        self.started = time.monotonic()
+        self.finished = None
+        self.seen = {}
+        self._pending = [(name, re.compile(pattern)) for name, pattern in (markers or get_phase_markers()).items()]
+        self._partial = ''
+
+    def feed(self, text):
+        if not self._pending:
+            return
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()[-4096:]
+        now = time.monotonic()
+        for line in lines:
+            self._match(_ANSI_ESCAPE.sub('', line), now)
+
+    def _match(self, line, now):
+        for i, (name, regex) in enumerate(self._pending):
+            if regex.search(line):
+                self.seen[name] = now
+                del self._pending[i]
+                return
+
+    def finish(self):
+        if self.finished is None:
+            if self._partial:
+                self._match(_ANSI_ESCAPE.sub('', self._partial), time.monotonic())
+                self._partial = ''
+            self.finished = time.monotonic()
+        return self.get_durations()
+
+    def get_durations(self):
+        """
+        Returns:
+            list: (phase name, seconds) in the order the phases were seen, empty if no marker was seen
+        """
+        if not self.seen:
+            return []
+        end = self.finished if self.finished is not None else time.monotonic()
+        events = [(STARTUP_PHASE, self.started)] + sorted(self.seen.items(), key=lambda item: item[1])
+        return [(name, round(max(0.0, (events[i + 1][1] if i + 1 < len(events) else end) - at), 3))
+                for i, (name, at) in enumerate(events)]
+
+
+def record(label, durations):
+    """Adds the phase durations of one analysis to the session, ignored for runs without any phase marker."""
+    if not durations:
+        return
+    with _lock:
+        _session.append((label, durations))
+    print("Phases of %s: %s" % (label, ', '.join('%s %.1fs' % (name, seconds) for name, seconds in durations)))
+
+
+@contextmanager
+def isolated_session():
+    """
+    Records phase durations into a separate, discarded session while active.
+
+    Used by tests running fake kantra commands, so their runs do not show up in the session phase summary.
+    """
+    global _session
+    with _lock:
+        saved, _session = _session, []
+    try:
+        yield
+    finally:
+        with _lock:
+            _session = saved
+
+
+def get_current_label(default=''):
+    """Label of the currently running test (pytest sets PYTEST_CURRENT_TEST), `default` outside of a test."""
+    current = os.getenv('PYTEST_CURRENT_TEST')
+    return current.rsplit(' ', 1)[0] if current else default
+
+
+def get_session_summary():
+    """
+    Aggregates the recorded phase durations of the session.
+
+    Returns:
+        list: (phase name, count, total seconds, mean seconds, max seconds) in order of the phase's first appearance
+    """
+    phases = {}
+    with _lock:
+        for _, durations in _session:
+            for name, seconds in durations:
+                phases.setdefault(name, []).append(seconds)
+    return [(name, len(values), sum(values), sum(values) / len(values), max(values)) for name, values in phases.items()]
+
+
+def format_session_summary():
+    """Session phase summary as a text table, empty string if nothing was recorded."""
+    summary = get_session_summary()
+    if not summary:
+        return ''
+    with _lock:
+        analyses = len(_session)
+    lines = ['%-24s %6s %10s %10s %10s' % ('phase', 'runs', 'total [s]', 'mean [s]', 'max [s]')]
+    for name, count, total, mean, maximum in summary:
+        lines.append('%-24s %6d %10.1f %10.1f %10.1f' % (name, count, total, mean, maximum))
+    lines.append('%d analyses' % analyses)
+    return '\n'.join(lines)
@@ -0,0 +1,320 @@
+"""
+SQLite index of analysis outputs, e.g. of a bulk analysis over a portfolio of applications.
+
+Applications are streamed one at a time out of static-report/output.js (or output.yaml files when the static report
+was skipped) into tables of apps, rulesets, violations (and insights), labels, incidents and dependencies, so
+portfolio questions are SQL queries instead of re-parsing every report:
+
+    with Portfolio('portfolio.sqlite') as portfolio:
+        portfolio.index_report(report_path)
+        portfolio.apps_with_rule('jni-native-code-00000')
+        portfolio.story_points_by_target()
+        portfolio.query('SELECT name FROM apps WHERE id NOT IN (SELECT app FROM violations)')
+
+Indexing is incremental: every application is stored with the digest of its raw data (its bytes in output.js),
+applications with an unchanged digest are neither decoded nor rewritten, changed ones are replaced in their own
+transaction and the ones gone from the report are removed.
+
+From the command line:
+
+    python -m utils.portfolio index --db portfolio.sqlite <report dir>...
+    python -m utils.portfolio query --db portfolio.sqlite "SELECT ..."
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+
+from utils import constants
+from utils.digest import DIGEST_SIZE, hash_bytes
+from utils.output_js import get_output_js_path, iter_app_bytes
+from utils.yaml_loader import iter_rulesets, iter_yaml_sequence
+
+PORTFOLIO_FILE = 'portfolio.sqlite'
+OUTPUT_FILE = 'output.yaml'
+# files written next to an output file: normalized dumps (utils.output), summary caches (utils.report_summary)
+DERIVED_SUFFIXES = ('.normalized.yaml', '.json', '.tmp')
+SCHEMA_VERSION = 1
+TARGET_LABEL = 'konveyor.io/target='
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,       -- report dir the app was indexed from
+    key TEXT NOT NULL,          -- app id in output.js, output file name otherwise
+    name TEXT,
+    digest TEXT NOT NULL,
+    UNIQUE (source, key)
+);
+CREATE TABLE IF NOT EXISTS rulesets (
+    id INTEGER PRIMARY KEY,
+    app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    name TEXT,
+    description TEXT,
+    skipped INTEGER NOT NULL,   -- number of skipped rules
+    unmatched INTEGER NOT NULL  -- number of unmatched rules
+);
+CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY,
+    app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    ruleset INTEGER NOT NULL REFERENCES rulesets (id) ON DELETE CASCADE,
+    rule_id TEXT NOT NULL,
+    kind TEXT NOT NULL,         -- 'violation' or 'insight'
+    category TEXT,
+    effort INTEGER,
+    description TEXT,
+    incidents INTEGER NOT NULL  -- number of incidents
+);
+CREATE TABLE IF NOT EXISTS labels (
+    violation INTEGER NOT NULL REFERENCES violations (id) ON DELETE CASCADE,
+    app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    label TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    violation INTEGER NOT NULL REFERENCES violations (id) ON DELETE CASCADE,
+    app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    uri TEXT,
+    line_number INTEGER,
+    message TEXT
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    provider TEXT,
+    file_uri TEXT,
+    name TEXT,
+    version TEXT
+);
+CREATE INDEX IF NOT EXISTS rulesets_app ON rulesets (app);
+CREATE INDEX IF NOT EXISTS violations_app ON violations (app);
+CREATE INDEX IF NOT EXISTS violations_ruleset ON violations (ruleset);
+CREATE INDEX IF NOT EXISTS violations_rule_id ON violations (rule_id);
+CREATE INDEX IF NOT EXISTS labels_violation ON labels (violation);
+CREATE INDEX IF NOT EXISTS labels_app ON labels (app);
+CREATE INDEX IF NOT EXISTS labels_label ON labels (label);
+CREATE INDEX IF NOT EXISTS incidents_violation ON incidents (violation);
+CREATE INDEX IF NOT EXISTS incidents_app ON incidents (app);
+CREATE INDEX IF NOT EXISTS incidents_uri ON incidents (uri);
+CREATE INDEX IF NOT EXISTS dependencies_app ON dependencies (app);
+CREATE INDEX IF NOT EXISTS dependencies_name ON dependencies (name, version);
+"""
+TABLES = ('dependencies', 'incidents', 'labels', 'violations', 'rulesets', 'apps')
+
+
+def get_portfolio_path(report_path):
+    """Returns the portfolio database path, KANTRA_PORTFOLIO_DB if set, otherwise portfolio.sqlite in the report dir."""
+    return os.getenv(constants.KANTRA_PORTFOLIO_DB) or os.path.join(report_path, PORTFOLIO_FILE)
+
+
+def _digest_files(paths):
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _iter_dependencies(dependency_sets):
+    """Yields (provider, file URI, dependency) of dependencies.yaml sets or output.js depItems."""
+    for dependency_set in dependency_sets or []:
+        if not isinstance(dependency_set, dict):
+            continue
+        if 'dependencies' not in dependency_set:
+            yield dependency_set.get('provider'), dependency_set.get('fileURI'), dependency_set
+            continue
+        for dependency in dependency_set.get('dependencies') or []:
+            if isinstance(dependency, dict):
+                yield dependency_set.get('provider'), dependency_set.get('fileURI'), dependency
+
+
+def is_output_file(filename):
+    """True for `output.yaml` and bulk outputs `output.yaml.<app>`, not for files derived from them."""
+    if filename == OUTPUT_FILE:
+        return True
+    return filename.startswith(OUTPUT_FILE + '.') and not filename.endswith(DERIVED_SUFFIXES)
+
+
+class Portfolio:
+    """
+    SQLite portfolio database, used as a context manager to close it.
+
+    Attributes:
+        path (str): database file
+        connection (sqlite3.Connection): open connection, for queries the helpers don't cover
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        # one transaction per application, WAL avoids a full journal sync for each
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self._create_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _create_schema(self):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        with self.connection:
+            if version != SCHEMA_VERSION:
+                for table in TABLES:
+                    self.connection.execute('DROP TABLE IF EXISTS %s' % table)
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    def index_report(self, report_path):
+        """
+        Indexes the applications of a report dir, from static-report/output.js, from output.yaml files otherwise
+        (`output.yaml` or `output.yaml.<app>` with their `dependencies.yaml[.<app>]`).
+
+        Args:
+            report_path (str): analysis output directory
+
+        Returns:
+            dict: numbers of `indexed` (new or changed), `unchanged` and `removed` applications
+        """
+        source = os.path.abspath(report_path)
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        keys = set()
+        output_js_path = get_output_js_path(report_path)
+        if os.path.exists(output_js_path):
+            for position, (entry, data) in enumerate(iter_app_bytes(output_js_path)):
+                key = entry['id'] or entry['name'] or str(position)
+                keys.add(key)
+                changed = self._index_app(source, key, entry['name'], hash_bytes(data), lambda: json.loads(data),
+                                          'rulesets', 'depItems')
+                stats['indexed' if changed else 'unchanged'] += 1
+        else:
+            for filename in sorted(os.listdir(report_path)):
+                if not is_output_file(filename):
+                    continue
+                keys.add(filename)
+                changed = self._index_output_yaml(source, report_path, filename)
+                stats['indexed' if changed else 'unchanged'] += 1
+        stats['removed'] = self._remove_apps(source, keys)
+        return stats
+
+    def _index_output_yaml(self, source, report_path, filename):
+        output_path = os.path.join(report_path, filename)
+        suffix = filename[len('output.yaml'):]
+        dependencies_path = os.path.join(report_path, 'dependencies.yaml' + suffix)
+        paths = [output_path] + ([dependencies_path] if os.path.exists(dependencies_path) else [])
+        name = suffix[1:] or os.path.basename(source)
+
+        def load():
+            return {'rulesets': iter_rulesets(output_path),
+                    'dependencies': iter_yaml_sequence(dependencies_path) if len(paths) > 1 else []}
+        return self._index_app(source, filename, name, _digest_files(paths), load, 'rulesets', 'dependencies')
+
+    def _index_app(self, source, key, name, digest, load, rulesets_field, dependencies_field):
+        """(Re)indexes an application if its digest changed, `load()` returns its data. Returns True if it did."""
+        row = self.connection.execute('SELECT digest FROM apps WHERE source = ? AND key = ?', (source, key)).fetchone()
+        if row is not None and row[0] == digest:
+            return False
+        app_data = load()
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute('DELETE FROM apps WHERE source = ? AND key = ?', (source, key))
+            app = cursor.execute('INSERT INTO apps (source, key, name, digest) VALUES (?, ?, ?, ?)',
+                                 (source, key, name, digest)).lastrowid
+            for ruleset in app_data.get(rulesets_field) or []:
+                if isinstance(ruleset, dict):
+                    self._insert_ruleset(cursor, app, ruleset)
+            cursor.executemany('INSERT INTO dependencies (app, provider, file_uri, name, version) VALUES (?, ?, ?, ?, ?)',
+                               ((app, provider, file_uri, dependency.get('name'), dependency.get('version'))
+                                for provider, file_uri, dependency
+                                in _iter_dependencies(app_data.get(dependencies_field))))
+        return True
+
+    def _insert_ruleset(self, cursor, app, ruleset):
+        ruleset_id = cursor.execute(
+            'INSERT INTO rulesets (app, name, description, skipped, unmatched) VALUES (?, ?, ?, ?, ?)',
+            (app, ruleset.get('name'), ruleset.get('description'), len(ruleset.get('skipped') or []),
+             len(ruleset.get('unmatched') or []))).lastrowid
+        for kind, field in (('violation', 'violations'), ('insight', 'insights')):
+            violations = ruleset.get(field)
+            if not isinstance(violations, dict):
+                continue
+            for rule_id, violation in violations.items():
+                if not isinstance(violation, dict):
+                    continue
+                incidents = [incident for incident in violation.get('incidents') or [] if isinstance(incident, dict)]
+                violation_id = cursor.execute(
+                    'INSERT INTO violations (app, ruleset, rule_id, kind, category, effort, description, incidents) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (app, ruleset_id, rule_id, kind, violation.get('category'), violation.get('effort'),
+                     violation.get('description'), len(incidents))).lastrowid
+                cursor.executemany('INSERT INTO labels (violation, app, label) VALUES (?, ?, ?)',
+                                   ((violation_id, app, label) for label in violation.get('labels') or []))
+                cursor.executemany('INSERT INTO incidents (violation, app, uri, line_number, message) '
+                                   'VALUES (?, ?, ?, ?, ?)',
+                                   ((violation_id, app, incident.get('uri'), incident.get('lineNumber'),
+                                     incident.get('message')) for incident in incidents))
+
+    def _remove_apps(self, source, keys):
+        """Removes applications of `source` not in `keys`, returns how many."""
+        stale = [key for (key,) in self.connection.execute('SELECT key FROM apps WHERE source = ?', (source,))
+                 if key not in keys]
+        with self.connection:
+            self.connection.executemany('DELETE FROM apps WHERE source = ? AND key = ?', ((source, key) for key in stale))
+        return len(stale)
+
+    def query(self, sql, *params):
+        """Runs a query, returns the list of rows (tuples)."""
+        return self.connection.execute(sql, params).fetchall()
+
+    def query_value(self, sql, *params):
+        """Runs a query, returns the first column of its first row (None if there is no row)."""
+        row = self.connection.execute(sql, params).fetchone()
+        return row[0] if row is not None else None
+
+    def apps_with_rule(self, rule_id):
+        """Returns names of applications with incidents of a rule, sorted."""
+        return [name for (name,) in self.query(
+            'SELECT DISTINCT apps.name FROM violations JOIN apps ON apps.id = violations.app '
+            'WHERE violations.rule_id = ? AND violations.incidents > 0 ORDER BY apps.name', rule_id)]
+
+    def story_points_by_target(self):
+        """Returns a dict of target -> story points (effort x incidents of the violations labeled with the target)."""
+        rows = self.query(
+            'SELECT labels.label, SUM(violations.effort * violations.incidents) FROM labels '
+            'JOIN violations ON violations.id = labels.violation '
+            "WHERE labels.label LIKE ? AND violations.kind = 'violation' AND violations.effort > 0 "
+            'GROUP BY labels.label', TARGET_LABEL + '%')
+        return {label[len(TARGET_LABEL):]: points for label, points in rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.portfolio', description="SQLite index of analysis outputs")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    index = subparsers.add_parser('index', help="index (incrementally) the applications of report dirs")
+    index.add_argument('--db', required=True)
+    index.add_argument('report_dirs', nargs='+')
+    query = subparsers.add_parser('query', help="run an SQL query, rows are printed tab separated")
+    query.add_argument('--db', required=True)
+    query.add_argument('sql')
+    args = parser.parse_args(argv)
+
+    with Portfolio(args.db) as portfolio:
+        if args.action == 'index':
+            for report_dir in args.report_dirs:
+                stats = portfolio.index_report(report_dir)
+                print("%s: %d apps indexed, %d unchanged, %d removed"
+                      % (report_dir, stats['indexed'], stats['unchanged'], stats['removed']))
+        else:
+            for row in portfolio.query(args.sql):
+                print('\t'.join('' if value is None else str(value) for value in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+
+from utils import constants
+
+PROFILE_FILE_NAME = 'profile.json'
+
+_PROC = '/proc'
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_profile_interval():
+    """Sampling interval in seconds from the KANTRA_PROFILE_INTERVAL env variable, None if profiling is disabled."""
+    value = os.getenv(constants.KANTRA_PROFILE_INTERVAL)
+    return float(value) if value else None
+
+
+def is_supported():
+    return os.path.isdir(os.path.join(_PROC, 'self'))
+
+
+class ProcessTreeProfiler:
+    """
+    Samples resource usage of a process and all its descendants from /proc (Linux only).
+
+    Covers kantra and everything it spawns: Java/Go/Python providers in containerless mode, podman client
+    processes in container mode (the containers themselves run under conmon, outside of the tree).
+    Each sample sums CPU seconds, RSS, PSS, threads and read/write bytes over the live tree,
+    peak RSS is also tracked per process name (e.g. `java`) to show which provider dominates.
+
+    Use `start()`/`stop()` to sample from a background thread, or call `sample()` from an event loop.
+    """
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.started = time.time()
+        self.samples = []
+        self.peak_rss_by_name = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not is_supported():
+            return self
+        self._thread = threading.Thread(target=self._run, name='profiler-%d' % self.pid, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.get_profile()
+
+    def sample(self):
+        pids = get_tree_pids(self.pid)
+        if not pids:
+            return
+        totals = {'cpu': 0.0, 'rss': 0, 'pss': 0, 'threads': 0, 'read': 0, 'write': 0}
+        for pid in pids:
+            stats = _read_process(pid)
+            if stats is None:
+                continue
+            for key in totals:
+                totals[key] += stats[key]
+            name = stats['name']
+            self.peak_rss_by_name[name] = max(self.peak_rss_by_name.get(name, 0), stats['rss'])
+        self.samples.append((round(time.time() - self.started, 3), round(totals['cpu'], 2), totals['rss'],
+                             totals['pss'], totals['threads'], totals['read'], totals['write'], len(pids)))
+
+    def get_profile(self):
+        """Returns the profile as a dict with a summary and a compact (columnar) time series, None if there are no samples."""
+        if not self.samples:
+            return None
+        columns = list(zip(*self.samples))
+        series = dict(zip(('t', 'cpu_seconds', 'rss', 'pss', 'threads', 'read_bytes', 'write_bytes', 'processes'),
+                          (list(column) for column in columns)))
+        summary = {
+            'duration': round(time.time() - self.started, 3),
+            'cpu_seconds': max(series['cpu_seconds']),
+            'peak_rss': max(series['rss']),
+            'peak_pss': max(series['pss']),
+            'peak_threads': max(series['threads']),
+            'peak_processes': max(series['processes']),
+            'read_bytes': max(series['read_bytes']),
+            'write_bytes': max(series['write_bytes']),
+            'peak_rss_by_name': dict(sorted(self.peak_rss_by_name.items(), key=lambda item: -item[1])),
+        }
+        return {'pid': self.pid, 'interval': self.interval, 'summary': summary, 'samples': series}
+
+
+def write_profile(profile, path):
+    """Writes a profile next to the analysis output and prints its summary."""
+    if not profile:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, separators=(',', ':'))
+    summary = profile['summary']
+    print("Resource profile: peak RSS %.1f MB, peak PSS %.1f MB, CPU %.1f s, read %.1f MB, written %.1f MB (%s)" % (
+        summary['peak_rss'] / 2**20, summary['peak_pss'] / 2**20, summary['cpu_seconds'],
+        summary['read_bytes'] / 2**20, summary['write_bytes'] / 2**20, path))
+
+
+def get_tree_pids(root_pid):
+    """PIDs of a process and all its live descendants (the process first), empty if the process is gone."""
+    children = {}
+    for entry in os.listdir(_PROC):
+        if not entry.isdigit():
+            continue
+        stat = _read_stat(int(entry))
+        if stat:
+            children.setdefault(int(stat[1]), []).append(int(entry))
+    if not os.path.exists(os.path.join(_PROC, str(root_pid))):
+        return []
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def _read_stat(pid):
+    """Fields of /proc/<pid>/stat after the command name, index 0 is the state."""
+    try:
+        with open(os.path.join(_PROC, str(pid), 'stat'), 'rb') as f:
+            data = f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return None
+    return data[data.rfind(')') + 2:].split()
+
+
+def _read_process(pid):
+    stat = _read_stat(pid)
+    if stat is None:
+        return None
+    # utime, stime, cutime, cstime are fields 14-17, num_threads 20, rss 24 (1-based, as in proc(5))
+    stats = {
+        'name': _read_name(pid),
+        'cpu': sum(int(value) for value in stat[11:15]) / _CLOCK_TICKS,
+        'threads': int(stat[17]),
+        'rss': int(stat[21]) * _PAGE_SIZE,
+        'pss': 0,
+        'read': 0,
+        'write': 0,
+    }
+    for line in _read_lines(pid, 'smaps_rollup'):
+        if line.startswith('Pss:'):
+            stats['pss'] = int(line.split()[1]) * 1024
+            break
+    for line in _read_lines(pid, 'io'):
+        if line.startswith('read_bytes:'):
+            stats['read'] = int(line.split()[1])
+        elif line.startswith('write_bytes:'):
+            stats['write'] = int(line.split()[1])
+    return stats
+
+
+def _read_name(pid):
+    lines = _read_lines(pid, 'comm')
+    return lines[0].strip() if lines else str(pid)
+
+
+def _read_lines(pid, name):
+    # smaps_rollup/io of other users' processes (e.g. podman helpers) may not be readable
+    try:
+        with open(os.path.join(_PROC, str(pid), name), encoding='utf-8', errors='replace') as f:
+            return f.readlines()
+    except OSError:
+        return []
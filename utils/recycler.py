@@ -0,0 +1,147 @@
+"""
+Asynchronous recycling of output directories.
+
+`recycle_dir(path)` renames a directory aside (`.<name>.trash-<pid>-<n>` next to it, an atomic rename on the same
+filesystem), recreates it empty with the same permissions and deletes the old content on a background thread, so
+the next analysis starts right away instead of waiting for thousands of static report files to be unlinked.
+
+At most KANTRA_RECYCLE_MAX_PENDING directories wait for deletion, `recycle_dir` blocks while there are more
+(0 deletes synchronously). Pending deletions are finished at exit, trash left over by an interrupted run is deleted
+the next time the same directory is recycled.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import stat
+import threading
+from collections import deque
+
+from utils import constants
+
+DEFAULT_MAX_PENDING = 4
+TRASH_MARKER = '.trash-'
+
+_condition = threading.Condition()
+_pending = deque()      # trash directories, the first one is being deleted
+_worker = None
+_counter = itertools.count()
+
+
+def get_max_pending():
+    """Returns the max number of directories waiting for deletion (KANTRA_RECYCLE_MAX_PENDING, 0 disables it)."""
+    value = os.getenv(constants.KANTRA_RECYCLE_MAX_PENDING)
+    return max(0, int(value)) if value else DEFAULT_MAX_PENDING
+
+
+def get_trash_prefix(path):
+    parent, name = os.path.split(os.path.abspath(path).rstrip(os.sep))
+    return os.path.join(parent, '.' + name + TRASH_MARKER)
+
+
+def clear_dir(path):
+    """Deletes the content of a directory synchronously, entry by entry."""
+    for filename in os.listdir(path):
+        file_path = os.path.join(path, filename)
+        try:
+            if os.path.isfile(file_path) or os.path.islink(file_path):
+                os.unlink(file_path)
+            elif os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+        except Exception as e:
+            print(f'Could not remove content of {file_path}. Error: {e}')
+
+
+def recycle_dir(path, recreate=True):
+    """
+    Replaces a directory by an empty one, the old content is deleted in the background.
+
+    Args:
+        path (str): directory to recycle, created if missing
+        recreate (bool): False to only remove the directory (in the background)
+
+    Returns:
+        str: path the old directory was moved to, None if there was nothing to move or it was cleared in place
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        if recreate:
+            os.makedirs(path)
+        return None
+    prefix = get_trash_prefix(path)
+    trash = '%s%d-%d' % (prefix, os.getpid(), next(_counter))
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    try:
+        os.rename(path, trash)
+    except OSError as e:
+        # e.g. a mount point or a directory in use on Windows
+        print("Warning: could not move %s aside (%s), deleting its content in place" % (path, e))
+        clear_dir(path)
+        if not recreate:
+            os.rmdir(path)
+        return None
+    if recreate:
+        os.makedirs(path, exist_ok=True)
+        os.chmod(path, mode)
+
+    parent, trash_name = os.path.split(prefix)
+    leftovers = [os.path.join(parent, name) for name in os.listdir(parent)
+                 if name.startswith(trash_name) and os.path.join(parent, name) != trash]
+    _schedule(leftovers + [trash])
+    return trash
+
+
+def _delete(path):
+    shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(path):
+        print("Warning: could not delete all the content of %s" % path)
+
+
+def _schedule(paths):
+    global _worker
+    max_pending = get_max_pending()
+    if max_pending == 0:
+        for path in paths:
+            _delete(path)
+        return
+    with _condition:
+        _pending.extend(path for path in paths if path not in _pending)
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name='recycler', daemon=True)
+            _worker.start()
+        _condition.notify_all()
+        # back pressure: wait for the worker instead of piling up garbage
+        while len(_pending) > max_pending:
+            _condition.wait()
+
+
+def _work():
+    while True:
+        with _condition:
+            while not _pending:
+                _condition.wait()
+            path = _pending[0]
+        _delete(path)
+        with _condition:
+            _pending.popleft()
+            _condition.notify_all()
+
+
+def get_pending():
+    """Returns the directories waiting for deletion."""
+    with _condition:
+        return list(_pending)
+
+
+def drain(timeout=None):
+    """
+    Waits for pending deletions to finish.
+
+    Returns:
+        bool: False if some are still pending after `timeout` seconds
+    """
+    with _condition:
+        return _condition.wait_for(lambda: not _pending, timeout)
+
+
+atexit.register(drain)
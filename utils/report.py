@@ -1,13 +1,35 @@
-import json
 import os
-import shutil
 
-import yaml
 from bs4 import BeautifulSoup
 
 from utils import constants
+from utils.analysis_report import AnalysisReport
+from utils.output_js import get_apps_index, get_output_js_path, iter_apps, load_apps, load_first_app
+from utils.portfolio import Portfolio, get_portfolio_path
+from utils.recycler import recycle_dir
+from utils.report_cache import freeze, get_report_cache, load_frozen_yaml, thaw
+from utils.report_summary import get_summary
 
 
+def get_analysis_report(**kwargs):
+    """
+        Returns a handle on the artifacts (output.yaml, output.js, dependencies.yaml) of the report,
+        each parsed on first access only, see `utils.analysis_report`.
+
+        Args:
+            **kwargs: Optional keyword arguments.
+                report_path (str): The path to the report dir. If not provided,
+                    the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+                filename (str): output file name, output.yaml by default
+                app (str): name or id of the output.js application matching the output file (bulk analysis)
+
+        Returns:
+            AnalysisReport
+
+        """
+    report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
+    return AnalysisReport(report_path, kwargs.get('filename', 'output.yaml'), kwargs.get('app'))
+
 def get_json_from_report_output_js_file(return_first = True, **kwargs):
     """
         Loads and returns a JSON from the output.js file of the report
@@ -17,20 +39,72 @@ def get_json_from_report_output_js_file(return_first = True, **kwargs):
             **kwargs: Optional keyword arguments.
                 report_path (str): The path to the report file. If not provided,
                     the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+                mutable (bool): return a copy that can be modified instead of the cached read-only data
 
         Returns:
-            JSON data
+            JSON data (read-only, see utils.report_cache)
 
         """
     report_path = os.getenv(constants.REPORT_OUTPUT_PATH)
     report_path = kwargs.get('report_path', report_path)
 
-    with open(os.path.join(report_path, "static-report", "output.js"), encoding='utf-8') as file:
-        js_report = file.read()
+    # apps are decoded one at a time, the first one is returned without decoding the rest
+    output_js_path = get_output_js_path(report_path)
     if return_first:
-        return json.loads(js_report.split('window["apps"] = ')[1])[0]
+        data = get_report_cache().get(output_js_path, 'output.js:first', lambda path: freeze(load_first_app(path)))
     else:
-        return json.loads(js_report.split('window["apps"] = ')[1])
+        data = get_report_cache().get(output_js_path, 'output.js', lambda path: freeze(load_apps(path)))
+    return thaw(data) if kwargs.get('mutable') else data
+
+def iter_json_from_report_output_js_file(**kwargs):
+    """
+        Streams applications of the output.js file of the report one at a time (e.g. of a bulk analysis),
+        so that only one application is held in memory.
+
+        Args:
+            **kwargs: Optional keyword arguments.
+                report_path (str): The path to the report file. If not provided,
+                    the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+
+        Returns:
+            generator of JSON data of the applications
+
+        """
+    report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
+    return iter_apps(get_output_js_path(report_path))
+
+
+def get_report_apps_index(**kwargs):
+    """
+        Returns the index (id, name, byte offset and length) of applications in the output.js file of the report,
+        built on first access and saved next to it, see `utils.output_js`.
+        """
+    report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
+    return get_apps_index(get_output_js_path(report_path))
+
+def get_report_portfolio(**kwargs):
+    """
+        Indexes the applications of the report (incrementally) into the SQLite portfolio database
+        and returns it, see `utils.portfolio`.
+
+        Args:
+            **kwargs: Optional keyword arguments.
+                report_path (str): The path to the report dir. If not provided,
+                    the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+                db_path (str): database file, KANTRA_PORTFOLIO_DB or portfolio.sqlite in the report dir by default
+
+        Returns:
+            Portfolio, to be closed (e.g. used in a `with` statement)
+
+        """
+    report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
+    portfolio = Portfolio(kwargs.get('db_path') or get_portfolio_path(report_path))
+    try:
+        portfolio.index_report(report_path)
+    except Exception:
+        portfolio.close()
+        raise
+    return portfolio
 
 def get_dict_from_output_yaml_file(filename = "output.yaml", **kwargs):
     """
@@ -41,24 +115,32 @@ def get_dict_from_output_yaml_file(filename = "output.yaml", **kwargs):
             **kwargs: Optional keyword arguments.
                 report_path (str): The path to the report file. If not provided,
                     the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+                mutable (bool): return a copy that can be modified (e.g. by `normalize_output`)
+                    instead of the cached read-only data
 
         Returns:
-            Parsed YAML data (typically a list of rulesets)
+            Parsed YAML data (typically a list of rulesets), read-only, see utils.report_cache
 
         """
     report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
 
-    with open(os.path.join(report_path, filename), encoding='utf-8') as file:
-        data = yaml.load(file, Loader=yaml.SafeLoader)
-    return data
+    data = get_report_cache().get(os.path.join(report_path, filename), 'yaml', load_frozen_yaml)
+    return thaw(data) if kwargs.get('mutable') else data
 
 
-def _get_rulesets_from_output_yaml(**kwargs):
-    """Load output.yaml from the report dir and return a list of rulesets."""
-    data = get_dict_from_output_yaml_file(**kwargs)
-    if isinstance(data, list):
-        return data
-    return data.get('rulesets', [])
+def get_output_summary(**kwargs):
+    """
+    Returns the summary (story points, insights, incident counts, ...) of output.yaml in the report dir,
+    computed in one pass and cached next to the output, see `utils.report_summary`.
+
+    Args:
+        **kwargs: Optional keyword arguments.
+            report_path (str): The path to the report dir. If not provided,
+                the function will use the value of the 'REPORT_OUTPUT_PATH' environment variable.
+            filename (str): output file name, output.yaml by default
+    """
+    report_path = kwargs.get('report_path', os.getenv(constants.REPORT_OUTPUT_PATH))
+    return get_summary(os.path.join(report_path, kwargs.get('filename', 'output.yaml')))
 
 
 def assert_non_empty_report(report_path):
@@ -75,16 +157,7 @@ def assert_non_empty_report(report_path):
         None.
 
     """
-    rulesets = _get_rulesets_from_output_yaml(report_path=report_path)
-
-    some_incidents = False
-    for rule in rulesets:
-        violations = rule.get('violations') or {}
-        violation_list = violations.values() if isinstance(violations, dict) else violations
-        for violation in violation_list:
-            if isinstance(violation, dict) and 'incidents' in violation:
-                some_incidents = True
-                break
+    some_incidents = get_output_summary(report_path=report_path)['violations_with_incidents'] > 0
 
     assert os.path.exists(os.path.join(report_path, "static-report", "index.html")), "Missing index.html file in static-report under " + report_path
     assert some_incidents, "Missing incidents in report output"
@@ -110,23 +183,7 @@ def assert_story_points_from_report_file(**kwargs):
 
     """
     min_story_points = kwargs.pop('min_story_points', 1)
-    rulesets = _get_rulesets_from_output_yaml(**kwargs)
-
-    story_points = -1
-    for rule in rulesets:
-        violations = rule.get('violations') or {}
-        violation_list = violations.values() if isinstance(violations, dict) else violations
-        for violation in violation_list:
-            if isinstance(violation, dict) and 'incidents' in violation and 'effort' in violation:
-                if story_points == -1:
-                    story_points = 0
-                effort = violation['effort']
-                if effort is not None and effort >= 0:
-                    story_points += len(violation['incidents']) * effort
-
-    if story_points == -1:
-        story_points = 0 
-    story_points = max(0, story_points)
+    story_points = get_output_summary(**kwargs)['story_points']
     assert story_points >= min_story_points, (
         f"Story points from report ({story_points}) are below minimum required ({min_story_points})"
     )
@@ -149,17 +206,7 @@ def assert_insights_from_report_file(**kwargs):
         None.
 
     """
-    rulesets = _get_rulesets_from_output_yaml(**kwargs)
-
-    occurrences = -1
-    for rule in rulesets:
-        insights = rule.get('insights') or {}
-        insight_list = insights.values() if isinstance(insights, dict) else insights
-        for insight in insight_list:
-            if isinstance(insight, dict) and 'incidents' in insight:
-                if occurrences == -1:
-                    occurrences = 0
-                occurrences += len(insight['incidents'])
+    occurrences = get_output_summary(**kwargs)['insight_occurrences']
 
     assert occurrences > 0, "No insights were generated"
 
@@ -168,15 +215,8 @@ def clearReportDir():
 
     # Check that path exists and it is a dir
     if report_path and os.path.exists(report_path) and os.path.isdir(report_path):
-        # Cleaning up dir's content
-        for filename in os.listdir(report_path):
-            file_path = os.path.join(report_path, filename)
-            try:
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                print(f'Could not remove content of {file_path}. Error: {e}')
+        get_report_cache().invalidate(report_path)
+        # The old dir is moved aside and deleted in the background, see utils.recycler
+        recycle_dir(report_path)
     else:
-        print(f'Path {report_path} does not exist or is not a directory')
\ No newline at end of file
+        print(f'Path {report_path} does not exist or is not a directory')
@@ -0,0 +1,184 @@
+"""
+Process-wide cache of parsed report files (output.yaml, static-report/output.js).
+
+Entries are keyed by (absolute path, mtime_ns, size, loader kind), a file rewritten by kantra has a new key, so
+outdated entries are never returned and are dropped on the next lookup of the same file. Cached data is returned
+as read-only views (FrozenDict/FrozenList, subclasses of dict/list raising TypeError on modification) shared by
+all callers, `thaw()` returns a mutable copy for callers modifying the data (e.g. `normalize_output`).
+
+The total size of cached data, estimated from the size of the parsed files, is capped by
+KANTRA_REPORT_CACHE_MAX_SIZE (MB), least recently used entries are evicted first.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import yaml
+
+from utils import constants
+from utils.yaml_loader import SafeLoader
+
+DEFAULT_MAX_SIZE = 1024     # MB
+# parsed data takes several times the size of the file it was parsed from
+SIZE_FACTOR = 4
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("%s is a read-only view of a cached report, use utils.report_cache.thaw() for a mutable copy"
+                    % type(self).__name__)
+
+
+class FrozenDict(dict):
+    """Read-only dict."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """Read-only list."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value):
+    """Read-only copy of parsed data (dicts and lists, recursively)."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Mutable copy of parsed data, e.g. of a read-only view."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+class _FrozenLoader(SafeLoader):
+    """Safe YAML loader building read-only mappings and sequences right away."""
+
+
+def _construct_frozen_map(loader, node):
+    data = FrozenDict()
+    yield data
+    dict.update(data, loader.construct_mapping(node))
+
+
+def _construct_frozen_seq(loader, node):
+    data = FrozenList()
+    yield data
+    list.extend(data, loader.construct_sequence(node))
+
+
+_FrozenLoader.add_constructor('tag:yaml.org,2002:map', _construct_frozen_map)
+_FrozenLoader.add_constructor('tag:yaml.org,2002:seq', _construct_frozen_seq)
+
+
+def load_frozen_yaml(path):
+    """Loads a YAML file as read-only data."""
+    with open(path, 'rb') as file:
+        return yaml.load(file, Loader=_FrozenLoader)
+
+
+def get_max_size():
+    """Returns the cache size limit in bytes (KANTRA_REPORT_CACHE_MAX_SIZE in MB, 0 disables the cache)."""
+    value = os.getenv(constants.KANTRA_REPORT_CACHE_MAX_SIZE)
+    return int(float(value if value else DEFAULT_MAX_SIZE) * 1024 * 1024)
+
+
+class ReportCache:
+    """
+    LRU cache of parsed files.
+
+    Attributes:
+        max_size (int): max estimated size of cached data in bytes
+        size (int): current estimated size of cached data
+        hits (int), misses (int): lookup counters
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()     # key -> (data, estimated size)
+        self._lock = threading.Lock()
+
+    def get(self, path, kind, loader):
+        """
+        Returns the data `loader(path)` parsed from a file, from the cache if the file didn't change since.
+
+        Args:
+            path (str): parsed file
+            kind (str): loader kind, e.g. 'yaml' or 'output.js', the same file can be cached by several loaders
+            loader (callable): returns read-only data parsed from the file
+
+        Returns:
+            the cached data
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            # the file was rewritten, entries of its previous versions can't be hit anymore
+            self._drop(lambda other: other[0] == path and other[3] == kind)
+
+        data = loader(path)
+        max_size = self.max_size if self.max_size is not None else get_max_size()
+        estimated_size = stat.st_size * SIZE_FACTOR
+        if estimated_size <= max_size:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (data, estimated_size)
+                    self.size += estimated_size
+                while self.size > max_size:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.size -= evicted_size
+        return data
+
+    def invalidate(self, directory=None):
+        """Drops entries of files under `directory` (e.g. a report dir being cleaned), all entries if not set."""
+        prefix = os.path.join(os.path.abspath(directory), '') if directory else ''
+        with self._lock:
+            self._drop(lambda key: key[0].startswith(prefix))
+
+    def _drop(self, predicate):
+        for key in [key for key in self._entries if predicate(key)]:
+            self.size -= self._entries.pop(key)[1]
+
+
+_cache = ReportCache()
+
+
+def get_report_cache():
+    """Returns the process-wide ReportCache."""
+    return _cache
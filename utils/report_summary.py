@@ -0,0 +1,142 @@
+"""
+Single-pass summary of an analysis output (output.yaml).
+
+Story points, insight occurrences, incident counts per ruleset/rule/file and skipped/unmatched rules are computed
+in one pass over the output and cached next to it (`output.yaml.summary.json`), so all report assertions of a test
+share one read of output.yaml. The cache is reused while the size and modification time of the output match.
+"""
+import json
+import os
+
+from utils.digest import hash_bytes
+from utils.model import Violation, iter_output
+
+SUMMARY_VERSION = 1
+SUMMARY_SUFFIX = '.summary.json'
+
+# output path -> (stat key, summary), the file cache read or written by this process
+_memo = {}
+
+
+def compute_summary(rulesets):
+    """
+    Computes the summary of an analysis output.
+
+    Args:
+        rulesets: iterable of rulesets (utils.model.Ruleset or parsed YAML dicts)
+
+    Returns:
+        dict: story_points (sum of effort x incidents, 0 if there is no effort), violations_with_incidents,
+            incidents, insight_occurrences, incidents_by_ruleset, incidents_by_rule ("<ruleset>/<rule ID>"),
+            incidents_by_file (incident URI), skipped and unmatched (number of rules)
+    """
+    summary = {
+        'story_points': 0,
+        'violations_with_incidents': 0,
+        'incidents': 0,
+        'insight_occurrences': 0,
+        'incidents_by_ruleset': {},
+        'incidents_by_rule': {},
+        'incidents_by_file': {},
+        'skipped': 0,
+        'unmatched': 0,
+    }
+    by_file = summary['incidents_by_file']
+    for ruleset in rulesets:
+        name = ruleset.get('name')
+        summary['skipped'] += len(ruleset.get('skipped') or [])
+        summary['unmatched'] += len(ruleset.get('unmatched') or [])
+        ruleset_incidents = 0
+        for rule_id, violation in _get_violations(ruleset, 'violations'):
+            incidents = violation.get('incidents')
+            if incidents is None:
+                continue
+            summary['violations_with_incidents'] += 1
+            effort = violation.get('effort')
+            if effort is not None and effort >= 0:
+                summary['story_points'] += len(incidents) * effort
+            ruleset_incidents += len(incidents)
+            summary['incidents_by_rule']['%s/%s' % (name, rule_id)] = len(incidents)
+            uris = incidents.uris if hasattr(incidents, 'uris') else [incident.get('uri') for incident in incidents]
+            for uri in uris:
+                by_file[uri] = by_file.get(uri, 0) + 1
+        if ruleset_incidents:
+            summary['incidents_by_ruleset'][name] = ruleset_incidents
+        summary['incidents'] += ruleset_incidents
+        for _, insight in _get_violations(ruleset, 'insights'):
+            summary['insight_occurrences'] += len(insight.get('incidents') or [])
+    return summary
+
+
+def count_incidents_by_rule(rulesets):
+    """
+    Counts incidents of the violations of rulesets, as `compute_summary` but without the other fields.
+
+    Returns:
+        dict: "<ruleset>/<rule ID>" -> number of incidents, violations without incidents are left out
+    """
+    counts = {}
+    for ruleset in rulesets:
+        for rule_id, violation in _get_violations(ruleset, 'violations'):
+            incidents = violation.get('incidents')
+            if incidents:
+                counts['%s/%s' % (ruleset.get('name'), rule_id)] = len(incidents)
+    return counts
+
+
+def get_incidents_digest(incidents_by_rule):
+    """
+    Digest of incident counts per rule (see `count_incidents_by_rule`), equal for outputs with the same counts
+    whatever their format, rules with no incidents are ignored.
+    """
+    counts = {rule: count for rule, count in incidents_by_rule.items() if count}
+    return hash_bytes(json.dumps(counts, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+
+def _get_violations(ruleset, field):
+    violations = ruleset.get(field) or {}
+    items = violations.items() if isinstance(violations, dict) else enumerate(violations)
+    return [(rule_id, violation) for rule_id, violation in items if isinstance(violation, (dict, Violation))]
+
+
+def get_summary_path(output_path):
+    return output_path + SUMMARY_SUFFIX
+
+
+def get_summary(output_path):
+    """
+    Returns the summary of an output.yaml, from the cache next to it if it is up to date.
+
+    Args:
+        output_path (str): path to output.yaml
+
+    Returns:
+        dict: see `compute_summary`
+    """
+    stat = os.stat(output_path)
+    key = [SUMMARY_VERSION, stat.st_size, stat.st_mtime_ns]
+    memo = _memo.get(output_path)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+
+    summary_path = get_summary_path(output_path)
+    summary = None
+    try:
+        with open(summary_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            summary = cached['summary']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    if summary is None:
+        summary = compute_summary(iter_output(output_path))
+        try:
+            with open(summary_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'summary': summary}, f)
+            os.replace(summary_path + '.tmp', summary_path)
+        except OSError as e:
+            print("Warning: could not cache the output summary in %s: %s" % (summary_path, e))
+
+    _memo[output_path] = (key, summary)
+    return summary
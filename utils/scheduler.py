@@ -0,0 +1,242 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+from utils import cache, constants
+from utils.async_command import run_command_groups
+from utils.capture import DEFAULT_IGNORE_CASE_PATTERNS, DEFAULT_PATTERNS, OutputCapture, find_spill_file
+from utils.command import RunResult, build_analysis_command, normalize_kwargs, run_command_stream_output
+from utils.common import get_cli_path, get_full_application_path, get_report_path, safe_dir_name
+from utils.phases import PhaseTracker
+from utils.profiler import PROFILE_FILE_NAME, get_profile_interval
+from utils.watchdog import KantraTimeoutError
+
+# Options not affecting the analysis result, ignored when comparing or caching analyses
+OUTPUT_OPTIONS = ('output', 'overwrite', 'bulk')
+
+
+@dataclass
+class AnalysisSpec:
+    """
+    Describes a single kantra "analyze" run, arguments mirror `build_analysis_command`.
+
+    If `output_path` is not set, the run gets its own `<REPORT_OUTPUT_PATH>/<name>` directory.
+    The run output is kept as a bounded OutputCapture, the full log is spilled to `<output dir>/kantra-output-<name>.log`,
+    `output_patterns` lists text the caller looks up in the output, matched over the full stream.
+    Specs sharing the same output directory (e.g. a set of `--bulk` runs) are executed one after another.
+    """
+    name: str
+    binary_name: str
+    sources: list = field(default_factory=list)
+    targets: list = field(default_factory=list)
+    is_bulk: bool = False
+    output_path: str = None
+    settings: str = None
+    with_deps: bool = True
+    kwargs: dict = field(default_factory=dict)
+    cacheable: bool = True
+    output_patterns: tuple = ()
+
+    def get_output_dir(self):
+        if self.output_path:
+            return self.output_path
+        return os.path.join(get_report_path(), safe_dir_name(self.name))
+
+    def get_cache_key(self, command):
+        """Result cache key of the analysis built as `command`, None if it shouldn't be cached."""
+        if not self.cacheable or self.is_bulk or not cache.get_cache_dir():
+            return None
+        options = {name: value for name, value in command.options if name not in OUTPUT_OPTIONS}
+        return cache.analysis_cache_key(get_cli_path(), self.get_input_path(), options)
+
+    def get_input_path(self):
+        if os.path.isabs(self.binary_name):
+            return self.binary_name
+        return get_full_application_path(self.binary_name)
+
+    def get_options(self):
+        """Normalized analysis options known before the command is built, used to plan analyses at collection time."""
+        options = {
+            'sources': sorted(source.lower() for source in self.sources or []),
+            'targets': sorted(target.lower() for target in self.targets or []),
+            'maven-settings': self.settings,
+            'mode': None if self.with_deps else 'source-only',
+            'run-local': os.getenv(constants.RUN_LOCAL_MODE),
+        }
+        options.update(normalize_kwargs(self.kwargs))
+        return options
+
+
+def get_max_parallel():
+    """
+    Returns the size of the pool used to run kantra commands concurrently.
+
+    Uses the KANTRA_MAX_PARALLEL env variable if set, otherwise a half of the available cores (max 4),
+    as each kantra run spawns its own JVM/provider processes.
+    """
+    value = os.getenv(constants.KANTRA_MAX_PARALLEL)
+    if value:
+        return max(1, int(value))
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def run_commands(commands, max_workers=None, multiplexed=True):
+    """
+    Runs named commands concurrently, at most `max_workers` at once.
+
+    Args:
+        commands (dict): run name -> command (as returned by the `build_*_command` helpers)
+        max_workers (int): pool size, defaults to `get_max_parallel()`
+        multiplexed (bool): drive all children from one asyncio loop with `[name]` prefixed output (default),
+            or use a thread per child streaming through `run_command_stream_output`
+
+    Returns:
+        dict: run name -> RunResult, in the order of `commands`
+    """
+    return _run_groups([[(name, command, None, ())] for name, command in commands.items()], max_workers, multiplexed)
+
+
+def run_analyses(specs, max_workers=None, multiplexed=True, dedup=False):
+    """
+    Builds and runs a batch of analyses concurrently, each one writing to its own output directory.
+
+    Args:
+        specs (list): list of AnalysisSpec
+        max_workers (int): pool size, defaults to `get_max_parallel()`
+        multiplexed (bool): see `run_commands`
+        dedup (bool): run specs building the same command (output location aside) only once,
+            the duplicates get the result (and output dir) of the first one
+
+    Returns:
+        dict: spec name -> RunResult, in the order of `specs`
+
+    Raises:
+        Exception: If spec names are not unique or the command can't be built (e.g. missing input application).
+    """
+    names = [spec.name for spec in specs]
+    if len(names) != len(set(names)):
+        raise Exception("Analysis spec names must be unique: %s" % names)
+
+    # Runs sharing an output dir can't overlap, so they are grouped to be executed by a single worker
+    groups = {}
+    results = {}
+    cache_keys = {}
+    duplicates = {}
+    digests = {}
+    patterns = {}       # spec name -> output patterns of the spec and its duplicates
+    for spec in specs:
+        output_dir = spec.get_output_dir()
+        command = build_analysis_command(
+            spec.binary_name,
+            spec.sources,
+            spec.targets,
+            spec.is_bulk,
+            output_path=output_dir,
+            settings=spec.settings,
+            with_deps=spec.with_deps,
+            **spec.kwargs
+        )
+        if dedup and not spec.is_bulk:
+            digest = command.get_digest(exclude=OUTPUT_OPTIONS)
+            if digest in digests:
+                duplicates[spec.name] = digests[digest]
+                patterns[digests[digest]].extend(spec.output_patterns)
+                if not spec.cacheable:
+                    # a duplicate asking for a real run gets it for both
+                    cache_keys.pop(digests[digest], None)
+                continue
+            digests[digest] = spec.name
+        patterns[spec.name] = list(spec.output_patterns)
+        cache_key = spec.get_cache_key(command)
+        if cache_key:
+            cache_keys[spec.name] = cache_key
+        groups.setdefault(os.path.normcase(os.path.abspath(output_dir)), []).append(
+            (spec.name, command, output_dir, patterns[spec.name]))
+
+    # cached results are restored once all duplicates registered their output patterns
+    for key, group in list(groups.items()):
+        remaining = []
+        for name, command, output_dir, run_patterns in group:
+            cached = None
+            if name in cache_keys:
+                cached = _restore_cached_result(name, command, cache_keys[name], output_dir, run_patterns)
+            if cached is not None:
+                results[name] = cached
+                del cache_keys[name]
+            else:
+                remaining.append((name, command, output_dir, run_patterns))
+        if remaining:
+            groups[key] = remaining
+        else:
+            del groups[key]
+
+    results.update(_run_groups(list(groups.values()), max_workers, multiplexed))
+    for name, cache_key in cache_keys.items():
+        if results[name].ok:
+            cache.store(cache_key, results[name].output_dir, returncode=results[name].returncode)
+    for name, original in duplicates.items():
+        results[name] = replace(results[original], name=name)
+    return {name: results[name] for name in names}
+
+
+def run_analysis(spec, multiplexed=True):
+    """Runs a single analysis through the scheduler (and result cache), returns its RunResult."""
+    return run_analyses([spec], multiplexed=multiplexed)[spec.name]
+
+
+def _restore_cached_result(name, command, cache_key, output_dir, patterns=()):
+    meta = cache.restore(cache_key, output_dir)
+    if meta is None:
+        return None
+    # the spill file of the cached run, stored under the name of the run which populated the cache
+    spill_path = find_spill_file(output_dir, name)
+    patterns = tuple(patterns)
+    output = OutputCapture.replay(spill_path, patterns=DEFAULT_PATTERNS + patterns,
+                                  ignore_case_patterns=DEFAULT_IGNORE_CASE_PATTERNS + patterns) if spill_path else ''
+    now = time.time()
+    return RunResult(name, command, meta['returncode'], output, output_dir, now, now, cached=True)
+
+
+def _run_groups(groups, max_workers, multiplexed):
+    results = {}
+    if not groups:
+        return results
+
+    workers = min(max_workers or get_max_parallel(), len(groups))
+    if multiplexed:
+        return run_command_groups(groups, max_concurrent=workers, profile_interval=get_profile_interval())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for group_results in executor.map(_run_group, groups):
+            for result in group_results:
+                results[result.name] = result
+    return results
+
+
+def _run_group(group):
+    return [_run_one(name, command, output_dir, patterns) for name, command, output_dir, patterns in group]
+
+
+def _run_one(name, command, output_dir, patterns=()):
+    capture = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        capture = OutputCapture.for_output_dir(output_dir, name, patterns)
+    profile_path = os.path.join(output_dir, PROFILE_FILE_NAME) if output_dir and get_profile_interval() else None
+    phases = PhaseTracker()
+    started = time.time()
+    try:
+        output = run_command_stream_output(command, capture=capture, profile_path=profile_path, phases=phases,
+                                           name=name)
+        returncode = 0
+    except subprocess.CalledProcessError as e:
+        output = capture if capture is not None else e.output or ''
+        returncode = e.returncode
+    except KantraTimeoutError as e:
+        # Only this run fails, with the diagnostics in its output, the rest of the batch goes on
+        output = capture if capture is not None else e.output
+        return RunResult(name, command, e.returncode, output, output_dir, started, time.time(),
+                         phases=phases.get_durations(), timed_out=e.reason)
+    return RunResult(name, command, returncode, output, output_dir, started, time.time(),
+                     phases=phases.get_durations())
@@ -0,0 +1,112 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from fixtures.analysis_plan import AnalysisPlan
+from utils.cache import cache_disabled, get_cache_dir
+from utils.command import RunResult
+
+
+def _analysis(*args, **kwargs):
+    """Stands for an `analysis` marker, the plan only reads its args and kwargs."""
+    return SimpleNamespace(name='analysis', args=args, kwargs=kwargs)
+
+
+def _item(nodeid, marker, additional_args=None, no_result_cache=False):
+    markers = {'analysis': marker}
+    if no_result_cache:
+        markers['no_result_cache'] = SimpleNamespace(name='no_result_cache', args=(), kwargs={})
+    callspec = SimpleNamespace(params={'additional_args': additional_args}) if additional_args else None
+    return SimpleNamespace(nodeid=nodeid, callspec=callspec, get_closest_marker=markers.get)
+
+
+class TestAnalysisPlan(unittest.TestCase):
+    """
+        Testing the collection-time plan coalesces `analysis` markers into unique analyses run once.
+    """
+
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {'REPORT_OUTPUT_PATH': '/tmp/report', 'KANTRA_CACHE_DIR': '/tmp/cache',
+                                                'KANTRA_OUTPUT_TMPFS': '', 'PROJECT_PATH': os.getcwd()})
+        self.env.start()
+        os.environ.pop('RUN_LOCAL_MODE', None)
+        self.plan = AnalysisPlan()
+        self.runs = []
+        self.run_analyses = mock.patch('fixtures.analysis_plan.run_analyses', side_effect=self._run_analyses)
+        self.run_analyses.start()
+
+    def tearDown(self):
+        self.run_analyses.stop()
+        self.env.stop()
+
+    def _run_analyses(self, specs, dedup=False):
+        self.runs.append((specs, get_cache_dir()))
+        return {spec.name: RunResult(spec.name, None, 0, '', spec.output_path) for spec in specs}
+
+    def test_coalescing(self):
+        for nodeid, marker, additional_args in [
+            ('a', _analysis('administracion_efectivo'), None),
+            ('b', _analysis('administracion_efectivo', **{'run-local': 'true'}), None),
+            ('c', _analysis('administracion_efectivo'), {'--run-local=true': None}),
+            ('d', _analysis('administracion_efectivo', targets=['EAP8', 'Quarkus']), None),
+            ('e', _analysis('administracion_efectivo', targets=['quarkus', 'eap8']), None),
+        ]:
+            self.plan.add(_item(nodeid, marker, additional_args), marker)
+        keys = self.plan.item_keys
+        self.assertEqual(len(self.plan.analyses), 3)
+        self.assertEqual(keys['b'], keys['c'])
+        self.assertEqual(keys['d'], keys['e'])
+        self.assertNotEqual(keys['a'], keys['b'])
+
+        result = self.plan.get_result('c')
+        self.assertIs(result, self.plan.get_result('b'))
+        self.assertIsNot(result, self.plan.get_result('a'))
+        self.plan.get_result('d')
+        self.assertEqual(len(self.runs), 1)
+        specs, _ = self.runs[0]
+        self.assertEqual(len(specs), 3)
+        for spec in specs:
+            self.assertEqual(os.path.dirname(spec.output_path), '/tmp/report-planned')
+        self.assertEqual(result.output_dir, os.path.join('/tmp/report-planned', result.name))
+
+    def test_output_patterns(self):
+        for nodeid, patterns in [('a', ['Error: unknown target:']), ('b', ['failed to stat', 'Error: unknown target:'])]:
+            marker = _analysis('administracion_efectivo', targets=['wrong'], output_patterns=patterns)
+            self.plan.add(_item(nodeid, marker), marker)
+        self.assertEqual(len(self.plan.analyses), 1)
+        self.plan.get_result('a')
+        spec = self.runs[0][0][0]
+        self.assertEqual(spec.output_patterns, ('Error: unknown target:', 'failed to stat'))
+        self.assertNotIn('output_patterns', spec.kwargs)
+
+    def test_no_result_cache(self):
+        cached = _analysis('administracion_efectivo')
+        uncached = _analysis('administracion_efectivo', targets=['quarkus'])
+        self.plan.add(_item('cached', cached), cached)
+        self.plan.add(_item('uncached', uncached, no_result_cache=True), uncached)
+        self.plan.add(_item('uncached-too', uncached), uncached)
+
+        # the plan is triggered by a no_result_cache test, the other analyses still use the cache
+        with cache_disabled():
+            self.plan.get_result('uncached')
+        specs, cache_dir = self.runs[0]
+        self.assertEqual(cache_dir, '/tmp/cache')
+        self.assertEqual({spec.targets[0]: spec.cacheable for spec in specs}, {'eap8': True, 'quarkus': False})
+
+    def test_failed_run_is_not_repeated(self):
+        marker = _analysis('administracion_efectivo')
+        for nodeid in ('a', 'b'):
+            self.plan.add(_item(nodeid, marker), marker)
+        with mock.patch('fixtures.analysis_plan.run_analyses', side_effect=Exception("missing input")) as run_analyses:
+            with self.assertRaisesRegex(Exception, 'missing input'):
+                self.plan.get_result('a')
+            with self.assertRaisesRegex(pytest.fail.Exception, 'missing input'):
+                self.plan.get_result('b')
+        self.assertEqual(run_analyses.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
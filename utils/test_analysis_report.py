@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from analysis_report import AnalysisReport
+
+OUTPUT = [
+    {'name': 'r1', 'description': 'temp ruleset', 'skipped': [],
+     'violations': {'v1': {'effort': 1, 'incidents': [{'uri': 'a', 'lineNumber': 1}, {'uri': 'b', 'lineNumber': 2}]},
+                    'v2': {'incidents': [{'uri': 'a', 'lineNumber': 3}]}},
+     'insights': {'i1': {'incidents': [{'uri': 'c'}]}}},
+    {'name': 'r2', 'violations': {'v3': {'incidents': []}}},
+]
+DEPENDENCIES = [{'provider': 'java', 'dependencies': [{'name': 'dep', 'version': '1'}]}]
+
+
+class TestAnalysisReport(unittest.TestCase):
+    """
+        Testing the single access point to output.yaml, output.js and dependencies.yaml of a report dir.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.dir.name, 'static-report'))
+        with open(os.path.join(self.dir.name, 'output.yaml'), 'w') as f:
+            yaml.dump(OUTPUT, f)
+        with open(os.path.join(self.dir.name, 'dependencies.yaml'), 'w') as f:
+            yaml.dump(DEPENDENCIES, f)
+        self.write_apps([{'id': '0001', 'name': 'app', 'rulesets': OUTPUT, 'depItems': [{'name': 'dep'}]}])
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_apps(self, apps):
+        with open(os.path.join(self.dir.name, 'static-report', 'output.js'), 'w') as f:
+            f.write('window["apps"] = ' + json.dumps(apps))
+
+    def test_access(self):
+        report = AnalysisReport(self.dir.name)
+        self.assertEqual(report.rulesets, OUTPUT)
+        self.assertIs(report.rulesets, report.output)
+        self.assertEqual(sorted(report.violations), ['v1', 'v2', 'v3'])
+        self.assertEqual(list(report.insights), ['i1'])
+        self.assertEqual(report.dep_items, [{'name': 'dep'}])
+        self.assertEqual(report.dependencies, DEPENDENCIES)
+        self.assertEqual(report.get_ruleset(description='temp ruleset')['name'], 'r1')
+        self.assertIsNone(report.get_ruleset(name='r3'))
+        self.assertEqual(report.summary['incidents'], 3)
+
+    def test_rulesets_from_output_js(self):
+        os.remove(os.path.join(self.dir.name, 'output.yaml'))
+        self.assertEqual(AnalysisReport(self.dir.name).rulesets, OUTPUT)
+
+    def test_consistency(self):
+        report = AnalysisReport(self.dir.name)
+        self.assertEqual(report.check_consistency(), [])
+        report.assert_consistent()
+
+        changed = json.loads(json.dumps(OUTPUT))
+        del changed[0]['violations']['v1']['incidents'][0]
+        changed[1]['violations']['v3']['incidents'].append({'uri': 'd'})
+        self.write_apps([{'id': '0001', 'name': 'first', 'rulesets': OUTPUT},
+                         {'id': '0002', 'name': 'app', 'rulesets': changed}])
+        self.assertEqual(AnalysisReport(self.dir.name).check_consistency(), [])
+        report = AnalysisReport(self.dir.name, app='app')
+        self.assertEqual(report.check_consistency(), ['r1/v1: 2 incidents in output.yaml, 1 in output.js',
+                                                      'r2/v3: 0 incidents in output.yaml, 1 in output.js'])
+        with self.assertRaises(AssertionError):
+            report.assert_consistent()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from async_command import MultiplexedRunner, run_command_groups
+from utils.phases import isolated_session
+
+
+@unittest.skipIf(sys.platform == 'win32', "commands are POSIX shell snippets")
+class TestMultiplexedRunner(unittest.TestCase):
+    """
+        Testing `MultiplexedRunner` reads children through PTYs and pipes, echoes prefixed lines and keeps run order.
+    """
+
+    def setUp(self):
+        self.echoed = []
+        self.echo = mock.patch('async_command._safe_stdout_write', side_effect=self.echoed.append)
+        self.echo.start()
+        self.env = mock.patch.dict(os.environ, {'KANTRA_RUN_TIMEOUT': '0', 'KANTRA_STALL_TIMEOUT': '0'})
+        self.env.start()
+        self.enterContext(isolated_session())
+
+    def tearDown(self):
+        self.echo.stop()
+        self.env.stop()
+
+    def _run(self, command, use_pty, output_dir=None, patterns=()):
+        async def main():
+            runner = MultiplexedRunner(use_pty=use_pty)
+            runner.start('app', command, output_dir, patterns)
+            return (await runner.wait())['app']
+        return asyncio.run(main())
+
+    def test_output_is_read_and_prefixed(self):
+        # a line split across writes and a UTF-8 character split across reads
+        command = "printf 'line 1\\nline'; sleep 0.1; printf ' 2 \\303'; sleep 0.1; printf '\\251\\n'; printf tail; exit 3"
+        for use_pty in (True, False):
+            with self.subTest(use_pty=use_pty):
+                del self.echoed[:]
+                result = self._run(command, use_pty)
+                self.assertEqual(result.returncode, 3)
+                self.assertEqual(str(result.output).replace('\r\n', '\n'), 'line 1\nline 2 é\ntail')
+                echoed = ''.join(self.echoed).replace('\r\n', '\n')
+                self.assertEqual(echoed, '[app] line 1\n[app] line 2 é\n[app] tail\n')
+
+    def test_output_dir_capture(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            command = "echo 'Error: unknown target: x'; seq 1 20000; echo 'Analysis complete!'"
+            for use_pty in (True, False):
+                with self.subTest(use_pty=use_pty):
+                    result = self._run(command, use_pty, output_dir, patterns=['Error: unknown target:'])
+                    self.assertEqual(result.returncode, 0)
+                    self.assertIn('Error: unknown target:', result.output)
+                    self.assertIn('Analysis complete!', result.output)
+                    self.assertEqual(os.listdir(output_dir), ['kantra-output-app.log'])
+
+    def test_groups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'first')
+            started = time.monotonic()
+            results = run_command_groups([
+                [('first', "sleep 0.5; echo done > %s" % path, None, ()), ('second', "cat %s" % path, None, ())],
+                [('other', "sleep 0.5; echo other", None, ())],
+            ])
+            elapsed = time.monotonic() - started
+        self.assertEqual(list(results), ['first', 'second', 'other'])
+        # commands of a group run one after another, groups run concurrently
+        self.assertIn('done', str(results['second'].output))
+        self.assertLess(elapsed, 1.0)
+        self.assertTrue(all(result.ok for result in results.values()))
+
+    def test_stalled_run_is_killed(self):
+        with mock.patch.dict(os.environ, {'KANTRA_STALL_TIMEOUT': '0.3', 'KANTRA_KILL_GRACE_PERIOD': '1'}):
+            for use_pty in (True, False):
+                with self.subTest(use_pty=use_pty):
+                    started = time.monotonic()
+                    result = self._run("echo started; sleep 30", use_pty)
+                    self.assertLess(time.monotonic() - started, 10)
+                    self.assertIn('stalled', result.timed_out)
+                    self.assertNotEqual(result.returncode, 0)
+                    self.assertIn('Killed app', str(result.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
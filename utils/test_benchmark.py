@@ -0,0 +1,34 @@
+import unittest
+
+from benchmark import bootstrap_ci, compare, iqr
+
+
+class TestBenchmarkStatistics(unittest.TestCase):
+    """
+        Testing the benchmark gate flags only regressions which are both over the threshold and not noise.
+    """
+
+    def test_iqr(self):
+        self.assertEqual(iqr([1, 2, 3, 4, 5]), 2)
+        self.assertEqual(iqr([7]), 0.0)
+
+    def test_clear_regression(self):
+        comparison = compare([150, 152, 149, 151, 150], [100, 101, 99, 100, 102], threshold=0.2)
+        self.assertTrue(comparison['regressed'])
+        self.assertAlmostEqual(comparison['change'], 0.5)
+        self.assertGreater(comparison['ci'][0], 0)
+
+    def test_within_threshold(self):
+        comparison = compare([110, 111, 109], [100, 101, 99], threshold=0.2)
+        self.assertFalse(comparison['regressed'])
+
+    def test_noise_is_not_a_regression(self):
+        # Median over the threshold, but the samples overlap a lot with the baseline
+        comparison = compare([80, 130, 200], [60, 100, 190], threshold=0.2)
+        self.assertFalse(comparison['regressed'])
+        low, high = bootstrap_ci([80, 130, 200], [60, 100, 190])
+        self.assertLess(low, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
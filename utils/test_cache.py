@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import cache
+from cache import analysis_cache_key, cache_bypass, cache_disabled, evict, get_cache_dir, restore, store
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """
+        Testing the cache key composition, store/restore of analysis outputs and LRU eviction.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.dir.name, 'cache')
+        self.env = mock.patch.dict(os.environ, {'KANTRA_CACHE_DIR': self.cache_dir, 'KANTRA_CACHE_BYPASS': 'false'})
+        self.env.start()
+        self.binary = self._write('kantra', 'kantra v1')
+        self.app = os.path.join(self.dir.name, 'app')
+        self._write(os.path.join('app', 'src', 'Main.java'), 'class Main {}')
+        self.rules = self._write('rules.yaml', '- ruleID: rule-1')
+
+    def tearDown(self):
+        self.env.stop()
+        self.dir.cleanup()
+
+    def _write(self, path, content):
+        path = os.path.join(self.dir.name, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _key(self, **options):
+        options = dict({'source': 'java', 'target': ('cloud-readiness', 'quarkus')}, **options)
+        return analysis_cache_key(self.binary, self.app, options)
+
+    def test_key_is_stable(self):
+        self.assertEqual(self._key(), self._key())
+        self.assertEqual(analysis_cache_key(self.binary, self.app, {'b': '1', 'a': '2'}),
+                         analysis_cache_key(self.binary, self.app, {'a': '2', 'b': '1'}))
+
+    def test_key_composition(self):
+        key = self._key(rules=self.rules)
+        self.assertNotEqual(key, self._key())
+        self.assertNotEqual(key, self._key(rules=self.rules, mode='source-only'))
+
+        # option paths are keyed by their content, not their location
+        moved = self._write('moved/rules.yaml', '- ruleID: rule-1')
+        self.assertEqual(key, self._key(rules=moved))
+        self._write('rules.yaml', '- ruleID: rule-20')
+        self.assertNotEqual(key, self._key(rules=self.rules))
+
+    def test_key_tracks_binary_and_input(self):
+        key = self._key()
+        self._write(os.path.join('app', 'src', 'Other.java'), 'class Other {}')
+        app_key = self._key()
+        self.assertNotEqual(key, app_key)
+        self._write('kantra', 'kantra v2.0')
+        self.assertNotEqual(app_key, self._key())
+
+    def test_store_and_restore(self):
+        output_dir = os.path.join(self.dir.name, 'output')
+        self._write(os.path.join('output', 'output.yaml'), 'rulesets')
+        store('key', output_dir, returncode=0)
+
+        restored_dir = os.path.join(self.dir.name, 'restored')
+        self._write(os.path.join('restored', 'stale.yaml'), 'stale')
+        self.assertEqual(restore('key', restored_dir)['returncode'], 0)
+        self.assertEqual(os.listdir(restored_dir), ['output.yaml'])
+        self.assertIsNone(restore('missing', restored_dir))
+
+    def test_lru_eviction(self):
+        for name in ('old', 'used', 'new'):
+            self._write(os.path.join(name, 'output.yaml'), 'x' * 1000)
+            store(name, os.path.join(self.dir.name, name))
+        meta_time = {'old': 100, 'used': 300, 'new': 200}
+        for name, mtime in meta_time.items():
+            os.utime(os.path.join(self.cache_dir, name, cache.META_FILE_NAME), (mtime, mtime))
+        evict(2000)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['new', 'used'])
+
+        # restoring an entry makes it the most recently used one
+        restore('new', os.path.join(self.dir.name, 'restored'))
+        evict(1000)
+        self.assertEqual(os.listdir(self.cache_dir), ['new'])
+
+    def test_bypass_is_thread_local(self):
+        seen = []
+        with cache_disabled():
+            self.assertIsNone(get_cache_dir())
+            with cache_bypass(False):
+                self.assertEqual(get_cache_dir(), self.cache_dir)
+            thread = threading.Thread(target=lambda: seen.append(get_cache_dir()))
+            thread.start()
+            thread.join()
+            self.assertIsNone(get_cache_dir())
+        self.assertEqual(seen, [self.cache_dir])
+        self.assertEqual(get_cache_dir(), self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
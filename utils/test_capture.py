@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from capture import OutputCapture, find_spill_file
+
+
+class TestOutputCapture(unittest.TestCase):
+    """
+        Testing `OutputCapture` keeps a bounded tail and still matches completion markers over the full stream.
+    """
+
+    def test_match_across_chunks(self):
+        capture = OutputCapture(tail_size=16)
+        for chunk in ["lots of log lines\n" * 100, "Analysis comp", "lete!\n", "trailing noise\n" * 100]:
+            capture.write(chunk)
+        capture.close()
+        self.assertIn('Analysis complete!', capture)
+        self.assertIn('analysis complete', capture.lower())
+        self.assertNotIn('Analysis complete!', capture.tail)
+
+    def test_tail_is_bounded(self):
+        capture = OutputCapture(tail_size=100)
+        for i in range(10000):
+            capture.write("line %d\n" % i)
+        self.assertEqual(len(capture.tail), 100)
+        self.assertTrue(capture.tail.endswith("line 9999\n"))
+        self.assertLess(len(capture._tail), 20)
+        self.assertNotIn('Analysis complete!', capture)
+
+    def test_spill_file(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            capture = OutputCapture.for_output_dir(output_dir, tail_size=10)
+            capture.write("first\n")
+            capture.write("second\n")
+            capture.close()
+            with open(os.path.join(output_dir, "kantra-output.log"), encoding='utf-8') as f:
+                self.assertEqual(f.read(), "first\nsecond\n")
+
+    def test_spill_file_per_run(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            for name in ['app-1', 'app 2']:
+                capture = OutputCapture.for_output_dir(output_dir, name)
+                capture.write("output of %s\n" % name)
+                capture.close()
+            self.assertEqual(sorted(os.listdir(output_dir)), ['kantra-output-app-1.log', 'kantra-output-app_2.log'])
+            self.assertEqual(find_spill_file(output_dir, 'app 2'), os.path.join(output_dir, 'kantra-output-app_2.log'))
+            self.assertIsNone(find_spill_file(output_dir))
+
+    def test_registered_pattern(self):
+        capture = OutputCapture(tail_size=16, patterns=('Error: unknown target:',),
+                                ignore_case_patterns=('error: unknown target:',))
+        capture.write("Error: unknown target: wrong\n" + "noise\n" * 100)
+        capture.close()
+        self.assertIn('Error: unknown target:', capture)
+        self.assertIn('ERROR: unknown target:', capture.lower())
+
+    def test_unregistered_text_without_spill(self):
+        capture = OutputCapture(tail_size=16)
+        capture.write("failed to stat rules at path\n" + "noise\n" * 100)
+        capture.close()
+        with self.assertRaises(KeyError):
+            'failed to stat rules at path' in capture
+        self.assertIn('noise', capture.tail)
+
+        short = OutputCapture(tail_size=1024)
+        short.write("failed to stat rules at path\n")
+        self.assertIn('failed to stat rules at path', short)
+
+    def test_unregistered_text_in_spill_file(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            capture = OutputCapture.for_output_dir(output_dir, 'run', tail_size=16)
+            capture.write("failed to stat rules at path\n" + "noise\n" * 100)
+            capture.close()
+            self.assertIn('failed to stat rules at path', capture)
+            self.assertIn('FAILED to stat', capture.lower())
+            self.assertNotIn('Error: unknown target:', capture)
+
+            replayed = OutputCapture.replay(find_spill_file(output_dir, 'run'), tail_size=16)
+            self.assertIn('failed to stat rules at path', replayed)
+
+
+if __name__ == '__main__':
+    unittest.main()
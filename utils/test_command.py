@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from command import KantraCommand, build_analysis_command, normalize_kwargs, run_command_stream_output
+from utils.phases import isolated_session
+
+FAKE_KANTRA = """#!/bin/sh
+echo "kantra $*"
+echo "Analysis complete!"
+exit ${FAKE_KANTRA_EXIT:-0}
+"""
+
+
+class TestKantraCommand(unittest.TestCase):
+    """
+        Testing normalization of kantra options and the digest of `KantraCommand`.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.kantra = os.path.join(self.dir.name, 'kantra')
+        with open(self.kantra, 'w') as f:
+            f.write(FAKE_KANTRA)
+        os.chmod(self.kantra, 0o755)
+        self.app = os.path.join(self.dir.name, 'app.war')
+        open(self.app, 'w').close()
+        self.env = mock.patch.dict(os.environ, {
+            'KANTRA_CLI_PATH': self.kantra, 'PROJECT_PATH': self.dir.name,
+            'REPORT_OUTPUT_PATH': os.path.join(self.dir.name, 'report'),
+        })
+        self.env.start()
+        os.environ.pop('RUN_LOCAL_MODE', None)
+        self.enterContext(isolated_session())
+
+    def tearDown(self):
+        self.env.stop()
+        self.dir.cleanup()
+
+    def _build(self, sources=('java',), targets=('quarkus', 'cloud-readiness'), **kwargs):
+        with mock.patch('builtins.print'):
+            return build_analysis_command(self.app, list(sources), list(targets), **kwargs)
+
+    def test_normalize_kwargs(self):
+        expected = {'run-local': 'true'}
+        self.assertEqual(normalize_kwargs({'--run-local=true': None}), expected)
+        self.assertEqual(normalize_kwargs({'run-local': 'true'}), expected)
+        self.assertEqual(normalize_kwargs({'--run-local=': 'true'}), expected)
+        self.assertEqual(normalize_kwargs({'--skip-static-report': None, 'rules': '/rules'}),
+                         {'skip-static-report': '', 'rules': '/rules'})
+
+    def test_options_are_normalized(self):
+        command = self._build(**{'--run-local=false': None})
+        self.assertEqual(command.subcommand, ('analyze',))
+        self.assertEqual(command.get('target'), ('cloud-readiness', 'quarkus'))
+        self.assertEqual(command.get('source'), 'java')
+        self.assertEqual(command.get('run-local'), 'false')
+        self.assertEqual(command.get('overwrite'), '')
+        self.assertEqual([name for name, _ in command.options], sorted(name for name, _ in command.options))
+        self.assertEqual(command.argv[:2], (self.kantra, 'analyze'))
+        self.assertIn('--run-local=false', command.argv)
+
+    def test_digest(self):
+        command = self._build(**{'run-local': 'true', 'rules': '/rules'})
+        same = self._build(targets=('cloud-readiness', 'quarkus'), **{'--rules=': '/rules', '--run-local=true': None})
+        self.assertEqual(command.digest, same.digest)
+        self.assertNotEqual(command.digest, self._build(**{'run-local': 'false', 'rules': '/rules'}).digest)
+
+        elsewhere = self._build(output_path=os.path.join(self.dir.name, 'other'), **{'run-local': 'true', 'rules': '/rules'})
+        self.assertNotEqual(command.digest, elsewhere.digest)
+        self.assertEqual(command.get_digest(exclude=('output',)), elsewhere.get_digest(exclude=('output',)))
+
+    def test_digest_ignores_binary_path(self):
+        command = KantraCommand(('/usr/bin/kantra', 'analyze', '--overwrite'), (('overwrite', ''),))
+        moved = KantraCommand(('/opt/kantra', 'analyze', '--overwrite'), (('overwrite', ''),))
+        self.assertEqual(command.digest, moved.digest)
+
+    def test_run_local_mode_default(self):
+        with mock.patch.dict(os.environ, {'RUN_LOCAL_MODE': 'false'}):
+            self.assertEqual(self._build().get('run-local'), 'false')
+            self.assertEqual(self._build(**{'--run-local=true': None}).get('run-local'), 'true')
+        self.assertIsNone(self._build().get('run-local'))
+
+    def test_missing_input(self):
+        with self.assertRaises(Exception):
+            build_analysis_command(os.path.join(self.dir.name, 'missing.war'), [], [])
+
+    @unittest.skipIf(sys.platform == 'win32', "the fake kantra is a shell script")
+    def test_run_argv_without_shell(self):
+        command = self._build(**{'rules': 'a path with spaces'})
+        with mock.patch('command._safe_stdout_write'):
+            output = run_command_stream_output(command)
+        self.assertIn('Analysis complete!', output)
+        self.assertIn('--rules=a path with spaces', output)
+
+        with mock.patch.dict(os.environ, {'FAKE_KANTRA_EXIT': '2'}), mock.patch('command._safe_stdout_write'):
+            with self.assertRaises(Exception) as context:
+                run_command_stream_output(command)
+        self.assertEqual(context.exception.returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import copy
+import unittest
+
+from digest import changed_children, digest_dependencies, digest_output, digest_ruleset, pack
+
+OUTPUT = [
+    {'name': 'eap7/weblogic', 'violations': {
+        'weblogic-eap7-0001': {'effort': 1, 'incidents': [
+            {'uri': 'src/main/java/Foo.java', 'lineNumber': 12, 'message': 'Replace it'},
+            {'uri': 'src/main/java/Bar.java', 'lineNumber': 20, 'message': 'Replace it'},
+        ]},
+        'weblogic-eap7-0002': {'effort': 3, 'incidents': []},
+    }},
+    {'name': 'cloud-readiness', 'tags': ['Java EE']},
+]
+
+
+class TestDigest(unittest.TestCase):
+    """
+        Testing Merkle digests follow == equality and lead only to the changed subtrees.
+    """
+
+    def test_equal_outputs(self):
+        got = copy.deepcopy(OUTPUT)
+        got[0]['violations'] = dict(reversed(list(got[0]['violations'].items())))   # dict order does not matter
+        self.assertEqual(digest_output(OUTPUT).digest, digest_output(got).digest)
+
+    def test_changes_change_root(self):
+        changes = [
+            lambda o: o[0]['violations']['weblogic-eap7-0001']['incidents'][1].update(lineNumber=21),
+            lambda o: o[0]['violations']['weblogic-eap7-0001']['incidents'].reverse(),
+            lambda o: o[0]['violations']['weblogic-eap7-0002'].pop('incidents'),
+            lambda o: o[0]['violations']['weblogic-eap7-0002'].update(incidents=None),
+            lambda o: o[0]['violations'].update({'weblogic-eap7-0003': o[0]['violations'].pop('weblogic-eap7-0002')}),
+            lambda o: o[1].update(tags=[]),
+            lambda o: o.reverse(),
+        ]
+        for change in changes:
+            got = copy.deepcopy(OUTPUT)
+            change(got)
+            self.assertNotEqual(got, OUTPUT)
+            self.assertNotEqual(digest_output(OUTPUT).digest, digest_output(got).digest)
+
+    def test_changed_children(self):
+        got = copy.deepcopy(OUTPUT)
+        got[0]['violations']['weblogic-eap7-0001']['incidents'][1]['message'] = 'Other'
+        expected_tree, got_tree = digest_output(OUTPUT), digest_output(got)
+        [(name, expected_ruleset, got_ruleset)] = changed_children(expected_tree, got_tree)
+        self.assertEqual(name, 'eap7/weblogic')
+        self.assertEqual(expected_ruleset.fields, got_ruleset.fields)
+        [(rule_id, expected_violation, got_violation)] = changed_children(expected_ruleset, got_ruleset)
+        self.assertEqual(rule_id, 'weblogic-eap7-0001')
+        [(key, expected_incident, got_incident)] = changed_children(expected_violation, got_violation)
+        self.assertEqual(key, ('src/main/java/Bar.java', 20))
+        self.assertEqual(got_incident.value['message'], 'Other')
+
+    def test_added_and_removed_children(self):
+        got = copy.deepcopy(OUTPUT)
+        got[1]['name'] = 'cloud-readiness-2'
+        changes = [(key, e is None, g is None) for key, e, g in changed_children(digest_output(OUTPUT), digest_output(got))]
+        self.assertEqual(changes, [('cloud-readiness', False, True), ('cloud-readiness-2', True, False)])
+
+    def test_packed_tree(self):
+        def walk(node):
+            return node.key, node.value, node.fields, node.digest, [walk(child) for child in node.children]
+        for ruleset in OUTPUT:
+            node = digest_ruleset(ruleset)
+            self.assertEqual(walk(digest_ruleset(ruleset, pack(node))), walk(node))
+
+    def test_dependencies(self):
+        dependencies = [{'provider': 'java', 'fileURI': 'pom.xml', 'dependencies': [{'name': 'a', 'version': '1'}]}]
+        got = copy.deepcopy(dependencies)
+        self.assertEqual(digest_dependencies(dependencies).digest, digest_dependencies(got).digest)
+        got[0]['dependencies'][0]['version'] = '2'
+        [(key, _, _)] = changed_children(digest_dependencies(dependencies), digest_dependencies(got))
+        self.assertEqual(key, 'java pom.xml')
+
+if __name__ == '__main__':
+    unittest.main()
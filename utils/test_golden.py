@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from golden import Golden, compare_with_golden, write_golden
+
+
+def ruleset(name, message):
+    return {'name': name, 'violations': {'rule-1': {'incidents': [{'uri': 'src/A.java', 'lineNumber': 1, 'message': message}]}}}
+
+
+class TestGolden(unittest.TestCase):
+    """
+        Testing golden snapshots are compared and updated by section digests.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'output.jsonl')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        rulesets = [ruleset('b', 'x'), ruleset('a', 'ä')]
+        self.assertEqual(write_golden(self.path, rulesets, 'output'), ['a', 'b'])
+        with Golden(self.path) as golden:
+            self.assertEqual(list(golden.digests), ['a', 'b'])
+            self.assertEqual(golden.load(), [ruleset('a', 'ä'), ruleset('b', 'x')])
+        self.assertEqual(compare_with_golden(self.path, rulesets, 'output'), ([], []))
+
+    def test_compare_returns_only_differing_sections(self):
+        write_golden(self.path, [ruleset('a', 'x'), ruleset('b', 'x'), ruleset('c', 'x')], 'output')
+        expected, got = compare_with_golden(self.path, [ruleset('a', 'x'), ruleset('b', 'y'), ruleset('d', 'x')], 'output')
+        self.assertEqual(expected, [ruleset('b', 'x'), ruleset('c', 'x')])
+        self.assertEqual(got, [ruleset('b', 'y'), ruleset('d', 'x')])
+
+    def test_update_rewrites_only_changed_sections(self):
+        write_golden(self.path, [ruleset('a', 'x'), ruleset('b', 'x')], 'output')
+        with open(self.path, 'rb') as f:
+            first_section = f.read().split(b'\n')[:2]
+        changed = write_golden(self.path, [ruleset('a', 'x'), ruleset('c', 'x')], 'output')
+        self.assertEqual(changed, ['c', 'b'])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read().split(b'\n')[:2], first_section)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_duplicate_keys(self):
+        rulesets = [ruleset('a', 'y'), ruleset('a', 'x'), ruleset('b', 'x')]
+        write_golden(self.path, rulesets, 'output')
+        with Golden(self.path) as golden:
+            self.assertEqual(sorted(golden.digests), ['a', 'a#2', 'b'])
+            self.assertEqual(len(golden.load()), 3)
+        self.assertEqual(compare_with_golden(self.path, list(reversed(rulesets)), 'output'), ([], []))
+        expected, got = compare_with_golden(self.path, [ruleset('a', 'x'), ruleset('b', 'x')], 'output')
+        self.assertIn(ruleset('a', 'y'), expected)
+        self.assertNotIn(ruleset('a', 'y'), got)
+
+    def test_empty_golden(self):
+        write_golden(self.path, [], 'output')
+        self.assertEqual(compare_with_golden(self.path, [ruleset('a', 'x')], 'output'), ([], [ruleset('a', 'x')]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import yaml
+
+from model import IncidentList, Violation, load_output
+from yaml_loader import load_yaml_file
+
+OUTPUT = [
+    {'name': 'eap7/weblogic', 'description': 'WebLogic', 'tags': ['Java EE'], 'unmatched': ['rule-x'], 'violations': {
+        'weblogic-eap7-0001': {'category': 'mandatory', 'effort': 1, 'labels': ['konveyor.io/target=eap7'], 'incidents': [
+            {'uri': 'file:///opt/input/source/src/Foo.java', 'lineNumber': 12, 'message': 'Replace it', 'codeSnip': '12 import a;'},
+            {'uri': 'file:///opt/input/source/src/Bar.java', 'lineNumber': 20, 'message': 'Replace it',
+             'variables': {'file': 'Bar.java'}, 'extra': 1},
+        ]},
+        'weblogic-eap7-0002': {'description': 'No incidents', 'incidents': []},
+    }, 'insights': {'insight-1': {'effort': 0, 'incidents': [{'uri': 'file:///pom.xml'}]}}},
+    {'name': 'cloud-readiness', 'errors': {'rule-y': 'failed'}, 'custom': 'kept'},
+]
+
+
+class TestModel(unittest.TestCase):
+    """
+        Testing the compact output model keeps the data and the dict interface of the parsed YAML.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'output.yaml')
+        with open(self.path, 'w') as f:
+            yaml.dump(OUTPUT, f)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        rulesets = load_output(self.path)
+        self.assertEqual([ruleset.to_dict() for ruleset in rulesets], OUTPUT)
+        self.assertEqual(rulesets, OUTPUT)
+
+    def test_dict_interface(self):
+        ruleset = load_output(self.path)[0]
+        violation = ruleset.get('violations')['weblogic-eap7-0001']
+        self.assertIsInstance(violation, Violation)
+        self.assertEqual(violation['effort'], 1)
+        self.assertIn('incidents', violation)
+        self.assertNotIn('links', violation)
+        self.assertEqual(ruleset.get('skipped', []), [])
+        self.assertEqual(len(ruleset['violations']['weblogic-eap7-0002']['incidents']), 0)
+        incident = violation.incidents[1]
+        self.assertEqual((incident['uri'], incident.line_number, incident.get('extra')),
+                         ('file:///opt/input/source/src/Bar.java', 20, 1))
+        with self.assertRaises(KeyError):
+            ruleset['skipped']
+
+    def test_compact_storage(self):
+        incidents = IncidentList([{'uri': 'file:///a/%d' % (i % 3), 'lineNumber': i, 'message': 'same %s' % 'x'}
+                                  for i in range(100)])
+        self.assertEqual(incidents.line_numbers.typecode, 'q')
+        self.assertIsNone(incidents.variables)
+        self.assertIs(incidents.uris[0], incidents.uris[3])
+        self.assertIs(incidents.messages[0], incidents.messages[1])
+        self.assertEqual(IncidentList([{'lineNumber': None}]).line_numbers, [None])
+
+    def test_smaller_than_parsed_yaml(self):
+        output = [{'name': 'r%d' % r, 'violations': {'rule-%d' % v: {'effort': 1, 'incidents': [
+            {'uri': 'file:///src/F%d.java' % (i % 20), 'lineNumber': i, 'message': 'Replace the import of rule %d' % v,
+             'codeSnip': '%d  import a;' % i} for i in range(100)]} for v in range(5)}} for r in range(2)]
+        with open(self.path, 'w') as f:
+            yaml.dump(output, f)
+
+        def measure(load):
+            tracemalloc.start()
+            data = load(self.path)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return data, size
+        parsed, parsed_size = measure(load_yaml_file)
+        model, model_size = measure(load_output)
+        self.assertEqual(model, parsed)
+        self.assertLess(model_size, parsed_size / 2)
+
+if __name__ == '__main__':
+    unittest.main()
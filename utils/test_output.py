@@ -1,6 +1,6 @@
 import unittest
 
-from output import trim_incident_uri
+from output import IncidentUriNormalizer, get_code_snip_line, trim_incident_uri
 
 class TestTrimMethods(unittest.TestCase):
     """
@@ -53,5 +53,44 @@ class TestTrimMethods(unittest.TestCase):
             print("Trimming `%s`" % sample[0])
             self.assertEqual(trim_incident_uri(sample[0], sample[1]), sample[2])
 
+    def test_normalizer_matches_trim(self):
+        for uri, root_path, _ in self.samples:
+            normalizer = IncidentUriNormalizer(root_path)
+            expected = trim_incident_uri(repr(uri), repr(root_path))
+            self.assertEqual(normalizer(uri), expected)
+            self.assertEqual(normalizer(uri), expected)     # memoized
+            self.assertEqual(len(normalizer.cache), 1)
+
+
+class TestCodeSnipLine(unittest.TestCase):
+    """
+        Testing `get_code_snip_line` picks the same line as splitting the whole snippet.
+    """
+
+    @staticmethod
+    def split_lines_reference(code_snip, line_number):
+        for line in code_snip.splitlines():
+            line = line.strip()
+            if line.startswith(str(line_number)):
+                return str(line_number) + ' ' + line[len(str(line_number)):].lstrip()
+        return None
+
+    def test_same_as_splitlines(self):
+        snippets = [
+            "  9  import a;\n 10  import b;\n 11  class C {  \n 12  }\n",
+            " 98 x\n 99 y\n100   z",
+            "1 first\n2 second",
+            "  7 a 12\n  8 b\n",
+            "  7 a\r\n  8 b\r\n  9 c\r\n",
+            "\t 5\tfoo\u2028 6 bar",
+            "",
+            "   \n 3",
+        ]
+        for code_snip in snippets:
+            for line_number in (1, 3, 5, 6, 8, 9, 10, 12, 99, 100, 42):
+                self.assertEqual(get_code_snip_line(code_snip, line_number),
+                                 self.split_lines_reference(code_snip, line_number),
+                                 "%r line %d" % (code_snip, line_number))
+
 if __name__ == '__main__':
     unittest.main()
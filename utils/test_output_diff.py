@@ -0,0 +1,85 @@
+import copy
+import unittest
+
+from digest import digest_dependencies, digest_output
+from output_diff import diff_dependencies, diff_output
+
+OUTPUT = [
+    {'name': 'eap7/weblogic', 'tags': ['Java EE'], 'violations': {
+        'weblogic-eap7-0001': {'category': 'mandatory', 'effort': 1, 'incidents': [
+            {'uri': 'src/main/java/Foo.java', 'lineNumber': 12, 'message': 'Replace it', 'codeSnip': '12 import a;'},
+            {'uri': 'src/main/java/Bar.java', 'lineNumber': 20, 'message': 'Replace it', 'codeSnip': '20 import b;'},
+        ]},
+    }},
+    {'name': 'cloud-readiness', 'violations': {
+        'local-storage-00001': {'category': 'optional', 'effort': 3, 'incidents': [
+            {'uri': 'src/main/resources/app.properties', 'lineNumber': 1, 'message': 'Avoid local storage'},
+        ]},
+    }},
+]
+
+
+class TestOutputDiff(unittest.TestCase):
+    """
+        Testing the structural diff reports only added, removed and changed entries.
+    """
+
+    def test_equal(self):
+        self.assertEqual(diff_output(OUTPUT, copy.deepcopy(OUTPUT)), '')
+
+    def test_incident_changes(self):
+        got = copy.deepcopy(OUTPUT)
+        incidents = got[0]['violations']['weblogic-eap7-0001']['incidents']
+        incidents[0]['lineNumber'] = 13
+        incidents[1]['message'] = 'Replace it now'
+        got[1]['violations']['local-storage-00001']['effort'] = 5
+        self.assertEqual(diff_output(OUTPUT, got).splitlines(), [
+            "ruleset eap7/weblogic, rule weblogic-eap7-0001:",
+            "  - src/main/java/Foo.java:12",
+            "  ~ src/main/java/Bar.java:20 message: 'Replace it' -> 'Replace it now'",
+            "  + src/main/java/Foo.java:13",
+            "ruleset cloud-readiness, rule local-storage-00001:",
+            "  ~ effort: 3 -> 5",
+        ])
+
+    def test_rulesets_and_limit(self):
+        got = copy.deepcopy(OUTPUT[:1]) + [{'name': 'new', 'violations': {'a': {'incidents': []}}}]
+        self.assertEqual(diff_output(OUTPUT, got).splitlines(), [
+            "ruleset cloud-readiness:",
+            "  - ruleset (1 violations)",
+            "ruleset new:",
+            "  + ruleset (1 violations)",
+        ])
+        self.assertIn('... and 1 more differences', diff_output(OUTPUT, got, limit=2))
+
+    def test_order_only(self):
+        self.assertEqual(diff_output(OUTPUT, list(reversed(OUTPUT))),
+                         'Outputs differ only in the order of rulesets or incidents')
+
+    def test_equal_values_with_both_digests(self):
+        # e.g. an expected YAML output, both trees are passed so the one-off == is skipped
+        got = copy.deepcopy(OUTPUT)
+        got[0]['violations']['weblogic-eap7-0001']['effort'] = 1.0
+        self.assertEqual(diff_output(OUTPUT, got, expected_digest=digest_output(OUTPUT), got_digest=digest_output(got)), '')
+        expected = [{'provider': 'java', 'fileURI': 'pom.xml', 'dependencies': [{'name': 'a', 'version': '1', 'count': 1}]}]
+        got = copy.deepcopy(expected)
+        got[0]['dependencies'][0]['count'] = 1.0
+        self.assertEqual(diff_dependencies(expected, got, expected_digest=digest_dependencies(expected),
+                                           got_digest=digest_dependencies(got)), '')
+
+    def test_dependencies(self):
+        expected = [{'provider': 'java', 'fileURI': 'pom.xml', 'dependencies': [
+            {'name': 'junit.junit', 'version': '4.12', 'type': 'test'},
+        ]}]
+        got = copy.deepcopy(expected)
+        got[0]['dependencies'][0]['type'] = 'compile'
+        got[0]['dependencies'].append({'name': 'org.slf4j.slf4j-api', 'version': '1.7.25'})
+        self.assertEqual(diff_dependencies(expected, got).splitlines(), [
+            "dependencies of java pom.xml:",
+            "  ~ junit.junit 4.12 type: 'test' -> 'compile'",
+            "  + org.slf4j.slf4j-api 1.7.25",
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
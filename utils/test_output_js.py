@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+from output_js import get_apps_index, get_index_path, iter_apps, load_app, load_apps, load_first_app
+
+APPS = [{'id': '0001', 'name': 'app-ä', 'rulesets': [{'name': 'r', 'violations': {'a': {'description': 'x ] }, ['}}}]},
+        {'id': '0002', 'name': 'second', 'rulesets': []}]
+
+
+class TestOutputJs(unittest.TestCase):
+    """
+        Testing apps of static-report/output.js are decoded like the whole array, one at a time.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'output.js')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, apps_json):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('window["apps"] = ' + apps_json)
+
+    def test_same_as_json_loads(self):
+        for apps_json in (json.dumps(APPS), json.dumps(APPS, indent=2, ensure_ascii=False) + '\n'):
+            self.write(apps_json)
+            self.assertEqual(load_apps(self.path), APPS)
+            self.assertEqual(load_first_app(self.path), APPS[0])
+
+    def test_first_app_does_not_decode_the_rest(self):
+        self.write(json.dumps(APPS[:1])[:-1] + ', {"broken": ]')
+        self.assertEqual(load_first_app(self.path), APPS[0])
+        with self.assertRaises(ValueError):
+            load_apps(self.path)
+
+    def test_index(self):
+        apps = APPS + [{'id': '0003', 'name': 'big', 'data': 'ü' * 100000}]
+        self.write(json.dumps(apps, indent=1, ensure_ascii=False))
+        self.assertFalse(os.path.exists(get_index_path(self.path)))
+        self.assertEqual(load_apps(self.path), apps)
+        self.assertTrue(os.path.exists(get_index_path(self.path)))
+        index = get_apps_index(self.path)
+        self.assertEqual([(entry['id'], entry['name']) for entry in index], [('0001', 'app-ä'), ('0002', 'second'), ('0003', 'big')])
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for entry, app in zip(index, apps):
+            self.assertEqual(json.loads(data[entry['offset']:entry['offset'] + entry['length']]), app)
+        self.assertEqual(load_app(self.path, 'big'), apps[2])
+        self.assertEqual(load_app(self.path, '0002'), apps[1])
+        self.assertEqual(list(iter_apps(self.path)), apps)     # from the index
+        with self.assertRaises(KeyError):
+            load_app(self.path, 'missing')
+
+    def test_outdated_index(self):
+        self.write(json.dumps(APPS))
+        self.assertEqual(len(get_apps_index(self.path)), 2)
+        self.write(json.dumps(APPS[1:]))
+        self.assertEqual(load_apps(self.path), APPS[1:])
+        self.assertEqual([entry['name'] for entry in get_apps_index(self.path)], ['second'])
+
+    def test_empty(self):
+        self.write(' [ ] ')
+        self.assertEqual(list(iter_apps(self.path)), [])
+        with self.assertRaises(IndexError):
+            load_first_app(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
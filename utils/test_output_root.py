@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import output_root
+from output_root import create_output_root, get_analysis_output_dir, release_output_root, snapshot_dir
+from recycler import drain
+
+
+class TestOutputRoot(unittest.TestCase):
+    """
+        Testing isolated output roots on tmpfs with a fallback to the disk, and hardlink snapshots.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.tmpfs = os.path.join(self.dir.name, 'shm')
+        self.report = os.path.join(self.dir.name, 'report')
+        os.makedirs(self.tmpfs)
+        self.env = mock.patch.dict(os.environ, {'KANTRA_OUTPUT_TMPFS': self.tmpfs, 'REPORT_OUTPUT_PATH': self.report})
+        self.env.start()
+        output_root._areas.clear()
+        output_root._area_sizes.clear()
+
+    def tearDown(self):
+        self.env.stop()
+        drain()
+        self.dir.cleanup()
+
+    def test_roots_on_tmpfs(self):
+        first, second = create_output_root('test a[1]'), create_output_root('test a[1]')
+        self.assertNotEqual(first, second)
+        area = os.path.join(self.tmpfs, 'kantra-outputs-%d' % os.getpid())
+        self.assertEqual(os.path.dirname(first), area)
+        self.assertTrue(os.path.basename(first).startswith('test_a_1-'))
+        self.assertEqual(os.listdir(first), [])
+        self.assertEqual(os.path.dirname(get_analysis_output_dir('app')), area)
+        release_output_root(first)
+        drain()
+        self.assertFalse(os.path.exists(first))
+
+    def test_fallback_to_disk(self):
+        with mock.patch.dict(os.environ, {'KANTRA_OUTPUT_TMPFS_MAX_SIZE': '0'}):
+            root = create_output_root('test')
+            self.assertEqual(os.path.dirname(root), self.report + '-isolated')
+            self.assertEqual(get_analysis_output_dir('app'), os.path.join(self.report + '-planned', 'app'))
+        with mock.patch.dict(os.environ, {'KANTRA_OUTPUT_TMPFS': ''}):
+            self.assertEqual(os.path.dirname(create_output_root('test')), self.report + '-isolated')
+
+    def test_area_size_is_checked_periodically(self):
+        with mock.patch('output_root._dir_size', return_value=0) as dir_size:
+            for _ in range(10):
+                get_analysis_output_dir('app')
+            self.assertEqual(dir_size.call_count, 1)
+            with mock.patch('time.monotonic', return_value=time.monotonic() + output_root.SIZE_CHECK_INTERVAL):
+                create_output_root('test')
+            self.assertEqual(dir_size.call_count, 2)
+
+    def test_leftover_areas_are_removed(self):
+        leftover = os.path.join(self.tmpfs, 'kantra-outputs-999999999')
+        os.makedirs(os.path.join(leftover, 'old'))
+        create_output_root('test')
+        self.assertFalse(os.path.exists(leftover))
+
+    def test_snapshot(self):
+        source = os.path.join(self.dir.name, 'output')
+        os.makedirs(os.path.join(source, 'static-report'))
+        for path in ('output.yaml', os.path.join('static-report', 'output.js')):
+            with open(os.path.join(source, path), 'w') as f:
+                f.write(path)
+        os.symlink('output.yaml', os.path.join(source, 'link.yaml'))
+        target = create_output_root('snapshot')
+        self.assertEqual(snapshot_dir(source, target), {'linked': 2, 'cloned': 0, 'copied': 0})
+        self.assertTrue(os.path.samefile(os.path.join(source, 'static-report', 'output.js'),
+                                         os.path.join(target, 'static-report', 'output.js')))
+        self.assertEqual(os.readlink(os.path.join(target, 'link.yaml')), 'output.yaml')
+
+        with mock.patch('os.link', side_effect=OSError('cross-device link')):
+            counts = snapshot_dir(source, os.path.join(self.dir.name, 'copy'))
+        self.assertEqual(counts['linked'], 0)
+        self.assertEqual(counts['cloned'] + counts['copied'], 2)
+        with open(os.path.join(self.dir.name, 'copy', 'output.yaml')) as f:
+            self.assertEqual(f.read(), 'output.yaml')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import copy
+import os
+import threading
+import unittest
+from unittest import mock
+
+from digest import digest_dependencies, digest_output
+from output import normalize_dependencies, normalize_output
+import parallel_normalize
+from parallel_normalize import normalize_dependencies_with_digest, normalize_output_with_digest, split_chunks
+
+ROOT = '/home/runner/work/app'
+
+
+def ruleset(name, incidents):
+    return {'name': name, 'unmatched': ['rule-x'], 'violations': {
+        'rule-%d' % i: {'incidents': [
+            {'uri': 'file://%s/src/F%d.java' % (ROOT, j), 'lineNumber': j + 1, 'codeSnip': ' %d  line\n %d  next' % (j + 1, j + 2),
+             'message': 'Use ${name}', 'variables': {'a': 1}} for j in range(incidents)]} for i in range(3)}}
+
+
+OUTPUT = [ruleset('b', 5), {'name': 'empty', 'skipped': ['rule-y']}, ruleset('a', 40), ruleset('c', 1), {'name': 'tags', 'tags': ['Java']}]
+DEPENDENCIES = [{'provider': 'java', 'fileURI': 'file://%s/pom%d.xml' % (ROOT, i),
+                 'dependencies': [{'name': 'd%d' % j, 'version': '1', 'extras': {}, 'type': 'compile\r'} for j in range(i + 1)]}
+                for i in range(4)]
+
+
+class TestParallelNormalize(unittest.TestCase):
+    """
+        Testing normalization in the process pool gives the same output and digests as the serial one.
+    """
+
+    @mock.patch.dict(os.environ, {'KANTRA_NORMALIZE_MIN_INCIDENTS': '0'})
+    def test_output_same_as_serial(self):
+        expected = normalize_output(copy.deepcopy(OUTPUT), ROOT)
+        got, digest = normalize_output_with_digest(copy.deepcopy(OUTPUT), ROOT, workers=2)
+        self.assertEqual(got, expected)
+        self.assertEqual([r['name'] for r in got], ['b', 'a', 'c', 'tags'])
+        self.assertEqual(digest.digest, digest_output(expected).digest)
+
+    @mock.patch.dict(os.environ, {'KANTRA_NORMALIZE_MIN_INCIDENTS': '0'})
+    def test_dependencies_same_as_serial(self):
+        expected = normalize_dependencies(copy.deepcopy(DEPENDENCIES), ROOT)
+        got, digest = normalize_dependencies_with_digest(copy.deepcopy(DEPENDENCIES), ROOT, workers=3)
+        self.assertEqual(got, expected)
+        self.assertEqual(digest.digest, digest_dependencies(expected).digest)
+
+    @mock.patch.dict(os.environ, {'KANTRA_NORMALIZE_MIN_INCIDENTS': '0'})
+    def test_no_fork_with_threads(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            self.assertNotEqual(parallel_normalize._get_mp_context().get_start_method(), 'fork')
+            got, digest = normalize_output_with_digest(copy.deepcopy(OUTPUT), ROOT, workers=2)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(got, normalize_output(copy.deepcopy(OUTPUT), ROOT))
+
+    @mock.patch.dict(os.environ, {'KANTRA_NORMALIZE_MIN_INCIDENTS': '1000000'})
+    def test_small_output_serial(self):
+        got, digest = normalize_output_with_digest(copy.deepcopy(OUTPUT), ROOT, workers=2)
+        self.assertEqual(got, normalize_output(copy.deepcopy(OUTPUT), ROOT))
+
+    def test_split_chunks(self):
+        self.assertEqual(split_chunks([1, 100, 3, 50, 50, 0], 2), [[1, 2], [0, 3, 4, 5]])
+        self.assertEqual(split_chunks([5], 4), [[0]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+from unittest import mock
+
+from phases import STARTUP_PHASE, PhaseTracker, format_session_summary, isolated_session, record
+
+
+class TestPhaseTracker(unittest.TestCase):
+    """
+        Testing `PhaseTracker` timestamps phase markers from a chunked output stream.
+    """
+
+    def test_phase_durations(self):
+        tracker = PhaseTracker({'rule loading': r'Loaded \d+ rules', 'complete': r'Analysis complete!'})
+        tracker.feed("starting\nLoa")
+        tracker.feed("ded 120 rules\n")
+        time.sleep(0.05)
+        tracker.feed("\x1b[32mAnalysis complete!\x1b[0m\n")
+        durations = tracker.finish()
+        self.assertEqual([name for name, _ in durations], [STARTUP_PHASE, 'rule loading', 'complete'])
+        self.assertGreaterEqual(dict(durations)['rule loading'], 0.04)
+
+    def test_no_markers(self):
+        tracker = PhaseTracker({'complete': r'Analysis complete!'})
+        tracker.feed("CONTAINER ID  IMAGE\n")
+        self.assertEqual(tracker.finish(), [])
+
+    def test_isolated_session(self):
+        with mock.patch('builtins.print'):
+            with isolated_session():
+                record('outer', [(STARTUP_PHASE, 1.0)])
+                with isolated_session():
+                    record('fake', [(STARTUP_PHASE, 2.0), ('complete', 0.5)])
+                    self.assertIn('1 analyses', format_session_summary())
+                summary = format_session_summary()
+                self.assertIn('1 analyses', summary)
+                self.assertNotIn('complete', summary)
+                record('ignored', [])
+                self.assertIn('1 analyses', format_session_summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
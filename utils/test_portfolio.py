@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from portfolio import Portfolio, is_output_file
+
+
+def make_app(app_id, name, rule_ids, effort=3):
+    violations = {rule_id: {'category': 'mandatory', 'effort': effort,
+                            'labels': ['konveyor.io/target=quarkus', 'konveyor.io/source=java-ee'],
+                            'incidents': [{'uri': 'file:///%s/A.java' % name, 'lineNumber': line, 'message': 'm'}
+                                          for line in (1, 2)]}
+                  for rule_id in rule_ids}
+    return {'id': app_id, 'name': name,
+            'rulesets': [{'name': 'rs', 'description': 'd', 'violations': violations, 'unmatched': ['x'],
+                          'insights': {'i1': {'effort': 0, 'incidents': [{'uri': 'u'}]}}},
+                         {'name': 'empty'}],
+            'depItems': [{'provider': 'java', 'fileURI': 'pom.xml',
+                          'dependencies': [{'name': 'lib', 'version': '1.0'}, {'name': 'other', 'version': '2'}]}]}
+
+
+class TestPortfolio(unittest.TestCase):
+    """
+        Testing bulk analysis outputs are indexed in SQLite incrementally and answer portfolio questions.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.report = os.path.join(self.dir.name, 'report')
+        os.makedirs(os.path.join(self.report, 'static-report'))
+        self.portfolio = Portfolio(os.path.join(self.dir.name, 'portfolio.sqlite'))
+
+    def tearDown(self):
+        self.portfolio.close()
+        self.dir.cleanup()
+
+    def write_apps(self, apps):
+        with open(os.path.join(self.report, 'static-report', 'output.js'), 'w') as f:
+            f.write('window["apps"] = ' + json.dumps(apps, indent=1))
+
+    def test_index_output_js(self):
+        self.write_apps([make_app('1', 'first', ['r1', 'r2']), make_app('2', 'second', ['r2'], effort=5)])
+        self.assertEqual(self.portfolio.index_report(self.report), {'indexed': 2, 'unchanged': 0, 'removed': 0})
+        self.assertEqual(self.portfolio.query_value('SELECT COUNT(*) FROM apps'), 2)
+        self.assertEqual(self.portfolio.apps_with_rule('r2'), ['first', 'second'])
+        self.assertEqual(self.portfolio.apps_with_rule('r1'), ['first'])
+        self.assertEqual(self.portfolio.story_points_by_target(), {'quarkus': 3 * 4 + 5 * 2})
+        self.assertEqual(self.portfolio.query_value('SELECT COUNT(*) FROM incidents'), 8)
+        self.assertEqual(self.portfolio.query("SELECT COUNT(*) FROM violations WHERE kind = 'insight'"), [(2,)])
+        self.assertEqual(self.portfolio.query_value('SELECT SUM(unmatched) FROM rulesets'), 2)
+        self.assertEqual(self.portfolio.query('SELECT DISTINCT name, version FROM dependencies ORDER BY name'),
+                         [('lib', '1.0'), ('other', '2')])
+
+    def test_incremental(self):
+        self.write_apps([make_app('1', 'first', ['r1']), make_app('2', 'second', ['r2']), make_app('3', 'third', [])])
+        self.portfolio.index_report(self.report)
+        ids = dict(self.portfolio.query('SELECT name, id FROM apps'))
+        self.assertEqual(self.portfolio.index_report(self.report), {'indexed': 0, 'unchanged': 3, 'removed': 0})
+
+        self.write_apps([make_app('1', 'first', ['r1']), make_app('2', 'second', ['r3'])])
+        self.assertEqual(self.portfolio.index_report(self.report), {'indexed': 1, 'unchanged': 1, 'removed': 1})
+        self.assertEqual(dict(self.portfolio.query('SELECT name, id FROM apps'))['first'], ids['first'])
+        self.assertEqual(self.portfolio.apps_with_rule('r2'), [])
+        self.assertEqual(self.portfolio.apps_with_rule('r3'), ['second'])
+        # rows of the replaced and removed apps are gone with them
+        self.assertEqual(self.portfolio.query_value('SELECT COUNT(*) FROM incidents'), 6)
+        self.assertEqual(self.portfolio.query_value('SELECT COUNT(*) FROM dependencies'), 4)
+
+    def test_index_output_yaml(self):
+        app = make_app('1', 'app', ['r1'])
+        with open(os.path.join(self.report, 'output.yaml'), 'w') as f:
+            yaml.dump(app['rulesets'], f)
+        with open(os.path.join(self.report, 'dependencies.yaml'), 'w') as f:
+            yaml.dump(app['depItems'], f)
+        with open(os.path.join(self.report, 'output.yaml.summary.json'), 'w') as f:
+            f.write('{}')
+        for derived in ('output.yaml.normalized.yaml', 'output.yaml.app2.normalized.yaml'):
+            with open(os.path.join(self.report, derived), 'w') as f:
+                yaml.dump(app['rulesets'], f)
+        self.assertEqual(self.portfolio.index_report(self.report), {'indexed': 1, 'unchanged': 0, 'removed': 0})
+        self.assertEqual(self.portfolio.apps_with_rule('r1'), ['report'])
+        self.assertEqual(self.portfolio.query_value('SELECT COUNT(*) FROM dependencies'), 2)
+        self.assertEqual(self.portfolio.index_report(self.report)['unchanged'], 1)
+
+    def test_output_file_names(self):
+        for filename in ('output.yaml', 'output.yaml.app', 'output.yaml.my-app.war'):
+            self.assertTrue(is_output_file(filename), filename)
+        for filename in ('output.yaml.normalized.yaml', 'output.yaml.app.normalized.yaml', 'output.yaml.summary.json',
+                         'output.yaml.summary.json.tmp', 'dependencies.yaml', 'output.yml'):
+            self.assertFalse(is_output_file(filename), filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from profiler import ProcessTreeProfiler, is_supported
+
+
+@unittest.skipUnless(is_supported(), "requires /proc")
+class TestProcessTreeProfiler(unittest.TestCase):
+    """
+        Testing `ProcessTreeProfiler` samples a process together with its children.
+    """
+
+    def test_sample_process_tree(self):
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(5)'])
+        try:
+            profiler = ProcessTreeProfiler(os.getpid(), interval=0.05)
+            profiler.sample()
+        finally:
+            child.kill()
+            child.wait()
+        profile = profiler.get_profile()
+        self.assertGreaterEqual(profile['summary']['peak_processes'], 2)
+        self.assertGreater(profile['summary']['peak_rss'], 0)
+        self.assertEqual(len(profile['samples']['t']), 1)
+
+    def test_no_samples_for_missing_process(self):
+        profiler = ProcessTreeProfiler(2 ** 22 + 1)
+        profiler.sample()
+        self.assertIsNone(profiler.stop())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import recycler
+from recycler import drain, get_trash_prefix, recycle_dir
+
+
+class TestRecycler(unittest.TestCase):
+    """
+        Testing output directories are replaced by empty ones right away and deleted in the background.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'report')
+        os.makedirs(os.path.join(self.path, 'static-report'))
+        for i in range(50):
+            with open(os.path.join(self.path, 'static-report', '%d.js' % i), 'w') as f:
+                f.write('x')
+        os.chmod(self.path, 0o777)
+
+    def tearDown(self):
+        drain()
+        self.dir.cleanup()
+
+    def test_recycle(self):
+        trash = recycle_dir(self.path)
+        self.assertTrue(trash.startswith(get_trash_prefix(self.path)))
+        self.assertEqual(os.listdir(self.path), [])
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o777)
+        self.assertTrue(drain(timeout=10))
+        self.assertEqual(os.listdir(self.dir.name), ['report'])
+
+    def test_missing_dir_is_created(self):
+        path = os.path.join(self.dir.name, 'new')
+        self.assertIsNone(recycle_dir(path))
+        self.assertTrue(os.path.isdir(path))
+
+    def test_leftovers_are_deleted(self):
+        leftover = get_trash_prefix(self.path) + '1-0'
+        os.makedirs(os.path.join(leftover, 'sub'))
+        recycle_dir(self.path)
+        drain(timeout=10)
+        self.assertEqual(os.listdir(self.dir.name), ['report'])
+
+    def test_synchronous(self):
+        with mock.patch.dict(os.environ, {'KANTRA_RECYCLE_MAX_PENDING': '0'}):
+            trash = recycle_dir(self.path)
+        self.assertFalse(os.path.exists(trash))
+        self.assertEqual(recycler.get_pending(), [])
+
+    def test_rename_failure_clears_in_place(self):
+        with mock.patch('os.rename', side_effect=OSError('busy')):
+            self.assertIsNone(recycle_dir(self.path))
+        self.assertEqual(os.listdir(self.path), [])
+
+if __name__ == '__main__':
+    unittest.main()
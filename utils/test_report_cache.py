@@ -0,0 +1,82 @@
+import copy
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import yaml
+
+from report_cache import FrozenDict, FrozenList, ReportCache, freeze, load_frozen_yaml, thaw
+
+OUTPUT = [{'name': 'r1', 'violations': {'v1': {'incidents': [{'uri': 'a', 'lineNumber': 1}]}}, 'tags': ['t']}]
+
+
+class TestReportCache(unittest.TestCase):
+    """
+        Testing parsed reports are cached as read-only data and invalidated when the file changes.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'output.yaml')
+        self.write(OUTPUT)
+        self.loads = 0
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'w') as f:
+            yaml.dump(data, f)
+
+    def loader(self, path):
+        self.loads += 1
+        return load_frozen_yaml(path)
+
+    def test_read_only(self):
+        data = load_frozen_yaml(self.path)
+        self.assertEqual(data, OUTPUT)
+        self.assertIsInstance(data, FrozenList)
+        self.assertIsInstance(data[0]['violations']['v1'], FrozenDict)
+        for modify in (lambda: data.append(1), lambda: data[0].pop('name'), lambda: data[0].update(a=1),
+                       lambda: data[0]['tags'].sort(), lambda: data[0]['violations'].__setitem__('v2', {})):
+            with self.assertRaises(TypeError):
+                modify()
+        self.assertEqual(json.loads(json.dumps(data)), OUTPUT)
+        self.assertEqual(pickle.loads(pickle.dumps(data)), OUTPUT)
+
+    def test_thaw(self):
+        data = thaw(freeze(OUTPUT))
+        self.assertEqual(data, OUTPUT)
+        data[0]['violations'].clear()
+        self.assertEqual(type(data[0]), dict)
+        copied = copy.deepcopy(freeze(OUTPUT))
+        copied[0]['tags'].append('u')
+        self.assertEqual(copied[0]['tags'], ['t', 'u'])
+
+    def test_cached_until_file_changes(self):
+        cache = ReportCache(max_size=1024 * 1024)
+        first = cache.get(self.path, 'yaml', self.loader)
+        self.assertIs(cache.get(self.path, 'yaml', self.loader), first)
+        self.assertEqual(self.loads, 1)
+        self.write(OUTPUT * 2)
+        self.assertEqual(len(cache.get(self.path, 'yaml', self.loader)), 2)
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(len(cache._entries), 1)
+        cache.invalidate(self.dir.name)
+        cache.get(self.path, 'yaml', self.loader)
+        self.assertEqual(self.loads, 3)
+
+    def test_lru_eviction(self):
+        size = os.path.getsize(self.path) * 4
+        cache = ReportCache(max_size=size * 2)
+        for kind in ('a', 'b', 'a', 'c'):
+            cache.get(self.path, kind, self.loader)
+        self.assertEqual([key[3] for key in cache._entries], ['a', 'c'])
+        self.assertEqual(cache.size, size * 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        ReportCache(max_size=0).get(self.path, 'yaml', self.loader)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+import report_summary
+from report_summary import compute_summary, get_summary, get_summary_path
+
+OUTPUT = [
+    {'name': 'eap7', 'skipped': ['rule-s'], 'unmatched': ['rule-u1', 'rule-u2'], 'violations': {
+        'rule-1': {'effort': 3, 'incidents': [{'uri': 'file:///src/A.java', 'lineNumber': 1},
+                                              {'uri': 'file:///src/B.java', 'lineNumber': 2}]},
+        'rule-2': {'effort': 1, 'incidents': [{'uri': 'file:///src/A.java', 'lineNumber': 5}]},
+        'rule-3': {'incidents': [{'uri': 'file:///pom.xml', 'lineNumber': 1}]},
+        'rule-4': {'effort': 5},
+    }},
+    {'name': 'discovery', 'insights': {'insight-1': {'effort': 0, 'incidents': [{'uri': 'file:///pom.xml'}] * 4}}},
+]
+
+
+class TestReportSummary(unittest.TestCase):
+    """
+        Testing the single-pass output summary and its cache next to output.yaml.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'output.yaml')
+        with open(self.path, 'w') as f:
+            yaml.dump(OUTPUT, f)
+        report_summary._memo.clear()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_summary(self):
+        summary = get_summary(self.path)
+        self.assertEqual(summary['story_points'], 7)
+        self.assertEqual(summary['violations_with_incidents'], 3)
+        self.assertEqual(summary['incidents'], 4)
+        self.assertEqual(summary['insight_occurrences'], 4)
+        self.assertEqual(summary['incidents_by_ruleset'], {'eap7': 4})
+        self.assertEqual(summary['incidents_by_rule'], {'eap7/rule-1': 2, 'eap7/rule-2': 1, 'eap7/rule-3': 1})
+        self.assertEqual(summary['incidents_by_file'], {'file:///src/A.java': 2, 'file:///src/B.java': 1, 'file:///pom.xml': 1})
+        self.assertEqual((summary['skipped'], summary['unmatched']), (1, 2))
+        self.assertEqual(compute_summary(OUTPUT), summary)
+
+    def test_cached_next_to_output(self):
+        summary = get_summary(self.path)
+        self.assertTrue(os.path.exists(get_summary_path(self.path)))
+        report_summary._memo.clear()
+        report_summary.compute_summary = None     # must not be needed to read the cached summary
+        try:
+            self.assertEqual(get_summary(self.path), summary)
+        finally:
+            report_summary.compute_summary = compute_summary
+
+    def test_cache_invalidated_by_new_output(self):
+        self.assertEqual(get_summary(self.path)['story_points'], 7)
+        with open(self.path, 'w') as f:
+            yaml.dump(OUTPUT[1:], f)
+        self.assertEqual(get_summary(self.path)['story_points'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.phases import isolated_session
+from scheduler import AnalysisSpec, run_analyses, run_commands
+
+# Fails if another run writes to the same output dir at the same time, logs every invocation
+FAKE_KANTRA = """#!/bin/sh
+out=
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--output" ]; then out="$2"; fi
+    shift
+done
+echo "$out" >> "$FAKE_KANTRA_LOG"
+if [ -e "$out/running" ]; then echo "concurrent run"; exit 9; fi
+touch "$out/running"
+sleep 0.2
+echo "rulesets: []" > "$out/output.yaml"
+rm "$out/running"
+echo "Error: unknown target: none"
+echo "Analysis complete!"
+"""
+
+
+@unittest.skipIf(sys.platform == 'win32', "the fake kantra is a shell script")
+class TestScheduler(unittest.TestCase):
+    """
+        Testing `run_analyses` output dirs, grouping of runs sharing a dir, deduplication and the result cache.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.kantra = os.path.join(self.dir.name, 'kantra')
+        with open(self.kantra, 'w') as f:
+            f.write(FAKE_KANTRA)
+        os.chmod(self.kantra, 0o755)
+        self.app = os.path.join(self.dir.name, 'app.war')
+        with open(self.app, 'w') as f:
+            f.write('app')
+        self.report = os.path.join(self.dir.name, 'report')
+        self.log = os.path.join(self.dir.name, 'invocations')
+        self.env = mock.patch.dict(os.environ, {
+            'KANTRA_CLI_PATH': self.kantra, 'PROJECT_PATH': self.dir.name, 'REPORT_OUTPUT_PATH': self.report,
+            'FAKE_KANTRA_LOG': self.log, 'KANTRA_MAX_PARALLEL': '4', 'KANTRA_CACHE_DIR': '',
+            'KANTRA_RUN_TIMEOUT': '0', 'KANTRA_STALL_TIMEOUT': '0', 'KANTRA_PROFILE_INTERVAL': '',
+        })
+        self.env.start()
+        os.environ.pop('RUN_LOCAL_MODE', None)
+        self.enterContext(isolated_session())
+        self.quiet = [mock.patch('builtins.print'), mock.patch('utils.async_command._safe_stdout_write'),
+                      mock.patch('utils.command._safe_stdout_write')]
+        for patch in self.quiet:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.quiet:
+            patch.stop()
+        self.env.stop()
+        self.dir.cleanup()
+
+    def _invocations(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def _spec(self, name, targets=('quarkus',), **kwargs):
+        return AnalysisSpec(name, self.app, ['java'], list(targets), **kwargs)
+
+    def test_own_output_dirs(self):
+        for multiplexed in (True, False):
+            with self.subTest(multiplexed=multiplexed):
+                results = run_analyses([self._spec('app a'), self._spec('app-b', targets=['eap8'])],
+                                       multiplexed=multiplexed)
+                self.assertEqual(list(results), ['app a', 'app-b'])
+                self.assertEqual(results['app a'].output_dir, os.path.join(self.report, 'app_a'))
+                for result in results.values():
+                    self.assertTrue(result.ok, str(result.output))
+                    self.assertIn('Analysis complete!', result.output)
+                    self.assertTrue(os.path.exists(os.path.join(result.output_dir, 'output.yaml')))
+                    self.assertTrue(os.path.exists(os.path.join(result.output_dir, 'kantra-output-%s.log'
+                                                                % os.path.basename(result.output_dir))))
+
+    def test_runs_sharing_an_output_dir_are_sequential(self):
+        for multiplexed in (True, False):
+            with self.subTest(multiplexed=multiplexed):
+                specs = [self._spec('app-%d' % i, is_bulk=True, output_path=self.report, targets=['t%d' % i])
+                         for i in range(3)]
+                results = run_analyses(specs, multiplexed=multiplexed)
+                self.assertTrue(all(result.ok for result in results.values()), [str(r.output) for r in results.values()])
+                self.assertEqual(sorted(name for name in os.listdir(self.report) if name.startswith('kantra-output')),
+                                 ['kantra-output-app-0.log', 'kantra-output-app-1.log', 'kantra-output-app-2.log'])
+
+    def test_dedup(self):
+        specs = [
+            self._spec('first'),
+            self._spec('same', kwargs={'--rules=': '/rules'}, output_patterns=['Error: unknown target:']),
+            self._spec('same-options', kwargs={'rules': '/rules'}),
+            self._spec('other', targets=['eap8']),
+        ]
+        results = run_analyses(specs, dedup=True)
+        self.assertEqual(len(self._invocations()), 3)
+        self.assertEqual(results['same-options'].name, 'same-options')
+        self.assertEqual(results['same-options'].output_dir, results['same'].output_dir)
+        self.assertIn('Error: unknown target:', results['same-options'].output)
+
+        run_analyses([self._spec('again'), self._spec('again-2')], dedup=False)
+        self.assertEqual(len(self._invocations()), 5)
+
+    def test_unique_names(self):
+        with self.assertRaises(Exception):
+            run_analyses([self._spec('app'), self._spec('app', targets=['eap8'])])
+
+    def test_result_cache(self):
+        with mock.patch.dict(os.environ, {'KANTRA_CACHE_DIR': os.path.join(self.dir.name, 'cache')}):
+            first = run_analyses([self._spec('app')])['app']
+            self.assertFalse(first.cached)
+            cached = run_analyses([self._spec('app', output_path=os.path.join(self.dir.name, 'restored'),
+                                              output_patterns=['Error: unknown target:'])])['app']
+            self.assertTrue(cached.cached)
+            self.assertEqual(len(self._invocations()), 1)
+            self.assertIn('Error: unknown target:', cached.output)
+            self.assertTrue(os.path.exists(os.path.join(self.dir.name, 'restored', 'output.yaml')))
+
+            # a duplicate which must not be cached gets a real run for both
+            results = run_analyses([self._spec('app'), self._spec('uncached', cacheable=False)], dedup=True)
+            self.assertFalse(results['app'].cached)
+            self.assertEqual(len(self._invocations()), 2)
+
+    def test_run_commands(self):
+        results = run_commands({'one': 'echo one', 'two': 'exit 2'})
+        self.assertIn('one', str(results['one'].output))
+        self.assertEqual(results['two'].returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
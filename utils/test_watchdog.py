@@ -0,0 +1,74 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from watchdog import POPEN_KWARGS, Watchdog, is_process_tree_alive, kill_process_tree
+
+
+class TestWatchdog(unittest.TestCase):
+    """
+        Testing `Watchdog` deadlines for the wall-clock budget and output stalls.
+    """
+
+    def test_no_limits(self):
+        watchdog = Watchdog()
+        self.assertIsNone(watchdog.remaining())
+        self.assertIsNone(watchdog.expired())
+
+    def test_stall_is_reset_by_output(self):
+        watchdog = Watchdog(stall_timeout=0.1)
+        time.sleep(0.06)
+        watchdog.feed()
+        time.sleep(0.06)
+        self.assertIsNone(watchdog.expired())
+        time.sleep(0.06)
+        self.assertIn('stalled', watchdog.expired()[0])
+
+    def test_wall_clock_budget(self):
+        watchdog = Watchdog(run_timeout=0.05, stall_timeout=10)
+        self.assertLessEqual(watchdog.remaining(), 0.05)
+        time.sleep(0.06)
+        watchdog.feed()
+        reason, timeout = watchdog.expired()
+        self.assertIn('wall-clock', reason)
+        self.assertEqual(timeout, 0.05)
+
+
+
+@unittest.skipIf(sys.platform == 'win32', "process groups are signalled with Ctrl+Break on Windows")
+class TestKillProcessTree(unittest.TestCase):
+    """
+        Testing `kill_process_tree` stops a run gracefully before escalating to SIGKILL.
+    """
+
+    def test_run_exits_on_sigint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            marker = os.path.join(tmp, 'interrupted')
+            proc = subprocess.Popen(['sh', '-c', 'trap "touch %s; exit 3" INT; while true; do sleep 0.05; done' % marker],
+                                    **POPEN_KWARGS)
+            time.sleep(0.2)
+            kill_process_tree(proc, grace_period=5)
+            self.assertEqual(proc.wait(), 3)
+            self.assertTrue(os.path.exists(marker))
+            self.assertFalse(is_process_tree_alive(proc))
+
+    def test_escalates_to_sigkill(self):
+        proc = subprocess.Popen(['sh', '-c', 'trap "" INT TERM; sleep 30 & sleep 30'], **POPEN_KWARGS)
+        time.sleep(0.2)
+        started = time.monotonic()
+        kill_process_tree(proc, grace_period=0.2)
+        self.assertEqual(proc.wait(), -signal.SIGKILL)
+        self.assertLess(time.monotonic() - started, 5)
+        # the orphaned background sleep is reaped by init
+        deadline = time.monotonic() + 5
+        while is_process_tree_alive(proc) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_process_tree_alive(proc))
+
+
+if __name__ == '__main__':
+    unittest.main()
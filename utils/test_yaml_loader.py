@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from yaml_loader import iter_rulesets, iter_yaml_sequence, load_yaml_file
+
+RULESETS = [
+    {'name': 'first', 'violations': {'rule-1': {'incidents': [{'uri': 'file:///a.java', 'lineNumber': 3}]}}},
+    {'name': 'second', 'tags': ['a', 'b'], 'unmatched': ['rule-2']},
+]
+
+
+class TestYamlLoader(unittest.TestCase):
+    """
+        Testing the streaming loader yields the same rulesets as a full `yaml.safe_load`.
+    """
+
+    def _write(self, data):
+        fd, path = tempfile.mkstemp(suffix='.yaml')
+        with os.fdopen(fd, 'w') as f:
+            yaml.dump(data, f)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_load_yaml_file(self):
+        path = self._write(RULESETS)
+        self.assertEqual(load_yaml_file(path), RULESETS)
+
+    def test_stream_list(self):
+        path = self._write(RULESETS)
+        self.assertEqual(list(iter_rulesets(path)), RULESETS)
+
+    def test_stream_mapping_key(self):
+        path = self._write({'meta': {'skipped': [1, 2]}, 'rulesets': RULESETS, 'other': 'x'})
+        self.assertEqual(list(iter_rulesets(path)), RULESETS)
+        self.assertEqual(list(iter_yaml_sequence(path)), [])
+
+    def test_stream_early_stop_and_empty(self):
+        path = self._write(RULESETS)
+        rulesets = iter_rulesets(path)
+        self.assertEqual(next(rulesets)['name'], 'first')
+        rulesets.close()
+        self.assertEqual(list(iter_rulesets(self._write(None))), [])
+        empty_path = self._write([])
+        with open(empty_path, 'w'):
+            pass
+        self.assertEqual(list(iter_rulesets(empty_path)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
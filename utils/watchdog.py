@@ -0,0 +1,201 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from utils import constants
+from utils.profiler import get_tree_pids, is_supported
+
+DEFAULT_RUN_TIMEOUT = 900
+DEFAULT_STALL_TIMEOUT = 300
+DEFAULT_KILL_GRACE_PERIOD = 5
+KILL_POLL_INTERVAL = 0.1
+DIAGNOSTIC_LINES = 50
+ANALYSIS_LOG_LINES = 100
+
+# New process group/session, so a hung run can be killed together with its providers
+if sys.platform == 'win32':
+    POPEN_KWARGS = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    # Ctrl+Break is the only signal a process group gets on Windows
+    STOP_SIGNALS = (signal.CTRL_BREAK_EVENT,)
+else:
+    POPEN_KWARGS = {'start_new_session': True}
+    # kantra stops its provider containers on SIGINT/SIGTERM, SIGKILL would leave them running
+    STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class KantraTimeoutError(subprocess.TimeoutExpired):
+    """Raised when a run exceeded its wall-clock budget or stopped producing output, carries the diagnostics."""
+
+    def __init__(self, cmd, timeout, output, reason, diagnostics, returncode=None):
+        super().__init__(cmd, timeout, output)
+        self.reason = reason
+        self.diagnostics = diagnostics
+        self.returncode = returncode
+
+    def __str__(self):
+        return "Command '%s' %s\n%s" % (self.cmd, self.reason, self.diagnostics)
+
+
+def _get_timeout(name, default):
+    value = os.getenv(name)
+    seconds = float(value) if value else default
+    return seconds if seconds > 0 else None
+
+
+def get_run_timeout():
+    """Wall-clock budget of a run in seconds (KANTRA_RUN_TIMEOUT env variable, 0 disables it)."""
+    return _get_timeout(constants.KANTRA_RUN_TIMEOUT, DEFAULT_RUN_TIMEOUT)
+
+
+def get_stall_timeout():
+    """Max seconds without any output of a run (KANTRA_STALL_TIMEOUT env variable, 0 disables it)."""
+    return _get_timeout(constants.KANTRA_STALL_TIMEOUT, DEFAULT_STALL_TIMEOUT)
+
+
+def get_kill_grace_period():
+    """Seconds a run gets to exit after each stop signal before the next one (KANTRA_KILL_GRACE_PERIOD env variable)."""
+    value = os.getenv(constants.KANTRA_KILL_GRACE_PERIOD)
+    return max(0.0, float(value)) if value else DEFAULT_KILL_GRACE_PERIOD
+
+
+class Watchdog:
+    """
+    Tracks the wall-clock budget and output stalls of a run, the runner calls `feed()` for every output chunk
+    and `expired()` whenever it waits longer than `remaining()` seconds.
+    """
+
+    def __init__(self, run_timeout=None, stall_timeout=None):
+        self.run_timeout = run_timeout
+        self.stall_timeout = stall_timeout
+        self.started = self.last_output = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        return cls(get_run_timeout(), get_stall_timeout())
+
+    def feed(self):
+        self.last_output = time.monotonic()
+
+    def remaining(self):
+        """Seconds until the nearest deadline, None without any limit."""
+        deadlines = []
+        if self.run_timeout:
+            deadlines.append(self.started + self.run_timeout)
+        if self.stall_timeout:
+            deadlines.append(self.last_output + self.stall_timeout)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def expired(self):
+        """Returns (reason, timeout) of the exceeded limit, None if the run is within its limits."""
+        now = time.monotonic()
+        if self.run_timeout and now - self.started >= self.run_timeout:
+            return "exceeded its wall-clock budget of %g seconds" % self.run_timeout, self.run_timeout
+        if self.stall_timeout and now - self.last_output >= self.stall_timeout:
+            return "stalled: no output for %g seconds" % self.stall_timeout, self.stall_timeout
+        return None
+
+
+def get_diagnostics(pid, output, output_dir=None):
+    """
+    Collects what is needed to tell why a run hung: its process tree, the last output lines
+    and the tail of kantra's `analysis.log` (if `output_dir` is known).
+    """
+    sections = ["Process tree:"]
+    pids = get_tree_pids(pid) if is_supported() else [pid]
+    for tree_pid in pids:
+        sections.append("  %d %s" % (tree_pid, _get_cmdline(tree_pid)))
+
+    lines = str(output).splitlines()[-DIAGNOSTIC_LINES:]
+    sections.append("Last %d output lines:" % len(lines))
+    sections += ["  " + line for line in lines]
+
+    if output_dir:
+        log_path = os.path.join(output_dir, 'analysis.log')
+        if os.path.exists(log_path):
+            with open(log_path, encoding='utf-8', errors='replace') as f:
+                log_lines = f.read().splitlines()[-ANALYSIS_LOG_LINES:]
+            sections.append("Last %d lines of %s:" % (len(log_lines), log_path))
+            sections += ["  " + line for line in log_lines]
+    return '\n'.join(sections)
+
+
+def _get_cmdline(pid):
+    try:
+        with open('/proc/%d/cmdline' % pid, 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode('utf-8', errors='replace').strip()
+    except OSError:
+        return ''
+
+
+def signal_process_tree(proc, sig):
+    """Sends a signal to the process group of a run started with POPEN_KWARGS, False if the group is gone."""
+    try:
+        if sys.platform == 'win32':
+            proc.send_signal(sig)
+        else:
+            os.killpg(proc.pid, sig)
+    except (OSError, ProcessLookupError):
+        return False
+    return True
+
+
+def is_process_tree_alive(proc):
+    """True while any process of the run's group is alive (only the run itself is known on Windows)."""
+    if hasattr(proc, 'poll'):
+        proc.poll()     # reaps the run, a zombie still counts as a member of the group
+    if sys.platform == 'win32':
+        return proc.returncode is None
+    try:
+        os.killpg(proc.pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def force_kill_process_tree(proc):
+    """Kills the process group of a run at once."""
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+    try:
+        proc.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+def kill_process_tree(proc, grace_period=None):
+    """
+    Stops the process group of a run started with POPEN_KWARGS (kantra, its providers and helpers).
+
+    The group gets STOP_SIGNALS one after another, each followed by up to `grace_period` seconds
+    (KANTRA_KILL_GRACE_PERIOD by default) to exit, so kantra can remove its containers; what is left is SIGKILLed.
+    A KeyboardInterrupt while waiting kills the group at once.
+    """
+    if grace_period is None:
+        grace_period = get_kill_grace_period()
+    try:
+        for sig in STOP_SIGNALS:
+            if not signal_process_tree(proc, sig):
+                break
+            deadline = time.monotonic() + grace_period
+            while is_process_tree_alive(proc):
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(KILL_POLL_INTERVAL)
+            else:
+                return
+    except KeyboardInterrupt:
+        force_kill_process_tree(proc)
+        raise
+    force_kill_process_tree(proc)
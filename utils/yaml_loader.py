@@ -0,0 +1,83 @@
+import yaml
+from yaml.composer import Composer
+from yaml.events import MappingEndEvent, MappingStartEvent, ScalarEvent, SequenceEndEvent, SequenceStartEvent, \
+    StreamEndEvent
+
+# libyaml based loader is several times faster on big analysis outputs, pure Python one is the fallback
+SafeLoader = getattr(yaml, 'CSafeLoader', None) or yaml.SafeLoader
+
+
+if SafeLoader is not yaml.SafeLoader:
+    class _StreamingLoader(SafeLoader, Composer):
+        """libyaml parser producing events, composed into nodes item by item by the Python composer."""
+
+        def __init__(self, stream):
+            SafeLoader.__init__(self, stream)
+            Composer.__init__(self)
+else:
+    _StreamingLoader = yaml.SafeLoader
+
+
+def load_yaml(stream):
+    """Parses a YAML document (`yaml.safe_load` equivalent) with the fastest available safe loader."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_yaml_file(path):
+    """
+    Loads a YAML file (e.g. output.yaml or dependencies.yaml) with the fastest available safe loader.
+
+    Args:
+        path (str): path to the YAML file
+
+    Returns:
+        Parsed YAML data
+    """
+    with open(path, 'rb') as file:
+        return load_yaml(file)
+
+
+def iter_yaml_sequence(path, key=None):
+    """
+    Streams items of the top level sequence of a YAML file one at a time, without building the whole document.
+
+    Args:
+        path (str): path to the YAML file
+        key (str): if the top level is a mapping, stream the sequence under this key instead
+            (e.g. 'rulesets'), other values of the mapping are skipped
+
+    Returns:
+        generator of parsed items, nothing for an empty document
+    """
+    with open(path, 'rb') as file:
+        loader = _StreamingLoader(file)
+        try:
+            loader.get_event()      # StreamStartEvent
+            if loader.check_event(StreamEndEvent):
+                return
+            loader.get_event()      # DocumentStartEvent
+            if loader.check_event(SequenceStartEvent):
+                yield from _iter_sequence_items(loader)
+            elif key is not None and loader.check_event(MappingStartEvent):
+                loader.get_event()
+                while not loader.check_event(MappingEndEvent):
+                    is_key = loader.check_event(ScalarEvent) and loader.peek_event().value == key
+                    loader.compose_node(None, None)
+                    if is_key and loader.check_event(SequenceStartEvent):
+                        yield from _iter_sequence_items(loader)
+                        return
+                    loader.compose_node(None, None)
+        finally:
+            loader.dispose()
+
+
+def iter_rulesets(path):
+    """Streams rulesets of an analysis output.yaml (a list of rulesets, or a mapping with a `rulesets` key)."""
+    return iter_yaml_sequence(path, key='rulesets')
+
+
+def _iter_sequence_items(loader):
+    loader.get_event()      # SequenceStartEvent
+    while not loader.check_event(SequenceEndEvent):
+        node = loader.compose_node(None, None)
+        yield loader.construct_document(node)